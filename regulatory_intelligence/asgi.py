@@ -2,6 +2,8 @@
 ASGI config for regulatory_intelligence project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The async dashboard API (ri_app.api) is best served from here, e.g.
+``gunicorn regulatory_intelligence.asgi:application -k uvicorn.workers.UvicornWorker``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,12 +43,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ri_app.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'regulatory_intelligence.urls'
@@ -73,13 +76,37 @@ WSGI_APPLICATION = 'regulatory_intelligence.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# RI_DATABASE_NAME / RI_CONN_MAX_AGE let the load_test command point a server at its own copy
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('RI_DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('RI_CONN_MAX_AGE', 0)),
+    }
+}
+
+
+# Cache
+# The web workers and the run_crawlers command must see the same data version
+# token, so the cache has to be shared between processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RI_CACHE_DIR', BASE_DIR / 'cache'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            # Rendered pages are keyed per user, filters and data version, so the
+            # default of 300 files would evict live pages within minutes; past the
+            # limit a quarter of the entries is culled at a time
+            'MAX_ENTRIES': 20000,
+            'CULL_FREQUENCY': 4,
+        },
     }
 }
 
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +131,10 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Saved search digests (send_digests); configure an SMTP backend in production
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'regulatory-intelligence@localhost'
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -119,7 +150,12 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
-STATIC_URL = 'static/'
+STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed copies plus .gz/.br variants; WhiteNoise
+# serves the hashed names with a far-future immutable Cache-Control header.
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -133,3 +169,72 @@ MEDIA_URL = '/media/'
 DATE_FORMAT = 'd/m/Y'
 USE_L10N = False
 
+# Records dated within this many months stay in the hot RegulatoryData table;
+# older ones live in ArchivedRegulatoryData (see the archive_data command)
+RI_HOT_WINDOW_MONTHS = 12
+
+# Dictionary of INNs and brand names scanned for in imported titles and summaries
+RI_DRUG_DICTIONARY = BASE_DIR / 'ri_app' / 'data' / 'drug_dictionary.txt'
+
+# Labelled titles for the Product_Type / Document_Type fallback model (ri_app.classification)
+RI_TYPE_TRAINING = BASE_DIR / 'ri_app' / 'data' / 'type_training.csv'
+
+# Vectors and neighbour lists behind the related-articles table (ri_app.related)
+RI_RELATED_INDEX = BASE_DIR / 'related_index.npz'
+
+# Limits for each sandboxed crawler process (ri_app.sandbox); 0 or a missing key disables a limit.
+# memory_mb caps the resident memory of the crawler and its browsers together;
+# address_space_mb is a per-process RLIMIT_AS, off as Chrome reserves far more than it uses
+RI_CRAWLER_LIMITS = {
+    'memory_mb': 4096,
+    'address_space_mb': 0,
+    'cpu_seconds': 900,
+    'open_files': 512,
+    'timeout_seconds': 1800,
+}
+# Per-crawler stdout/stderr logs, the newest RI_CRAWLER_LOG_KEEP runs are kept
+RI_CRAWLER_LOG_DIR = BASE_DIR / 'crawler_logs'
+RI_CRAWLER_LOG_KEEP = 10
+# Environment variables passed to crawlers on top of ri_app.sandbox.ENV_ALLOWLIST
+RI_CRAWLER_ENV = []
+
+# Each run_crawlers run works in its own directory here, with stage checkpoints
+# (ri_app.pipeline); the newest RI_PIPELINE_KEEP runs are kept for --resume
+RI_PIPELINE_DIR = BASE_DIR / 'pipeline_runs'
+RI_PIPELINE_KEEP = 5
+# Lock file that keeps run_crawlers and run_scheduler runs from overlapping (ri_app.scheduling)
+RI_RUN_LOCK = BASE_DIR / 'crawl.lock'
+
+# Threads (and so database connections) per process for the async dashboard API
+# (ri_app.api), and the seconds its queries may take before it answers 504
+RI_API_WORKERS = 8
+RI_API_TIMEOUT = 10
+
+# Requests slower than this are written to slow_requests.log (JSON lines)
+RI_SLOW_REQUEST_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_lines': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': BASE_DIR / 'slow_requests.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True,
+            'formatter': 'json_lines',
+        },
+    },
+    'loggers': {
+        'ri_app.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
@@ -17,17 +17,32 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from ri_app.views import DashboardView, DetailView, update_viewed 
+from ri_app.views import ExportView
 from django.contrib.auth import views as auth_views
-from ri_app.views import register
+from ri_app.views import register, metrics, ArchivedDetailView, live_feed
+from ri_app.views import SavedSearchListView, save_search, delete_saved_search
+from ri_app.views import AnalyticsView, analytics_data, typeahead
+from ri_app.api import dashboard_api
 
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', DashboardView.as_view(), name='dashboard'),
+    path('export/', ExportView.as_view(), name='export'),
     path('item/<int:pk>/', DetailView.as_view(), name='detail'),
+    path('archive/<int:pk>/', ArchivedDetailView.as_view(), name='archived_detail'),
     path('update_viewed/<int:item_id>/', update_viewed, name='update_viewed'),
+    path('live/', live_feed, name='live_feed'),
+    path('saved-searches/', SavedSearchListView.as_view(), name='saved_searches'),
+    path('saved-searches/new/', save_search, name='save_search'),
+    path('saved-searches/<int:pk>/delete/', delete_saved_search, name='delete_saved_search'),
     path('register/', register, name='register'),
+    path('metrics/', metrics, name='metrics'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('analytics/data/', analytics_data, name='analytics_data'),
+    path('api/dashboard/', dashboard_api, name='dashboard_api'),
+    path('typeahead/', typeahead, name='typeahead'),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 
@@ -1,9 +1,294 @@
-from django.contrib import admin
-from ri_app.models import RegulatoryData
+import hashlib
+from collections import Counter
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from ri_app.models import (
+    ActivityRollup, RegulatoryData, ArchivedRegulatoryData, CrawlJob, CrawlerRun, QuarantinedRecord, RelatedArticle,
+    SavedSearch, SavedSearchMatch, SourceQualityReport,
+)
+from ri_app.caching import bump_data_version, cached_for_version
+from ri_app.canonical import url_key
+from ri_app.classification import DOCUMENT_TYPES, PRODUCT_TYPES
+from ri_app.filters import drug_name_facets, drug_name_q
+from ri_app.rollups import apply_deltas, count_queryset, count_records, record_removed
+
+# Changelist searches starting with this scan the summaries, which have no index
+SUMMARY_PREFIX = 'summary:'
+
+
+def estimated_count(queryset):
+    """
+    Row count for the changelist paginator. An unfiltered PostgreSQL table
+    uses the planner's estimate; anything else is counted once per data
+    version and query.
+    """
+    query = queryset.query
+    if connection.vendor == 'postgresql' and not query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table]
+            )
+            estimate = cursor.fetchone()[0]
+        if estimate and estimate > 0:
+            return estimate
+    try:
+        sql, params = query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = hashlib.sha1(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()
+    return cached_for_version(f'count:{key}', queryset.count)
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class FacetListFilter(admin.SimpleListFilter):
+    """List filter whose choices come from facet_values() instead of a DISTINCT over the table"""
+    lookup = None
+
+    def facet_values(self):
+        """The filter's choices; subclasses supply them"""
+        return []
+
+    def lookups(self, request, model_admin):
+        return [(value, value) for value in self.facet_values()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+        return queryset
+
+
+class ProductTypeFilter(FacetListFilter):
+    title = 'product type'
+    parameter_name = 'product_type'
+    lookup = 'Product_Type'
+
+    def facet_values(self):
+        return PRODUCT_TYPES
+
+
+class DocumentTypeFilter(FacetListFilter):
+    title = 'document type'
+    parameter_name = 'document_type'
+    lookup = 'Document_Type'
+
+    def facet_values(self):
+        return DOCUMENT_TYPES
+
+
+class AgencyFilter(FacetListFilter):
+    title = 'agency'
+    parameter_name = 'agency'
+    lookup = 'agency'
+
+    def facet_values(self):
+        # The rollup table already holds every agency; it is far smaller than the records
+        return cached_for_version('agencies', lambda: list(
+            ActivityRollup.objects.exclude(agency='').order_by('agency').values_list('agency', flat=True).distinct()
+        ))
+
+
+class CategoryFilter(FacetListFilter):
+    title = 'category'
+    parameter_name = 'category'
+    lookup = 'category'
+
+    def facet_values(self):
+        return cached_for_version('categories', lambda: list(
+            ActivityRollup.objects.exclude(category='').order_by('category').values_list('category', flat=True).distinct()
+        ))
+
+
+class DrugNameFilter(FacetListFilter):
+    title = 'drug name'
+    parameter_name = 'drug_name'
+
+    def facet_values(self):
+        return cached_for_version('drug_names', lambda: drug_name_facets(RegulatoryData.objects.all()))
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(drug_name_q(self.value()))
+        return queryset
+
+
+def delete_records(queryset):
+    """
+    Delete the RegulatoryData rows of `queryset`, removing their dependents
+    with one DELETE per table first so the collector only has primary keys
+    to load and no cascades left to follow. Returns the number of records deleted.
+    """
+    ids = queryset.values('pk')
+    with transaction.atomic():
+        record_removed(queryset)
+        RelatedArticle.objects.filter(Q(record__in=ids) | Q(related__in=ids)).delete()
+        SavedSearchMatch.objects.filter(record__in=ids).delete()
+        deleted = queryset.only('pk').delete()[0]
+    bump_data_version()
+    return deleted
+
+
+def reassign_records(queryset, agency=None, category=None):
+    """Set agency and/or category on every row of `queryset` with one UPDATE, keeping rollups in step"""
+    changes = {field: value for field, value in (('agency', agency), ('category', category)) if value}
+    if not changes:
+        return 0
+    with transaction.atomic():
+        before = count_queryset(queryset)
+        after = Counter()
+        for (old_agency, old_category, document_type, week), n in before.items():
+            after[(agency or old_agency, category or old_category, document_type, week)] += n
+        updated = queryset.update(**changes)
+        after.subtract(before)
+        apply_deltas(after)
+    bump_data_version()
+    return updated
+
+
+class ReassignForm(forms.Form):
+    agency = forms.CharField(max_length=100, required=False, help_text='Leave blank to keep the current agency')
+    category = forms.CharField(max_length=100, required=False, help_text='Leave blank to keep the current category')
+
+
+class RecordAdmin(admin.ModelAdmin):
+    """Admin for either record tier; edits made one record at a time keep rollups and cached pages in step"""
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            deltas = count_records([obj])
+            if change:
+                deltas.subtract(count_queryset(self.model.objects.filter(pk=obj.pk)))
+            super().save_model(request, obj, form, change)
+            apply_deltas(deltas)
+        bump_data_version()
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_removed(self.model.objects.filter(pk=obj.pk))
+            super().delete_model(request, obj)
+        bump_data_version()
+
 
 @admin.register(RegulatoryData)
-class RegulatoryDataAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'Drug_names', 'Product_Type', 'Document_Type')
-    list_filter = ('Product_Type', 'Document_Type', 'Drug_names')
-    search_fields = ('title', 'summary', 'Drug_names', 'Product_Type', 'Document_Type')
-    readonly_fields = ('article_url', 'source_file')
\ No newline at end of file
+class RegulatoryDataAdmin(RecordAdmin):
+    list_display = ('title', 'date', 'agency', 'Drug_names', 'Product_Type', 'Document_Type', 'viewed')
+    list_filter = (ProductTypeFilter, DocumentTypeFilter, AgencyFilter, CategoryFilter, DrugNameFilter)
+    # Narrow columns only; ids, URLs and type labels are routed to indexed lookups.
+    # On PostgreSQL the contains searches use the trigram indexes of migration 0020.
+    # The unindexed summary scan is opt-in with a 'summary:' prefix (see change_list.html).
+    search_fields = ('title', 'Drug_names')
+    readonly_fields = ('article_url', 'source_file')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['mark_viewed', 'mark_unviewed', 'reassign_agency_category', 'delete_by_source']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('summary', 'excerpt')
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if term.startswith(('http://', 'https://')):
+            return queryset.filter(url_key=url_key(term)), False
+        if term.lower().startswith(SUMMARY_PREFIX):
+            return queryset.filter(summary__icontains=term[len(SUMMARY_PREFIX):].strip()), False
+        labels = {label.lower(): label for label in PRODUCT_TYPES + DOCUMENT_TYPES}
+        if term.lower() in labels:
+            label = labels[term.lower()]
+            return queryset.filter(Q(Product_Type=label) | Q(Document_Type=label)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def delete_queryset(self, request, queryset):
+        delete_records(queryset)
+
+    @admin.action(description='Mark selected records as viewed')
+    def mark_viewed(self, request, queryset):
+        updated = queryset.update(viewed=True)
+        bump_data_version()
+        self.message_user(request, f'{updated} records marked as viewed.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected records as not viewed')
+    def mark_unviewed(self, request, queryset):
+        updated = queryset.update(viewed=False)
+        bump_data_version()
+        self.message_user(request, f'{updated} records marked as not viewed.', messages.SUCCESS)
+
+    @admin.action(description='Reassign agency / category of selected records')
+    def reassign_agency_category(self, request, queryset):
+        form = ReassignForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            updated = reassign_records(queryset, **form.cleaned_data)
+            self.message_user(request, f'{updated} records reassigned.', messages.SUCCESS)
+            return None
+        return TemplateResponse(request, 'admin/ri_app/regulatorydata/reassign.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Reassign agency / category',
+            'opts': self.model._meta,
+            'form': form,
+            'count': estimated_count(queryset),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'select_across': request.POST.get('select_across'),
+        })
+
+    @admin.action(description='Delete every record from the sources of the selected records')
+    def delete_by_source(self, request, queryset):
+        sources = list(queryset.order_by().values_list('source_file', flat=True).distinct())
+        deleted = delete_records(RegulatoryData.objects.filter(source_file__in=sources))
+        self.message_user(
+            request, f'{deleted} records from {len(sources)} sources deleted.', messages.SUCCESS
+        )
+
+
+@admin.register(ArchivedRegulatoryData)
+class ArchivedRegulatoryDataAdmin(RecordAdmin):
+    list_display = ('title', 'date', 'agency', 'archived_at')
+    date_hierarchy = 'date'
+    readonly_fields = ('article_url', 'source_file', 'archived_at')
+
+
+@admin.register(CrawlJob)
+class CrawlJobAdmin(admin.ModelAdmin):
+    list_display = ('script_name', 'agency', 'interval_minutes', 'status', 'last_run', 'next_run', 'last_duration', 'records_imported')
+    list_filter = ('status', 'agency')
+    readonly_fields = ('last_run', 'last_duration', 'last_error', 'records_imported')
+
+
+@admin.register(CrawlerRun)
+class CrawlerRunAdmin(admin.ModelAdmin):
+    list_display = ('script_name', 'started_at', 'duration', 'exit_code', 'timed_out', 'user_cpu', 'max_rss_kb', 'output_files')
+    list_filter = ('timed_out', 'script_name')
+    readonly_fields = [field.name for field in CrawlerRun._meta.fields]
+
+
+@admin.register(QuarantinedRecord)
+class QuarantinedRecordAdmin(admin.ModelAdmin):
+    list_display = ('source_file', 'reasons', 'first_seen')
+    list_filter = ('source_file',)
+    readonly_fields = [field.name for field in QuarantinedRecord._meta.fields]
+
+
+@admin.register(SourceQualityReport)
+class SourceQualityReportAdmin(admin.ModelAdmin):
+    list_display = ('source_file', 'created_at', 'readable', 'rows', 'valid_rows', 'quarantined', 'truncated', 'missing_columns')
+    list_filter = ('readable', 'source_file')
+    readonly_fields = [field.name for field in SourceQualityReport._meta.fields]
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'query', 'created_at')
+    search_fields = ('name', 'user__username')
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Async JSON API for a client-rendered dashboard.
+
+The listing page, the total count and the facet counts are independent
+queries, so they run at the same time on a bounded thread pool and the
+response takes as long as the slowest of them rather than their sum. The
+middleware stack (WhiteNoise, RequestMetricsMiddleware) is sync-only, so under
+both WSGI and ASGI Django runs the view in an event loop on a request thread,
+which stays busy until the queries finish.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.http import JsonResponse
+from django.urls import reverse
+
+from .caching import cached_for_version, current_import_generation
+from .filters import drug_name_facets, filter_queryset
+from .models import RegulatoryData
+
+PAGE_SIZE = 20
+
+# Facets counted over the filtered rows: response key -> model field
+FACET_FIELDS = {
+    'product_type': 'Product_Type',
+    'document_type': 'Document_Type',
+    'agency': 'agency',
+}
+
+_executor = None
+
+
+def get_executor():
+    """Process-wide pool the API queries run on; RI_API_WORKERS bounds the database connections it opens"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'RI_API_WORKERS', 8), thread_name_prefix='ri-api',
+        )
+    return _executor
+
+
+def _run_query(query, recorder=None):
+    # Pool threads keep their own connections, so expire them the way a request would
+    close_old_connections()
+    try:
+        if recorder is None:
+            return query()
+        # Count the query in the request metrics, which only wrap the request thread's connection
+        with connection.execute_wrapper(recorder):
+            return query()
+    finally:
+        close_old_connections()
+
+
+async def run_queries(queries, timeout, recorder=None):
+    """
+    Run the callables in `queries` (a dict) concurrently; raises asyncio.TimeoutError.
+    `recorder` is the request's QueryRecorder, if the metrics middleware set one.
+    """
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(get_executor(), _run_query, query, recorder) for query in queries.values()
+    ]
+    results = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+    return dict(zip(queries, results))
+
+
+def listing_query(queryset, page):
+    offset = (page - 1) * PAGE_SIZE
+    return lambda: list(queryset.values(*RegulatoryData.LISTING_FIELDS, 'agency')[offset:offset + PAGE_SIZE])
+
+
+def facet_query(queryset, field):
+    counts = queryset.order_by().exclude(**{f'{field}__isnull': True}).values(field).annotate(n=Count('id'))
+    return lambda: [
+        {'value': row[field], 'count': row['n']}
+        for row in sorted(counts, key=lambda row: (-row['n'], row[field]))
+    ]
+
+
+def page_number(params):
+    try:
+        return max(1, int(params.get('page', 1)))
+    except ValueError:
+        return 1
+
+
+async def dashboard_api(request):
+    """
+    Dashboard results as JSON: one page of items, the total count and facet
+    counts for the same filters (the dashboard's GET parameters).
+    """
+    if not await sync_to_async(lambda: request.user.is_authenticated)():
+        return JsonResponse({'error': 'authentication required'}, status=401)
+
+    queryset = filter_queryset(RegulatoryData.objects.all(), request.GET)
+    page = page_number(request.GET)
+    queries = {
+        'items': listing_query(queryset, page),
+        'count': queryset.count,
+        'drug_names': lambda: cached_for_version('drug_names', lambda: drug_name_facets(RegulatoryData.objects.all())),
+        'generation': current_import_generation,
+    }
+    for key, field in FACET_FIELDS.items():
+        queries[key] = facet_query(queryset, field)
+
+    try:
+        results = await run_queries(
+            queries, getattr(settings, 'RI_API_TIMEOUT', 10), getattr(request, '_query_recorder', None),
+        )
+    except asyncio.TimeoutError:
+        # Queries already running finish in the pool; the pool size caps how many can pile up
+        return JsonResponse({'error': 'query timed out'}, status=504)
+
+    for item in results['items']:
+        item['url'] = reverse('detail', args=[item['id']])
+    count = results['count']
+    return JsonResponse({
+        'generation': results['generation'],
+        'page': page,
+        'page_size': PAGE_SIZE,
+        'count': count,
+        'num_pages': max(1, -(-count // PAGE_SIZE)),
+        'items': results['items'],
+        'facets': {
+            **{key: results[key] for key in FACET_FIELDS},
+            'drug_names': results['drug_names'],
+        },
+    })
@@ -0,0 +1,64 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from dateutil.relativedelta import relativedelta
+
+from .caching import bump_data_version
+from .models import ArchivedRegulatoryData, RegulatoryData, SavedSearchMatch
+from .rollups import apply_deltas, count_records
+
+# Fields copied between tiers; the primary key and hot-only fields are not kept
+RECORD_FIELDS = [
+    field.name for field in ArchivedRegulatoryData._meta.concrete_fields
+    if not field.primary_key and field.name != 'archived_at'
+]
+
+
+def hot_window_cutoff(months=None, today=None):
+    """Records dated before this belong in the archive tier"""
+    if months is None:
+        months = getattr(settings, 'RI_HOT_WINDOW_MONTHS', 12)
+    return (today or date.today()) - relativedelta(months=months)
+
+
+def archive_ids(ids, batch_size=1000):
+    """
+    Move the given RegulatoryData rows to the archive, one transaction per
+    batch. Rows whose canonical URL is already archived just leave the hot table.
+    Rows with a saved search match still waiting for its digest stay hot
+    until it is sent. Returns the number of rows moved out of the hot table.
+    """
+    ids = list(ids)
+    moved = 0
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        with transaction.atomic():
+            pending = set(SavedSearchMatch.objects.filter(
+                record_id__in=batch_ids, notified_at__isnull=True
+            ).values_list('record_id', flat=True))
+            batch_ids = [pk for pk in batch_ids if pk not in pending]
+            rows = list(RegulatoryData.objects.filter(id__in=batch_ids).values(*RECORD_FIELDS))
+            seen = set(ArchivedRegulatoryData.objects.filter(
+                url_key__in=[row['url_key'] for row in rows]
+            ).values_list('url_key', flat=True))
+            new_rows, dropped = [], []
+            for row in rows:
+                (dropped if row['url_key'] in seen else new_rows).append(row)
+                seen.add(row['url_key'])
+            ArchivedRegulatoryData.objects.bulk_create(
+                [ArchivedRegulatoryData(**row) for row in new_rows],
+                ignore_conflicts=True,
+            )
+            moved += RegulatoryData.objects.filter(id__in=batch_ids).delete()[0]
+            # Moved rows keep their rollup counts; duplicates of archived URLs are gone
+            apply_deltas({key: -n for key, n in count_records(dropped).items()})
+    if moved:
+        bump_data_version()
+    return moved
+
+
+def archive_older_than(cutoff, batch_size=1000):
+    """Move every hot row dated before `cutoff` to the archive"""
+    ids = RegulatoryData.objects.filter(date__lt=cutoff).values_list('id', flat=True)
+    return archive_ids(ids.iterator(), batch_size=batch_size)
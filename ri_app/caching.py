@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+DATA_VERSION_KEY = 'ri:data_version'
+IMPORT_GENERATION_KEY = 'ri:import_generation'
+PAGE_CACHE_PREFIX = 'ri:page'
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_STATS = ('hits', 'misses', 'not_modified')
+
+# Page cache counters for this worker process, like the request metrics.
+# Kept in memory: an incr() on the file cache is a racy read-modify-write
+# and would write a file on every cache hit.
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def get_data_version():
+    """
+    Return the current data version token.
+    The token is the nanosecond timestamp of the last data change, so it also
+    serves as the Last-Modified value for every page built from the data.
+    """
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = bump_data_version()
+    return version
+
+
+def bump_data_version():
+    """Mark all cached pages as stale. Call after any change to RegulatoryData."""
+    version = time.time_ns()
+    cache.set(DATA_VERSION_KEY, version, None)
+    return version
+
+
+def cached_for_version(name, compute, timeout=PAGE_CACHE_TIMEOUT):
+    """compute(), cached under `name` until the next data change"""
+    key = f'ri:derived:{get_data_version()}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def current_import_generation():
+    """Id of the latest finished ImportRun, 0 if nothing was imported yet"""
+    generation = cache.get(IMPORT_GENERATION_KEY)
+    if generation is None:
+        from .models import ImportRun
+        latest = ImportRun.objects.filter(finished_at__isnull=False).order_by('-id').first()
+        generation = latest.pk if latest else 0
+        cache.set(IMPORT_GENERATION_KEY, generation, None)
+    return generation
+
+
+def publish_import_generation(generation):
+    """Announce a finished import to live feed listeners"""
+    cache.set(IMPORT_GENERATION_KEY, generation, None)
+
+
+def data_last_modified(version=None):
+    """Return the data version as whole epoch seconds for Last-Modified"""
+    if version is None:
+        version = get_data_version()
+    return version // 1_000_000_000
+
+
+def normalize_filter_params(query_dict):
+    """
+    Turn request.GET into a stable tuple of (key, value) pairs.
+    Empty values are dropped and page 1 is implicit, so '?page=1&search=' and
+    '' produce the same key.
+    """
+    params = []
+    for key in sorted(query_dict.keys()):
+        for value in query_dict.getlist(key):
+            value = value.strip()
+            if not value or (key == 'page' and value == '1'):
+                continue
+            params.append((key, value))
+    return tuple(params)
+
+
+def _record(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def page_cache_stats():
+    """Return this process's hit/miss/304 counters for the rendered page cache"""
+    with _stats_lock:
+        return {stat: _stats[stat] for stat in PAGE_CACHE_STATS}
+
+
+def reset_page_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class ConditionalPageMixin:
+    """
+    Answer conditional GETs from the data version token and optionally keep
+    rendered pages in the cache per user.
+
+    Must come before LoginRequiredMixin so that a 304 is returned from the
+    session alone, without loading the user or running any view query.
+    """
+    cache_rendered_pages = False
+
+    def _page_key(self, request, version):
+        # The CSRF cookie is part of the key because the rendered page embeds a
+        # token derived from it (logout form, AJAX calls).
+        parts = [
+            str(version),
+            str(request.session.get(SESSION_KEY)),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            request.path,
+            repr(normalize_filter_params(request.GET)),
+        ]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.session.get(SESSION_KEY) is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        version = get_data_version()
+        self.page_key = self._page_key(request, version)
+        etag = quote_etag(self.page_key)
+        last_modified = data_last_modified(version)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            _record('not_modified')
+            return not_modified
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        page_key = getattr(self, 'page_key', None)
+        if not self.cache_rendered_pages or page_key is None or \
+                settings.CSRF_COOKIE_NAME not in request.COOKIES:
+            return super().get(request, *args, **kwargs)
+
+        cache_key = f'{PAGE_CACHE_PREFIX}:{page_key}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _record('hits')
+            return HttpResponse(cached, content_type='text/html; charset=utf-8')
+
+        _record('misses')
+        response = super().get(request, *args, **kwargs)
+
+        def store(rendered):
+            if rendered.status_code == 200:
+                cache.set(cache_key, rendered.content, PAGE_CACHE_TIMEOUT)
+
+        response.add_post_render_callback(store)
+        return response
@@ -0,0 +1,59 @@
+"""
+Canonical article URLs and the fixed-width keys deduplication runs on.
+
+Crawlers report the same article as http and https, with and without a
+trailing slash, with tracking parameters or a fragment. canonical_url() folds
+those variants together and url_key() hashes the result to a signed 64-bit
+integer, which is what the url_key columns, their unique indexes and the
+in-memory duplicate checks hold instead of URLs of up to 1000 characters.
+"""
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src',
+])
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_url(url):
+    """
+    `url` with the scheme folded to https, the host lower-cased without a
+    default port, no trailing slash, no fragment and the remaining query
+    parameters sorted, minus tracking ones. Text that does not parse as a URL
+    comes back stripped.
+    """
+    url = str(url or '').strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.rstrip('.')
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    path = parts.path.rstrip('/') or '/'
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+
+def url_key(url):
+    """Signed 64-bit hash of the canonical form of `url`, as stored in url_key"""
+    digest = hashlib.sha1(canonical_url(url).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def url_keys(urls):
+    """url_key for each value of a pandas Series, as int64; missing values hash as ''"""
+    return urls.map(lambda url: url_key(url if isinstance(url, str) else '')).astype('int64')
@@ -0,0 +1,82 @@
+"""
+Bounded-memory reading of the combined spreadsheets for import.
+
+RI.xlsx is streamed with openpyxl's read-only mode and handed out as
+DataFrames of a limited number of rows, with the low-cardinality columns
+stored as categoricals. With a memory budget the first chunk is a small
+sample and every later chunk size is derived from the measured size of the
+rows read so far.
+"""
+from openpyxl import load_workbook
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 5000
+MIN_CHUNK_SIZE = 100
+
+# Columns with few distinct values, kept as pandas categoricals
+CATEGORICAL_COLUMNS = ('Source_File', 'Product_Type', 'Document_Type')
+
+# Strings read_excel treats as missing, which is how the pipeline writes None
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# A row costs this many times its DataFrame size while it is imported
+# (the model instance, the SQL parameters and the dict it is read from)
+IMPORT_OVERHEAD = 6
+
+
+def compact_frame(df):
+    """Store the low-cardinality columns as categoricals"""
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+class ChunkBudget:
+    """
+    Chunk size for a memory budget in MB. Without a budget it is `chunk_size`;
+    with one, the first MIN_CHUNK_SIZE rows are read to measure the bytes per
+    row, and the size is re-derived from every chunk that is read.
+    """
+
+    def __init__(self, chunk_size=None, max_memory_mb=None):
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self.max_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        if self.max_bytes is not None:
+            # Nothing is known about the rows yet, so only a sample is read
+            self.chunk_size = min(self.chunk_size, MIN_CHUNK_SIZE)
+
+    def observe(self, df):
+        if self.max_bytes is None or df.empty:
+            return
+        per_row = df.memory_usage(deep=True).sum() / len(df) * IMPORT_OVERHEAD
+        self.chunk_size = max(MIN_CHUNK_SIZE, int(self.max_bytes // per_row))
+
+
+def iter_excel_chunks(path, budget=None):
+    """Yield the first sheet of `path` as compact DataFrames sized by `budget`"""
+    budget = budget or ChunkBudget()
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) for name in header]
+        chunk = []
+        for row in rows:
+            chunk.append([None if isinstance(value, str) and value in NA_STRINGS else value for value in row])
+            if len(chunk) >= budget.chunk_size:
+                df = compact_frame(pd.DataFrame(chunk, columns=columns))
+                chunk = []
+                budget.observe(df)
+                yield df
+        if chunk:
+            df = compact_frame(pd.DataFrame(chunk, columns=columns))
+            budget.observe(df)
+            yield df
+    finally:
+        workbook.close()
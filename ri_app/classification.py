@@ -0,0 +1,212 @@
+"""
+Controlled vocabularies for Product_Type and Document_Type.
+
+The crawlers label records with free text. classify_frame() maps a whole batch
+onto the fixed vocabularies below in three steps: the crawler's own label when
+it names (or is an alias of) a vocabulary entry, then keyword rules on the
+title for placeholder or unknown labels, then a small TF-IDF nearest-centroid
+model trained from RI_TYPE_TRAINING for titles no rule recognises. Anything
+still unrecognised is stored as NULL rather than a placeholder like 'Other'.
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+PRODUCT_TYPES = (
+    'Drug Product', 'Drug Substance', 'Biological', 'Vaccine', 'Medical Device', 'IVD', 'Veterinary Medicine',
+)
+DOCUMENT_TYPES = (
+    'Guidance', 'Legislation', 'Safety Communication', 'Approval', 'Consultation', 'Announcement',
+    'Letter', 'Meeting', 'Form', 'Q&A', 'Report', 'Recommendation',
+)
+
+PRODUCT_TYPE_ALIASES = {
+    'human medicine': 'Drug Product',
+    'medicinal product': 'Drug Product',
+    'small molecule': 'Drug Substance',
+    'api': 'Drug Substance',
+    'biologic': 'Biological',
+    'biosimilar': 'Biological',
+    'device': 'Medical Device',
+    'in vitro diagnostic': 'IVD',
+    'veterinary': 'Veterinary Medicine',
+}
+DOCUMENT_TYPE_ALIASES = {
+    'instructions': 'Guidance',
+    'guideline': 'Guidance',
+    'law': 'Legislation',
+    'directive': 'Legislation',
+    'order': 'Legislation',
+    'amendment': 'Legislation',
+    'resolution': 'Legislation',
+    'federal register': 'Legislation',
+    'regulation': 'Legislation',
+    'safety alert': 'Safety Communication',
+    'nda approval': 'Approval',
+    'bla approval': 'Approval',
+    'regulatory decision': 'Approval',
+    'epar': 'Approval',
+    'product info': 'Approval',
+    'petition': 'Consultation',
+    'news': 'Announcement',
+    'press release': 'Announcement',
+    'communication': 'Announcement',
+    'information note': 'Announcement',
+    'committee': 'Meeting',
+    'expert report': 'Report',
+}
+
+# Title keywords per label, checked in order; the first matching label wins
+PRODUCT_TYPE_RULES = [
+    ('IVD', [r'in[- ]vitro diagnostic', r'\bivdr?s?\b', r'diagnostic test']),
+    ('Medical Device', [r'medical devices?', r'\bdevices?\b', r'\bmdcg\b', r'\bmdr\b', r'field safety notice', r'implant']),
+    ('Vaccine', [r'vaccin\w*', r'immuni[sz]ation']),
+    ('Veterinary Medicine', [r'veterinar\w*', r'\banimal health\b']),
+    ('Biological', [r'biologic\w*', r'biosimilar\w*', r'monoclonal', r'\bblood\b', r'plasma', r'cell and gene', r'\batmp\b']),
+    ('Drug Substance', [r'active substances?', r'drug substances?', r'\bapis?\b', r'excipients?']),
+    # Not 'medicines' in agency names such as the European Medicines Agency
+    ('Drug Product', [r'\bmedicines?\b(?!\s+(?:agency|and healthcare|evaluation board))', r'medicinal products?', r'\bdrugs?\b', r'tablets?', r'marketing authori[sz]ation', r'generic']),
+]
+DOCUMENT_TYPE_RULES = [
+    ('Safety Communication', [r'field safety', r'\brecall\w*', r'safety (?:alert|notice|communication|information)', r'\bdhpc\b', r'counterfeit', r'shortage']),
+    ('Letter', [r'warning letters?', r'\bletters?\b']),
+    ('Q&A', [r'questions? and answers?', r'\bq&a\b', r'\bfaqs?\b']),
+    ('Consultation', [r'consultation', r'comments?', r'\bdraft\b', r'petition']),
+    ('Guidance', [r'guidance', r'guidelines?', r'\bguide\b', r'reflection paper']),
+    ('Legislation', [r'regulation \(eu\)', r'\bdirective\b', r'\blaw\b', r'\bact\b', r'\bdecree\b', r'federal register', r'comes? into force']),
+    ('Approval', [r'approv\w*', r'authori[sz]ed', r'\bepar\b', r'positive opinion', r'\bchmp\b']),
+    ('Meeting', [r'meeting', r'minutes', r'symposi\w*', r'workshop', r'webinar', r'conference', r'committee']),
+    ('Form', [r'\bforms?\b', r'templates?']),
+    ('Report', [r'\breports?\b', r'\breview\b', r'assessment']),
+    ('Recommendation', [r'recommend\w*', r'advice']),
+    ('Announcement', [r'announce\w*', r'launch\w*', r'press release', r'\bnews\b', r'publishe[sd]']),
+]
+
+WORD_RE = re.compile(r'[a-z][a-z0-9]+')
+# Minimum cosine similarity for the TF-IDF fallback to assign a label
+MODEL_MIN_SCORE = 0.25
+MODEL_BATCH_ROWS = 5000
+
+
+def _compile(rules):
+    return [(label, '|'.join(f'(?:{pattern})' for pattern in patterns)) for label, patterns in rules]
+
+
+class CentroidModel:
+    """TF-IDF vectors of the training titles averaged per label; predicts the nearest centroid"""
+
+    def __init__(self, texts, labels):
+        docs = [WORD_RE.findall(text.lower()) for text in texts]
+        self.vocabulary = {word: i for i, word in enumerate(sorted({w for doc in docs for w in doc}))}
+        self.labels = sorted(set(labels))
+        counts = self._counts(docs)
+        doc_freq = (counts > 0).sum(axis=0)
+        self.idf = np.log((1 + len(docs)) / (1 + doc_freq)) + 1
+        vectors = self._weigh(counts)
+        label_index = np.array([self.labels.index(label) for label in labels])
+        centroids = np.vstack([vectors[label_index == i].mean(axis=0) for i in range(len(self.labels))])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.where(norms == 0, 1, norms)
+
+    def _counts(self, docs):
+        counts = np.zeros((len(docs), len(self.vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for word in doc:
+                column = self.vocabulary.get(word)
+                if column is not None:
+                    counts[row, column] += 1
+        return counts
+
+    def _weigh(self, counts):
+        vectors = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def predict(self, texts, min_score=MODEL_MIN_SCORE):
+        """Label for each text, or None when no centroid is close enough"""
+        predictions = []
+        for start in range(0, len(texts), MODEL_BATCH_ROWS):
+            batch = [WORD_RE.findall(text.lower()) for text in texts[start:start + MODEL_BATCH_ROWS]]
+            scores = self._weigh(self._counts(batch)) @ self.centroids.T
+            best = scores.argmax(axis=1)
+            predictions.extend(
+                self.labels[i] if score >= min_score else None
+                for i, score in zip(best, scores[np.arange(len(batch)), best])
+            )
+        return predictions
+
+
+class FacetClassifier:
+    """Maps one field's crawler labels and the record titles onto its vocabulary"""
+
+    def __init__(self, vocabulary, aliases, rules, model=None):
+        self.vocabulary = vocabulary
+        self.aliases = {label.lower(): label for label in vocabulary}
+        self.aliases.update(aliases)
+        self.rules = _compile(rules)
+        self.model = model
+
+    def classify(self, raw_values, titles):
+        """Vocabulary label (or None) for each row; both arguments are pandas Series"""
+        titles = titles.fillna('').astype(str)
+        raw = raw_values.fillna('').astype(str).str.strip().str.lower()
+        labels = raw.map(self.aliases).astype(object)
+        # Title rules only label rows whose crawler label is a placeholder or unknown
+        for label, pattern in self.rules:
+            pending = labels.isna()
+            labels[pending & titles.str.contains(pattern, case=False, regex=True)] = label
+
+        pending = labels.isna() & (titles != '')
+        if self.model is not None and pending.any():
+            labels[pending] = self.model.predict(list(titles[pending]))
+        return labels.where(labels.notna(), None)
+
+
+def read_training(path):
+    """Rows of the labelled training CSV: title, Product_Type, Document_Type (either may be blank)"""
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _train(rows, field, vocabulary):
+    examples = [(row['title'], row[field]) for row in rows if row.get(field) in vocabulary]
+    if len({label for _, label in examples}) < 2:
+        return None
+    texts, labels = zip(*examples)
+    return CentroidModel(texts, labels)
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    rows = read_training(path) if path else []
+    return {
+        'Product_Type': FacetClassifier(
+            PRODUCT_TYPES, PRODUCT_TYPE_ALIASES, PRODUCT_TYPE_RULES, _train(rows, 'Product_Type', PRODUCT_TYPES)
+        ),
+        'Document_Type': FacetClassifier(
+            DOCUMENT_TYPES, DOCUMENT_TYPE_ALIASES, DOCUMENT_TYPE_RULES, _train(rows, 'Document_Type', DOCUMENT_TYPES)
+        ),
+    }
+
+
+def get_classifiers():
+    """{field: FacetClassifier}, retrained when the training file changes"""
+    path = str(getattr(settings, 'RI_TYPE_TRAINING', ''))
+    if not path or not os.path.exists(path):
+        return _load('', 0)
+    return _load(path, os.path.getmtime(path))
+
+
+def classify_frame(df, title_column='Title'):
+    """Return `df` with Product_Type and Document_Type replaced by vocabulary labels"""
+    df = df.copy()
+    titles = df[title_column] if title_column in df.columns else pd.Series('', index=df.index)
+    for field, classifier in get_classifiers().items():
+        raw = df[field] if field in df.columns else pd.Series(None, index=df.index, dtype=object)
+        df[field] = classifier.classify(raw, titles)
+    return df
@@ -0,0 +1,139 @@
+"""
+Drug name extraction against a local dictionary of INNs and brand names.
+
+The dictionary is compiled once into an Aho-Corasick automaton, so a document
+is scanned in a single pass whatever the number of terms. Matches must start
+and end on word boundaries.
+"""
+import os
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+# Keeps the joined list within RegulatoryRecord.Drug_names
+DRUG_NAMES_MAX_LENGTH = 200
+
+
+def read_dictionary(path):
+    """
+    Parse a dictionary file: one name per line, or 'alias = canonical name'.
+    Blank lines and lines starting with '#' are ignored. Returns {term: canonical}.
+    """
+    terms = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            alias, _, canonical = line.partition('=')
+            canonical = (canonical or alias).strip()
+            terms[alias.strip().lower()] = canonical
+            terms.setdefault(canonical.lower(), canonical)
+    return terms
+
+
+class DrugMatcher:
+    """Aho-Corasick automaton over lower-cased dictionary terms"""
+
+    def __init__(self, terms):
+        self.terms = dict(terms)
+        # State 0 is the root; each state has transitions, a failure link and outputs
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for term, canonical in self.terms.items():
+            state = 0
+            for char in term:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((len(term), canonical))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state].extend(self.output[self.fail[next_state]])
+
+    def __len__(self):
+        return len(self.terms)
+
+    def normalize(self, name):
+        """The canonical spelling of a known name, else the name unchanged"""
+        return self.terms.get(name.strip().lower(), name.strip())
+
+    def scan(self, text):
+        """Yield (start, canonical) for every whole-word term in `text` (already lower-cased)"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, canonical in output[state]:
+                start = end - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    yield start, canonical
+
+    def extract(self, text):
+        """Canonical names found in `text`, in order of first mention"""
+        return list(dict.fromkeys(canonical for _, canonical in sorted(self.scan((text or '').lower()))))
+
+    def extract_many(self, texts):
+        """
+        extract() for a sequence of documents in one pass: the documents are
+        joined with newlines (never part of a term) and each match is mapped
+        back to its document by offset. Documents are lower-cased one by one,
+        as lower-casing can change a string's length.
+        """
+        texts = [(text or '').lower() for text in texts]
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        found = [dict() for _ in starts]
+        for start, canonical in self.scan('\n'.join(texts)):
+            found[bisect_right(starts, start) - 1].setdefault(canonical, start)
+        return [sorted(names, key=names.get) for names in found]
+
+
+def _dictionary_path():
+    return str(getattr(settings, 'RI_DRUG_DICTIONARY', ''))
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    return DrugMatcher(read_dictionary(path))
+
+
+def get_drug_matcher():
+    """The compiled dictionary, rebuilt when the file changes. None without a dictionary."""
+    path = _dictionary_path()
+    if not path or not os.path.exists(path):
+        return None
+    return _load(path, os.path.getmtime(path))
+
+
+def join_drug_names(names):
+    """Comma-separated list that fits the Drug_names column; None if empty"""
+    joined = ''
+    for name in names:
+        candidate = f'{joined}, {name}' if joined else name
+        if len(candidate) > DRUG_NAMES_MAX_LENGTH:
+            break
+        joined = candidate
+    return joined or None
@@ -0,0 +1,236 @@
+"""
+Streaming CSV and XLSX export of dashboard results.
+
+Rows are encoded as they come off a queryset iterator and handed to the
+response in small chunks, so memory stays flat however many rows match and
+the download starts before the query has finished. openpyxl's write-only mode
+keeps memory flat too but assembles the whole file before it can be sent, so
+the XLSX package is written here directly into a streamed zip.
+"""
+import csv
+import re
+import tempfile
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape, quoteattr
+
+# (header, field) in export order; the title links to the article
+EXPORT_COLUMNS = [
+    ('Title', 'title'),
+    ('Date', 'date'),
+    ('Agency', 'agency'),
+    ('Category', 'category'),
+    ('Product Type', 'Product_Type'),
+    ('Document Type', 'Document_Type'),
+    ('Drug Names', 'Drug_names'),
+    ('Summary', 'summary'),
+    ('Article URL', 'article_url'),
+]
+EXPORT_FIELDS = ('id',) + tuple(field for _, field in EXPORT_COLUMNS)
+
+# Rows encoded between two yields
+ROWS_PER_CHUNK = 500
+
+# Excel refuses longer cells and more hyperlinks per sheet
+MAX_CELL_CHARS = 32767
+MAX_HYPERLINKS = 65530
+
+EXCEL_EPOCH = date(1899, 12, 30)
+# Characters XML 1.0 cannot carry, even escaped
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def cell_text(value):
+    return '' if value is None else str(value)
+
+
+class _Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield the rows (dicts keyed by field) as UTF-8 CSV with a header"""
+    writer = csv.writer(_Echo())
+    # The BOM makes Excel read the file as UTF-8
+    yield '\ufeff' + writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([cell_text(row[field]) for _, field in EXPORT_COLUMNS]))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _ZipBuffer:
+    """Unseekable sink for zipfile; whatever it received is drained after each chunk"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _string_cell(value, style=0):
+    text = INVALID_XML_CHARS.sub('', cell_text(value))[:MAX_CELL_CHARS]
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _cell(value, style=0):
+    if isinstance(value, date):
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    if value is None:
+        return '<c/>'
+    return _string_cell(value, style)
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Results" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Cell styles: 0 default, 1 date, 2 bold header, 3 hyperlink
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="3"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '<font><u/><sz val="11"/><color rgb="FF0563C1"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" '
+    'state="frozen"/></sheetView></sheetViews>'
+    '<cols><col min="1" max="1" width="60" customWidth="1"/><col min="2" max="2" width="12" customWidth="1"/>'
+    '<col min="8" max="8" width="80" customWidth="1"/></cols>'
+    '<sheetData>'
+)
+
+
+def stream_xlsx(rows):
+    """
+    Yield an .xlsx workbook holding the rows (dicts keyed by field). Titles
+    link to the article; the link targets are spooled to a temporary file
+    because they belong in a part written after the sheet.
+    """
+    buffer = _ZipBuffer()
+    package = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED)
+    for name, content in [
+        ('[Content_Types].xml', CONTENT_TYPES),
+        ('_rels/.rels', ROOT_RELS),
+        ('xl/workbook.xml', WORKBOOK),
+        ('xl/_rels/workbook.xml.rels', WORKBOOK_RELS),
+        ('xl/styles.xml', STYLES),
+    ]:
+        package.writestr(name, content)
+
+    links = 0
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as targets, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as anchors:
+        with package.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(_string_cell(header, style=2) for header, _ in EXPORT_COLUMNS)
+            sheet.write(f'{SHEET_HEAD}<row r="1">{header}</row>'.encode('utf-8'))
+            yield buffer.drain()
+
+            chunk = []
+            for row_number, row in enumerate(rows, start=2):
+                url = INVALID_XML_CHARS.sub('', cell_text(row['article_url']))
+                linked = bool(url) and links < MAX_HYPERLINKS
+                cells = [
+                    _string_cell(row[field], style=3) if field == 'title' and linked else _cell(row[field])
+                    for _, field in EXPORT_COLUMNS
+                ]
+                chunk.append(f'<row r="{row_number}">{"".join(cells)}</row>')
+                if linked:
+                    links += 1
+                    anchors.write(f'<hyperlink ref="A{row_number}" r:id="rId{links}"/>')
+                    targets.write(
+                        f'<Relationship Id="rId{links}" Type="http://schemas.openxmlformats.org/'
+                        f'officeDocument/2006/relationships/hyperlink" Target={quoteattr(url)} '
+                        f'TargetMode="External"/>'
+                    )
+                if len(chunk) >= ROWS_PER_CHUNK:
+                    sheet.write(''.join(chunk).encode('utf-8'))
+                    chunk = []
+                    yield buffer.drain()
+            sheet.write(''.join(chunk).encode('utf-8') + b'</sheetData>')
+            if links:
+                sheet.write(b'<hyperlinks>')
+                _copy(anchors, sheet)
+                sheet.write(b'</hyperlinks>')
+            sheet.write(b'</worksheet>')
+        yield buffer.drain()
+
+        with package.open('xl/worksheets/_rels/sheet1.xml.rels', 'w', force_zip64=True) as rels:
+            rels.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            )
+            _copy(targets, rels)
+            rels.write(b'</Relationships>')
+    package.close()
+    yield buffer.drain()
+
+
+def _copy(spool, target, block_chars=1024 * 1024):
+    """Write a spooled text file into a zip member"""
+    spool.seek(0)
+    for block in iter(lambda: spool.read(block_chars), ''):
+        target.write(block.encode('utf-8'))
@@ -0,0 +1,78 @@
+import logging
+import re
+from datetime import datetime
+
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# GET parameters understood by filter_queryset
+FILTER_PARAMS = (
+    'viewed', 'date_range', 'product_type', 'document_type', 'drug_name', 'search',
+)
+
+
+def split_drug_names(value):
+    """The individual names of a comma-separated Drug_names value"""
+    return [drug.strip() for drug in (value or '').split(',') if drug.strip()]
+
+
+def drug_name_q(drug_name):
+    """Records whose comma-separated Drug_names include `drug_name` as a whole entry, ignoring case"""
+    return Q(Drug_names__iregex=rf'(^|,)\s*{re.escape(drug_name.strip())}\s*(,|$)')
+
+
+def drug_name_facets(queryset):
+    """Sorted individual names from the comma-separated Drug_names of `queryset`"""
+    drug_names = set()
+    values = queryset.exclude(Drug_names__isnull=True).order_by().values_list('Drug_names', flat=True).distinct()
+    for value in values:
+        drug_names.update(split_drug_names(value))
+    return sorted(drug_names)
+
+
+def filter_queryset(queryset, params):
+    """
+    Apply the dashboard filters in `params` (request.GET or a dict) to a
+    RegulatoryData or ArchivedRegulatoryData queryset.
+    """
+    # Viewed status filter
+    viewed_status = params.get('viewed')
+    if viewed_status == 'read':
+        queryset = queryset.filter(viewed=True)
+    elif viewed_status == 'unread':
+        queryset = queryset.filter(viewed=False)
+
+    # Date Filtering
+    date_range = params.get('date_range')
+    if date_range and 'to' in date_range:
+        try:
+            date_from_str, date_to_str = date_range.split(' to ')
+            # Parse as YYYY-MM-DD (matches database storage)
+            date_from = datetime.strptime(date_from_str.strip(), '%Y-%m-%d').date()
+            date_to = datetime.strptime(date_to_str.strip(), '%Y-%m-%d').date()
+            queryset = queryset.filter(date__gte=date_from, date__lte=date_to)
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring malformed date_range {date_range!r}: {e}")
+
+    # Filtering
+    product_type = params.get('product_type')
+    if product_type:
+        queryset = queryset.filter(Product_Type=product_type)
+
+    document_type = params.get('document_type')
+    if document_type:
+        queryset = queryset.filter(Document_Type=document_type)
+
+    drug_name = params.get('drug_name')
+    if drug_name:
+        queryset = queryset.filter(drug_name_q(drug_name))
+
+    search = params.get('search')
+    if search:
+        queryset = queryset.filter(
+            Q(title__icontains=search) |
+            Q(summary__icontains=search)
+        )
+
+    return queryset
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from ...archive import archive_older_than, hot_window_cutoff
+from ...models import RegulatoryData
+
+
+class Command(BaseCommand):
+    help = 'Move RegulatoryData rows older than the hot window to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            help='Hot window in months (defaults to settings.RI_HOT_WINDOW_MONTHS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows moved per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be archived'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = hot_window_cutoff(options['months'])
+
+        if options['dry_run']:
+            count = RegulatoryData.objects.filter(date__lt=cutoff).count()
+            self.stdout.write(f"{count} records dated before {cutoff} would be archived")
+            return
+
+        moved = archive_older_than(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} records dated before {cutoff}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...related import TOP_K, update_related
+
+
+class Command(BaseCommand):
+    help = 'Update the related-articles index for records imported since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=TOP_K,
+            help='Neighbours kept per record (changing it rebuilds the index)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute every neighbour list from scratch'
+        )
+
+    def handle(self, *args, **options):
+        computed = update_related(k=options['k'], rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(f"Computed related articles for {computed} records"))
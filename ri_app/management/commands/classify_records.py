@@ -0,0 +1,58 @@
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...caching import bump_data_version
+from ...classification import classify_frame
+from ...models import ArchivedRegulatoryData, RegulatoryData
+from ...rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Re-map Product_Type and Document_Type of stored records onto the controlled vocabularies'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows classified and updated per transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would change'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (RegulatoryData, ArchivedRegulatoryData):
+            changed = self.classify_model(model, options['batch_size'], options['dry_run'])
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {changed} rows relabelled")
+            total += changed
+        if total and not options['dry_run']:
+            # Document_Type is a rollup dimension
+            rebuild_rollups()
+            bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f"{'Would relabel' if options['dry_run'] else 'Relabelled'} {total} rows"))
+
+    def classify_model(self, model, batch_size, dry_run):
+        fields = ['id', 'title', 'Product_Type', 'Document_Type']
+        rows = model.objects.order_by('id').values_list(*fields)
+        changed = 0
+        last_id = 0
+        while True:
+            batch = pd.DataFrame(list(rows.filter(id__gt=last_id)[:batch_size]), columns=fields)
+            if batch.empty:
+                return changed
+            last_id = int(batch['id'].iloc[-1])
+            labelled = classify_frame(batch.rename(columns={'title': 'Title'}))
+            updates = [
+                model(id=row.id, Product_Type=row.Product_Type, Document_Type=row.Document_Type)
+                for row, old in zip(labelled.itertuples(index=False), batch.itertuples(index=False))
+                if (row.Product_Type, row.Document_Type) != (old.Product_Type, old.Document_Type)
+            ]
+            changed += len(updates)
+            if updates and not dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(updates, ['Product_Type', 'Document_Type'])
@@ -0,0 +1,368 @@
+import os
+import io
+import re
+import json
+import time
+import signal
+import socket
+import sqlite3
+import platform
+import tempfile
+import threading
+import subprocess
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import django
+import numpy as np
+import requests
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from ...models import RegulatoryData
+from ...synthetic import WORDS, DRUGS, generate_records, write_crawler_files
+from ...classification import DOCUMENT_TYPES, PRODUCT_TYPES
+from .run_crawlers import Command as CrawlersCommand
+
+LOADTEST_PASSWORD = 'load-test-pass-123'
+
+# Relative weight of each request type in a virtual user's session
+DEFAULT_MIX = {
+    'dashboard': 15,
+    'filter': 25,
+    'search': 20,
+    'page': 15,
+    'detail': 20,
+    'mark_read': 5,
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(value):
+    """'filter=30,search=10' -> weights merged over DEFAULT_MIX"""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (value or '').split(',')):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise CommandError(f"Unknown request type '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class RequestMix:
+    """Draws realistic dashboard, detail and mark-read requests from a seeded RNG"""
+
+    def __init__(self, weights, ids, seed=0):
+        self.names = list(weights)
+        total = sum(weights.values())
+        self.probabilities = [weights[name] / total for name in self.names]
+        self.ids = ids
+        self.rng = np.random.default_rng(seed)
+
+    def choice(self, values):
+        return values[self.rng.integers(len(values))]
+
+    def next(self):
+        """(endpoint name, method, path, params or JSON body)"""
+        name = self.names[self.rng.choice(len(self.names), p=self.probabilities)]
+        if name == 'dashboard':
+            return name, 'GET', '/', {}
+        if name == 'filter':
+            today = datetime.now().date()
+            params = self.choice([
+                {'product_type': self.choice(PRODUCT_TYPES)},
+                {'document_type': self.choice(DOCUMENT_TYPES)},
+                {'drug_name': self.choice(DRUGS)},
+                {'viewed': self.choice(['read', 'unread'])},
+                {'date_range': f'{today - timedelta(days=int(self.rng.integers(7, 365)))} to {today}'},
+            ])
+            return name, 'GET', '/', params
+        if name == 'search':
+            return name, 'GET', '/', {'search': ' '.join(self.rng.choice(WORDS, size=self.rng.integers(1, 3)))}
+        if name == 'page':
+            return name, 'GET', '/', {'page': str(self.rng.integers(2, 11))}
+        item_id = self.choice(self.ids)
+        if name == 'detail':
+            return name, 'GET', f'/item/{item_id}/', {}
+        return name, 'POST', f'/update_viewed/{item_id}/', {'viewed': bool(self.rng.integers(2))}
+
+
+def summarize_latencies(samples, seconds):
+    """
+    Throughput and latency percentiles per endpoint from (endpoint, ms, ok)
+    samples collected over `seconds`, plus an 'all' row.
+    """
+    by_endpoint = defaultdict(list)
+    errors = defaultdict(int)
+    for endpoint, ms, ok in samples:
+        for key in (endpoint, 'all'):
+            by_endpoint[key].append(ms)
+            errors[key] += not ok
+    summary = {}
+    for endpoint, latencies in sorted(by_endpoint.items()):
+        values = np.percentile(latencies, PERCENTILES)
+        summary[endpoint] = {
+            'requests': len(latencies),
+            'errors': errors[endpoint],
+            'rps': len(latencies) / seconds if seconds else 0.0,
+            'mean_ms': float(np.mean(latencies)),
+            **{f'p{p}_ms': float(v) for p, v in zip(PERCENTILES, values)},
+            'max_ms': float(np.max(latencies)),
+        }
+    return summary
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Load-test the web tier with concurrent logged-in users on a synthetic database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000, help='Synthetic rows to seed')
+        parser.add_argument('--users', type=int, default=20, help='Accounts the virtual users log in as')
+        parser.add_argument(
+            '--concurrency',
+            nargs='+',
+            type=int,
+            default=[1, 8, 32],
+            help='Concurrent virtual users; each level is measured in turn'
+        )
+        parser.add_argument('--duration', type=float, default=30, help='Seconds measured per concurrency level')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before each level')
+        parser.add_argument(
+            '--mix',
+            help=f"Request weights, e.g. 'filter=30,mark_read=0' (default {DEFAULT_MIX})"
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the corpus and request mix')
+        parser.add_argument(
+            '--server',
+            choices=['gunicorn', 'runserver'],
+            default='gunicorn',
+            help='Server started for the test'
+        )
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+        parser.add_argument(
+            '--conn-max-age',
+            type=int,
+            default=0,
+            help='CONN_MAX_AGE for the server (persistent database connections)'
+        )
+        parser.add_argument('--wal', action='store_true', help='Put the SQLite database in WAL mode')
+        parser.add_argument('--output', help='Where to write the JSON results')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if connection.vendor != 'sqlite':
+            raise CommandError("load_test seeds a throwaway SQLite database; run it with the SQLite settings")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, 'loadtest.sqlite3')
+            self.stdout.write(f"Seeding {options['rows']:,} rows into {db_path}...")
+            started = time.perf_counter()
+            ids = self.seed_database(db_path, workdir, options)
+            self.stdout.write(f"Seeded {len(ids):,} records in {time.perf_counter() - started:.1f}s")
+
+            port = free_port()
+            server = self.start_server(port, db_path, workdir, options)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                self.wait_until_ready(base_url, server)
+                levels = {}
+                for concurrency in options['concurrency']:
+                    self.stdout.write(f"Running {concurrency} concurrent users for {options['duration']:g}s...")
+                    levels[str(concurrency)] = self.run_level(base_url, concurrency, ids, mix, options)
+                    self.print_level(concurrency, levels[str(concurrency)])
+            finally:
+                self.stop_server(server)
+
+        results = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'config': {
+                'rows': options['rows'],
+                'users': options['users'],
+                'duration': options['duration'],
+                'seed': options['seed'],
+                'mix': mix,
+                'server': options['server'],
+                'workers': options['workers'] if options['server'] == 'gunicorn' else 1,
+                'threads': options['threads'] if options['server'] == 'gunicorn' else None,
+                'database': 'sqlite',
+                'conn_max_age': options['conn_max_age'],
+                'wal': options['wal'],
+            },
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+            },
+            'results': levels,
+        }
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+    def seed_database(self, db_path, workdir, options):
+        """
+        Migrate a fresh SQLite file and fill it through the normal import.
+        The command's connection points at it only while seeding.
+        Returns the ids of the seeded records.
+        """
+        old_name = connection.settings_dict['NAME']
+        connection.close()
+        connection.settings_dict['NAME'] = db_path
+        try:
+            with override_settings(
+                BASE_DIR=workdir,
+                CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': os.path.join(workdir, 'cache'),
+                }},
+                RI_RELATED_INDEX=os.path.join(workdir, 'related_index.npz'),
+            ):
+                call_command('migrate', verbosity=0, interactive=False)
+                write_crawler_files(workdir, generate_records(options['rows'], seed=options['seed']))
+                crawler = CrawlersCommand(stdout=io.StringIO(), stderr=io.StringIO())
+                crawler.workspace = workdir
+                if not (crawler.combine_excel_files() and crawler.import_to_django()):
+                    raise CommandError("Seeding the load-test database failed")
+                for i in range(options['users']):
+                    User.objects.create_user(f'loadtest-{i}', password=LOADTEST_PASSWORD)
+                ids = list(RegulatoryData.objects.values_list('id', flat=True))
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+
+        if options['wal']:
+            with sqlite3.connect(db_path) as db:
+                db.execute('PRAGMA journal_mode=WAL')
+        return ids
+
+    def start_server(self, port, db_path, workdir, options):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'regulatory_intelligence.settings'),
+            RI_DATABASE_NAME=db_path,
+            RI_CACHE_DIR=os.path.join(workdir, 'cache'),
+            RI_CONN_MAX_AGE=str(options['conn_max_age']),
+        )
+        if options['server'] == 'gunicorn':
+            command = [
+                sys.executable, '-m', 'gunicorn', 'regulatory_intelligence.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--threads', str(options['threads']),
+                '--log-level', 'warning',
+            ]
+        else:
+            command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+        log = open(os.path.join(workdir, 'server.log'), 'wb')
+        # Own process group so every worker is stopped with the server
+        return subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    def wait_until_ready(self, base_url, server, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Server exited with code {server.returncode}")
+            try:
+                if requests.get(f'{base_url}/login/', timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise CommandError(f"Server did not answer within {timeout}s")
+
+    def stop_server(self, server):
+        for sig, wait in ((signal.SIGTERM, 10), (signal.SIGKILL, 5)):
+            try:
+                os.killpg(server.pid, sig)
+                server.wait(timeout=wait)
+                return
+            except ProcessLookupError:
+                return
+            except subprocess.TimeoutExpired:
+                continue
+
+    def login(self, base_url, username):
+        session = requests.Session()
+        page = session.get(f'{base_url}/login/', timeout=30)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page.text)
+        response = session.post(
+            f'{base_url}/login/',
+            data={
+                'username': username,
+                'password': LOADTEST_PASSWORD,
+                'csrfmiddlewaretoken': token.group(1) if token else '',
+            },
+            headers={'Referer': f'{base_url}/login/'},
+            allow_redirects=False,
+            timeout=30,
+        )
+        if response.status_code != 302:
+            raise CommandError(f"Could not log in as {username} (status {response.status_code})")
+        return session
+
+    def run_level(self, base_url, concurrency, ids, mix, options):
+        """Drive `concurrency` virtual users; only requests after the warmup are counted"""
+        sessions = [
+            self.login(base_url, f'loadtest-{i % options["users"]}') for i in range(concurrency)
+        ]
+        samples = []
+        lock = threading.Lock()
+        measure_from = time.monotonic() + options['warmup']
+        deadline = measure_from + options['duration']
+
+        def virtual_user(index):
+            requests_mix = RequestMix(mix, ids, seed=options['seed'] * 1000 + index)
+            session = sessions[index]
+            local = []
+            while time.monotonic() < deadline:
+                endpoint, method, path, payload = requests_mix.next()
+                started = time.monotonic()
+                try:
+                    if method == 'GET':
+                        response = session.get(base_url + path, params=payload, timeout=60)
+                    else:
+                        response = session.post(base_url + path, json=payload, timeout=60)
+                    # A page past the end of a narrow filter is a valid answer
+                    ok = response.status_code in (200, 404) and not response.history
+                except requests.RequestException:
+                    ok = False
+                finished = time.monotonic()
+                if started >= measure_from and finished <= deadline:
+                    local.append((endpoint, (finished - started) * 1000, ok))
+            with lock:
+                samples.extend(local)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(virtual_user, range(concurrency)))
+        return summarize_latencies(samples, options['duration'])
+
+    def print_level(self, concurrency, summary):
+        self.stdout.write(
+            f"\n{concurrency} users: {summary.get('all', {}).get('rps', 0):.1f} req/s\n"
+            f"  {'endpoint':<10} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+        )
+        for endpoint, stats in summary.items():
+            self.stdout.write(
+                f"  {endpoint:<10} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>6.1f}ms {stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms"
+            )
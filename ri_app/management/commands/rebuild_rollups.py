@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the analytics rollup table from both record tiers'
+
+    def handle(self, *args, **options):
+        buckets = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} rollup buckets"))
@@ -0,0 +1,202 @@
+import os
+import io
+import json
+import time
+import platform
+import tempfile
+from datetime import datetime, timedelta
+import django
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from ...models import RegulatoryData
+from ...synthetic import generate_records, write_crawler_files, write_reference_csv
+from ...views import DashboardView
+from .run_crawlers import Command as CrawlersCommand
+
+PIPELINE_STAGES = [
+    'combine_excel_files',
+    'convert_excel_to_db',
+    'compare_with_github_csv',
+    'export_news_to_docx',
+    'import_to_django',
+]
+
+
+def dashboard_queries():
+    """Representative dashboard filter combinations, keyed by name"""
+    today = datetime.now().date()
+    return {
+        'unfiltered': {},
+        'search': {'search': 'safety signal'},
+        'product_type': {'product_type': 'Drug Product'},
+        'document_type': {'document_type': 'Guidance'},
+        'drug_name': {'drug_name': 'semaglutide'},
+        'date_range': {'date_range': f'{today - timedelta(days=90)} to {today}'},
+        'unread_deep_page': {'viewed': 'unread', 'page': '10'},
+    }
+
+
+def compare_results(current, baseline, threshold, noise_floor=0.005):
+    """
+    List timings in `current` that are slower than `baseline` by more than
+    `threshold` (a fraction). Differences below `noise_floor` seconds are ignored.
+    """
+    regressions = []
+    for size, groups in current['results'].items():
+        base_groups = baseline.get('results', {}).get(size, {})
+        for group in ('pipeline', 'dashboard'):
+            for name, timing in groups.get(group, {}).items():
+                base = base_groups.get(group, {}).get(name)
+                if not base:
+                    continue
+                now, before = timing['seconds'], base['seconds']
+                if now > before * (1 + threshold) and now - before > noise_floor:
+                    regressions.append({
+                        'size': size,
+                        'stage': f'{group}.{name}',
+                        'baseline': before,
+                        'current': now,
+                        'change': (now - before) / before if before else None,
+                    })
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the crawler pipeline stages and dashboard queries on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help='Corpus sizes (rows) to benchmark'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic corpus')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per dashboard query; the fastest is reported'
+        )
+        parser.add_argument('--output', help='Where to write the JSON results')
+        parser.add_argument('--baseline', help='Earlier results JSON to compare against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Slowdown (fraction) against the baseline that counts as a regression'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error if any regression is found'
+        )
+
+    def handle(self, *args, **options):
+        results = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'seed': options['seed'],
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'pandas': pd.__version__,
+                'database': connection.vendor,
+                'machine': platform.machine(),
+            },
+            'results': {},
+        }
+
+        # Never touch the real database: benchmark against a throwaway test database
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for size in options['sizes']:
+                self.stdout.write(f"Benchmarking {size:,} rows...")
+                results['results'][str(size)] = self.benchmark_size(size, options['seed'], options['repeat'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.print_results(results)
+        self.stdout.write(self.style.SUCCESS(f"Results saved to {output}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare_results(results, baseline, options['threshold'])
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"REGRESSION {r['size']} rows {r['stage']}: "
+                    f"{r['baseline']:.4f}s -> {r['current']:.4f}s"
+                ))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+            elif options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} benchmark regression(s)")
+
+    def benchmark_size(self, size, seed=0, repeat=3):
+        """Time every pipeline stage and dashboard query for one corpus size"""
+        result = {'pipeline': {}, 'dashboard': {}}
+        with tempfile.TemporaryDirectory() as workdir, override_settings(
+            BASE_DIR=workdir, RI_RELATED_INDEX=os.path.join(workdir, 'related_index.npz')
+        ):
+            started = time.perf_counter()
+            corpus = generate_records(size, seed=seed)
+            write_crawler_files(workdir, corpus)
+            reference = write_reference_csv(os.path.join(workdir, 'reference.csv'), corpus, seed=seed)
+            result['generate_seconds'] = time.perf_counter() - started
+
+            crawler = CrawlersCommand(stdout=io.StringIO(), stderr=io.StringIO())
+            crawler.GITHUB_CSV_URL = reference
+            crawler.workspace = workdir
+            for stage in PIPELINE_STAGES:
+                started = time.perf_counter()
+                ok = getattr(crawler, stage)()
+                result['pipeline'][stage] = {'seconds': time.perf_counter() - started, 'ok': bool(ok)}
+
+        result['rows_imported'] = RegulatoryData.objects.count()
+
+        user, _ = User.objects.get_or_create(username='benchmark')
+        factory = RequestFactory()
+        view = DashboardView.as_view()
+        for name, params in dashboard_queries().items():
+            best = None
+            for _ in range(repeat):
+                request = factory.get('/', params)
+                request.user = user
+                # No auth session, so the page cache and 304 path are bypassed
+                request.session = {}
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    try:
+                        status = view(request).render().status_code
+                    except Http404:
+                        # Page number past the end on small corpora
+                        status = 404
+                    elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            result['dashboard'][name] = {
+                'seconds': best,
+                'queries': len(queries),
+                'status': status,
+            }
+        return result
+
+    def print_results(self, results):
+        for size, result in results['results'].items():
+            self.stdout.write(f"\n{int(size):,} rows ({result['rows_imported']:,} imported)")
+            for group in ('pipeline', 'dashboard'):
+                for name, timing in result[group].items():
+                    extra = f"  {timing['queries']} queries" if 'queries' in timing else ''
+                    self.stdout.write(f"  {group:<9} {name:<24} {timing['seconds']:>9.4f}s{extra}")
@@ -2,10 +2,9 @@ import os
 import glob
 import time
 import logging
-import tempfile
 import requests
-import subprocess
 import pandas as pd
+import shutil
 import sqlite3
 from django.core.management.base import BaseCommand
 from django.conf import settings
@@ -14,7 +13,26 @@ from docx.shared import Pt
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from datetime import datetime, timedelta
-from ...models import RegulatoryData
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from ...models import RegulatoryData, ArchivedRegulatoryData, CrawlerRun, ImportRun, make_excerpt
+from ...archive import archive_ids, hot_window_cutoff
+from ...caching import bump_data_version, publish_import_generation
+from ...percolator import percolate_import_run
+from ...drugs import get_drug_matcher, join_drug_names
+from ...classification import classify_frame
+from ...related import update_related
+from ...typeahead import build_index as build_typeahead_index
+from ...rollups import apply_deltas, count_queryset, count_records, record_inserted
+from ...scheduling import PIPELINE_OUTPUTS, RunLock
+from ...sandbox import CrawlerSandbox
+from ...validation import describe, quarantine, save_report, validate_frame
+from ...chunks import ChunkBudget, iter_excel_chunks
+from ...canonical import url_key, url_keys
+from ...pipeline import (
+    FAILED, BLOCKED, Pipeline, Stage, file_digest, latest_workspace, new_workspace, prune_workspaces,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -58,11 +76,38 @@ class Command(BaseCommand):
         "https://raw.githubusercontent.com/MariaKlap/RI/refs/heads/main/SEnsa.py",
     ]
 
+    # Previously published RI.csv that new articles are compared against
+    GITHUB_CSV_URL = "https://raw.githubusercontent.com/MariaKlap/Master-Script/refs/heads/main/RI.csv"
+
+    # Fields a reloaded record takes from the crawlers; its id, import run and viewed flag are kept
+    RELOADED_FIELDS = [
+        'title', 'summary', 'excerpt', 'date', 'article_url', 'Product_Type', 'Document_Type', 'Drug_names',
+        'source_file', 'agency', 'category',
+    ]
+
+    # Files published from the run workspace to BASE_DIR by the last stage
+    PUBLISHED_FILES = ['RI.xlsx', 'RI_archive.xlsx', 'RI.csv', 'News.xlsx', 'RI_News.docx']
+
+    # Directory the stages read and write; handle() points it at a per-run workspace
+    workspace = None
+
+    STAGE_NAMES = ['crawl', 'combine', 'convert', 'compare', 'docx', 'import', 'publish']
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--force',
             action='store_true',
-            help='Force run all crawlers even if recent data exists'
+            help='Re-run every stage even if its checkpoint is up to date'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue in the latest run workspace, skipping stages whose inputs have not changed'
+        )
+        parser.add_argument(
+            '--from-stage',
+            choices=self.STAGE_NAMES,
+            help='Resume the latest run, re-running this stage and everything after it'
         )
         parser.add_argument(
             '--skip-docx',
@@ -79,6 +124,17 @@ class Command(BaseCommand):
             action='store_true',
             help='Keep existing data in database'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Import RI.xlsx this many rows at a time (default 5000)'
+        )
+        parser.add_argument(
+            '--max-memory',
+            type=int,
+            metavar='MB',
+            help='Size import chunks to stay within roughly this many MB'
+        )
 
     def handle(self, *args, **options):
         # Set up logging
@@ -89,36 +145,106 @@ class Command(BaseCommand):
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
+        lock = RunLock()
+        if not lock.acquire():
+            logging.warning("⚠️ Another crawl run holds the lock, exiting")
+            self.stdout.write(self.style.WARNING("Another crawl run is in progress"))
+            return
+
         self.stdout.write(self.style.SUCCESS("=== Starting Regulatory Intelligence Data Collection ==="))
         logging.info("=== Batch GitHub Execution Started ===")
         
         try:
-            # Run all crawlers
-            for url in self.GITHUB_SCRIPTS:
-                self.download_and_run_script(url)
-            
-            # Combine and process data
-            if self.combine_excel_files():
-                if self.convert_excel_to_db():
-                    if self.compare_with_github_csv():
-                        if not options['skip_docx']:
-                            self.export_news_to_docx()
-            
-            # Import data to Django models
-            self.import_to_django(options['keep_old_data'])
-            
+            resume = options['resume'] or options['from_stage']
+            self.workspace = (resume and latest_workspace()) or new_workspace()
+            logging.info(f"📂 Run workspace: {self.workspace}")
+            self.stdout.write(f"Workspace: {self.workspace}")
+
+            pipeline = Pipeline(self.pipeline_stages(options), self.workspace, self.run_stage)
+            results = pipeline.run(
+                from_stage=options['from_stage'],
+                force=options['force'],
+                skip={'docx'} if options['skip_docx'] else (),
+            )
+            for name, status in results.items():
+                logging.info(f"🧩 Stage {name}: {status}")
+                self.stdout.write(f"  {name:<8} {status}")
+
             # Cleanup if requested
             if options['cleanup']:
                 self.cleanup_temp_files()
-            
-            self.stdout.write(self.style.SUCCESS("=== Successfully Completed Data Collection ==="))
+            prune_workspaces(getattr(settings, 'RI_PIPELINE_KEEP', 5))
+
+            if any(status in (FAILED, BLOCKED) for status in results.values()):
+                self.stdout.write(self.style.WARNING(
+                    "=== Data Collection finished with failed stages, fix and rerun with --resume ==="
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("=== Successfully Completed Data Collection ==="))
             logging.info("=== Batch GitHub Execution Completed ===")
         
         except Exception as e:
             logger.error(f"Critical error in run_crawlers: {str(e)}")
             self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+        finally:
+            lock.release()
+
+    def path(self, name):
+        """Location of a pipeline file in the current workspace"""
+        return os.path.join(self.workspace or settings.BASE_DIR, name)
+
+    def pipeline_stages(self, options):
+        """
+        The pipeline as a graph of stages. Inputs and outputs are file patterns
+        in the workspace; params are the other things a stage's result depends on.
+        """
+        crawler_files = dict(exclude=PIPELINE_OUTPUTS)
+        return [
+            Stage('crawl', 'run_all_crawlers', outputs=['*.xlsx'], **crawler_files,
+                  params={'scripts': self.GITHUB_SCRIPTS}),
+            Stage('combine', 'combine_excel_files', inputs=['*.xlsx'], **crawler_files,
+                  outputs=['RI.xlsx', 'RI_archive.xlsx'], after=['crawl'],
+                  params={
+                      'cutoff': hot_window_cutoff().isoformat(),
+                      'training': file_digest(settings.RI_TYPE_TRAINING),
+                  }),
+            Stage('convert', 'convert_excel_to_db', inputs=['RI.xlsx'], outputs=['RI.csv'],
+                  after=['combine']),
+            Stage('compare', 'compare_with_github_csv', inputs=['RI.csv'], outputs=['News.xlsx'],
+                  after=['convert'], params={'reference': self.GITHUB_CSV_URL}),
+            Stage('docx', 'export_news_to_docx', inputs=['News.xlsx'], outputs=['RI_News.docx'],
+                  after=['compare']),
+            Stage('import', 'import_to_django', inputs=['RI.xlsx', 'RI_archive.xlsx'], after=['combine'],
+                  params={
+                      'keep_old_data': options['keep_old_data'],
+                      'dictionary': file_digest(settings.RI_DRUG_DICTIONARY),
+                  },
+                  kwargs={
+                      'keep_old_data': options['keep_old_data'],
+                      'chunk_size': options.get('chunk_size'),
+                      'max_memory': options.get('max_memory'),
+                  }),
+            # Last, so a failed or blocked stage leaves the previous results published
+            Stage('publish', 'publish_outputs', inputs=self.PUBLISHED_FILES, after=['docx', 'import']),
+        ]
+
+    def run_stage(self, stage):
+        logging.info(f"▶️ Stage {stage.name}")
+        started = time.perf_counter()
+        ok = getattr(self, stage.method)(**stage.kwargs)
+        logging.info(f"⏱️ Stage {stage.name} {'finished' if ok else 'failed'} in {time.perf_counter() - started:.1f}s")
+        return ok
+
+    def run_all_crawlers(self):
+        """Run every crawler; succeeds if at least one of them did"""
+        results = [self.download_and_run_script(url) for url in self.GITHUB_SCRIPTS]
+        return any(results)
 
     def download_and_run_script(self, url):
+        """
+        Download a crawler and run it in the sandbox (rlimits, timeout, scratch
+        dir, own log file). Returns True if it exited cleanly.
+        """
         try:
             logging.info(f"📥 Downloading script: {url}")
             self.stdout.write(f"Downloading {url.split('/')[-1]}...")
@@ -126,25 +252,34 @@ class Command(BaseCommand):
             response = requests.get(url, timeout=30)
             response.raise_for_status()
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-
+            name = os.path.splitext(requests.utils.unquote(url.split('/')[-1]))[0].replace(' ', '_')
             logging.info(f"🚀 Running script: {url}")
-            subprocess.run(["python", temp_file_path], check=True)
-            logging.info(f"✅ Completed: {url}")
-            
-            os.remove(temp_file_path)
+            started_at = timezone.now()
+            result = CrawlerSandbox(output_dir=self.workspace).run(name, response.content)
+            CrawlerRun.objects.create(
+                script_name=name,
+                started_at=started_at,
+                duration=result.duration,
+                exit_code=result.returncode,
+                timed_out=result.timed_out,
+                user_cpu=result.user_cpu,
+                system_cpu=result.system_cpu,
+                max_rss_kb=result.max_rss_kb,
+                output_files=len(result.output_files),
+                log_file=result.log_path,
+            )
+
+            if not result.succeeded:
+                logging.error(f"❌ Execution failed for {url}: {result.describe()}, see {result.log_path}")
+                self.stdout.write(self.style.WARNING(f"Execution failed for {url} ({result.describe()})"))
+                return False
+            logging.info(f"✅ Completed: {url} in {result.duration:.1f}s, {len(result.output_files)} files")
             return True
             
         except requests.RequestException as e:
             logging.error(f"❌ Download failed for {url}: {e}")
             self.stdout.write(self.style.WARNING(f"Download failed for {url}"))
             return False
-        except subprocess.CalledProcessError as e:
-            logging.error(f"❌ Execution failed for {url}: {e}")
-            self.stdout.write(self.style.WARNING(f"Execution failed for {url}"))
-            return False
         except Exception as e:
             logging.error(f"❌ Unexpected error with {url}: {e}")
             return False
@@ -155,79 +290,27 @@ class Command(BaseCommand):
             logging.info("🔍 Searching for Excel files to combine...")
             self.stdout.write("Combining Excel files...")
             
-            excel_files = glob.glob(os.path.join(settings.BASE_DIR, '*.xlsx'))
-            excel_files = [f for f in excel_files if not f.endswith('RI.xlsx')]
+            excel_files = glob.glob(self.path('*.xlsx'))
+            excel_files = [f for f in excel_files if os.path.basename(f) not in PIPELINE_OUTPUTS]
 
             if not excel_files:
                 logging.warning("⚠️ No Excel files found to combine")
                 self.stdout.write(self.style.WARNING("No Excel files found to combine"))
                 return False
 
-            combined_df = pd.DataFrame()
-            
-            for file in excel_files:
-                try:
-                    df = pd.read_excel(file, keep_default_na=True)
-                    df['Source_File'] = os.path.basename(file)
-                    combined_df = pd.concat([combined_df, df], ignore_index=True)
-                    logging.info(f"➕ Added {file} to combined dataframe")
-                except Exception as e:
-                    logging.error(f"❌ Error reading {file}: {e}")
-                    continue
-
-            # Remove duplicate articles based on 'Article URL'
-            if 'Article URL' in combined_df.columns:
-                before_dedup = len(combined_df)
-                combined_df = combined_df.drop_duplicates(subset='Article URL', keep='first')
-                after_dedup = len(combined_df)
-                logging.info(f"🧹 Removed {before_dedup - after_dedup} duplicate articles based on 'Article URL'")
-
-
-            # Enhanced Date Processing
-            if 'Date' in combined_df.columns:
-                try:
-                    # Step 1: Clean date strings
-                    combined_df['Date'] = combined_df['Date'].replace(
-                        ['None', 'N/A', 'NA', '', 'NaN', 'nan'], pd.NA
-                    )
-                    
-                    # Step 2: Standardize separators
-                    combined_df['Date'] = combined_df['Date'].astype(str).str.replace(
-                        r'[.-]', '/', regex=True
-                    )
-                    
-                    # Step 3: Parse dates with multiple formats
-                    parsed_dates = pd.to_datetime(
-                        combined_df['Date'],
-                        errors='coerce',
-                        dayfirst=True,
-                        format='mixed'
-                    )
-                    
-                    combined_df['Date'] = parsed_dates
-                    
-                    # Step 4: Filter by date (keep last 12 months or None)
-                    one_year_ago = pd.Timestamp.now() - pd.DateOffset(months=12)
-                    initial_count = len(combined_df)
-                    
-                    combined_df = combined_df[
-                        (combined_df['Date'].isna()) | 
-                        (combined_df['Date'] >= one_year_ago)
-                    ]
-                    
-                    filtered_count = initial_count - len(combined_df)
-                    logging.info(f"🧹 Filtered out {filtered_count} records older than {one_year_ago.date()}")
-                    
-                    # Step 5: Format for output (preserve NaT as None)
-                    combined_df['Date'] = combined_df['Date'].dt.strftime('%Y-%m-%d').where(
-                        combined_df['Date'].notna(), None
-                    )
-                except Exception as e:
-                    logging.error(f"❌ Failed to process 'Date' column: {e}")
-                    combined_df['Date'] = combined_df['Date'].astype(str)
+            combined_df = self.read_excel_files(excel_files)
+            combined_df, archive_df = self.prepare_dataframe(combined_df)
+
+            # Records older than the hot window are kept for the archive tier
+            archive_path = self.path('RI_archive.xlsx')
+            if not archive_df.empty:
+                archive_df.to_excel(archive_path, index=False, na_rep='None')
+                logging.info(f"🗄️ Saved {len(archive_df)} older records to {archive_path}")
+            elif os.path.exists(archive_path):
+                os.remove(archive_path)
 
             if not combined_df.empty:
-                output_path = os.path.join(settings.BASE_DIR, 'RI.xlsx')
+                output_path = self.path('RI.xlsx')
                 combined_df.to_excel(output_path, index=False, na_rep='None')
                 logging.info(f"💾 Saved combined Excel to {output_path}")
                 self.stdout.write(self.style.SUCCESS(f"Combined data saved to RI.xlsx"))
@@ -242,11 +325,104 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Error combining files: {str(e)}"))
             return False
 
+    def read_excel_files(self, excel_files):
+        """
+        Read crawler Excel files into one dataframe tagged with Source_File.
+        Each file is validated against its schema (ri_app.validation): bad rows
+        are quarantined and a quality report is stored per file.
+        """
+        frames = []
+
+        for file in excel_files:
+            source = os.path.basename(file)
+            try:
+                df = pd.read_excel(file, keep_default_na=True)
+            except Exception as e:
+                logging.error(f"❌ Error reading {file}: {e}")
+                save_report({'source_file': source}, readable=False)
+                self.stdout.write(self.style.WARNING(f"Could not read {source}"))
+                continue
+
+            df, rejected, report = validate_frame(df, source)
+            if not rejected.empty:
+                quarantine(rejected, source)
+            save_report(report)
+            if report['quarantined'] or report['truncated']:
+                logging.warning(f"🧪 {describe(report)}")
+                self.stdout.write(self.style.WARNING(describe(report)))
+            df['Source_File'] = source
+            frames.append(df)
+            logging.info(f"➕ Added {file} to combined dataframe")
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def prepare_dataframe(self, combined_df):
+        """
+        Deduplicate on the canonical 'Article URL', classify the type columns and normalize the 'Date' column.
+        Returns (recent, archive): rows inside the hot window or without a date,
+        and rows older than it.
+        """
+        archive_df = combined_df.iloc[0:0]
+        # Remove duplicate articles: URLs that only differ in scheme, slashes or tracking parameters are one
+        if 'Article URL' in combined_df.columns:
+            before_dedup = len(combined_df)
+            combined_df = combined_df[~url_keys(combined_df['Article URL']).duplicated(keep='first')]
+            after_dedup = len(combined_df)
+            logging.info(f"🧹 Removed {before_dedup - after_dedup} duplicate articles based on 'Article URL'")
+
+        # Map free-text Product_Type / Document_Type onto the controlled vocabularies
+        combined_df = classify_frame(combined_df)
+        logging.info(
+            f"🏷️ Classified {combined_df['Document_Type'].notna().sum()} document types and "
+            f"{combined_df['Product_Type'].notna().sum()} product types of {len(combined_df)} rows"
+        )
+
+        # Enhanced Date Processing
+        if 'Date' in combined_df.columns:
+            try:
+                # Step 1: Clean date strings
+                combined_df['Date'] = combined_df['Date'].replace(
+                    ['None', 'N/A', 'NA', '', 'NaN', 'nan'], pd.NA
+                )
+                
+                # Step 2: Standardize separators
+                combined_df['Date'] = combined_df['Date'].astype(str).str.replace(
+                    r'[.-]', '/', regex=True
+                )
+                
+                # Step 3: Parse dates with multiple formats
+                parsed_dates = pd.to_datetime(
+                    combined_df['Date'],
+                    errors='coerce',
+                    dayfirst=True,
+                    format='mixed'
+                )
+                
+                combined_df['Date'] = parsed_dates
+                
+                # Step 4: Split by date (last RI_HOT_WINDOW_MONTHS or None stay hot)
+                cutoff = pd.Timestamp(hot_window_cutoff())
+                is_old = combined_df['Date'] < cutoff
+                archive_df = combined_df[is_old].copy()
+                combined_df = combined_df[~is_old].copy()
+                logging.info(f"🗄️ Routed {len(archive_df)} records older than {cutoff.date()} to the archive")
+                
+                # Step 5: Format for output (preserve NaT as None)
+                for frame in (combined_df, archive_df):
+                    frame['Date'] = frame['Date'].dt.strftime('%Y-%m-%d').where(
+                        frame['Date'].notna(), None
+                    )
+            except Exception as e:
+                logging.error(f"❌ Failed to process 'Date' column: {e}")
+                combined_df['Date'] = combined_df['Date'].astype(str)
+
+        return combined_df, archive_df
+
     def convert_excel_to_db(self):
         """Convert RI.xlsx to RI.db SQLite database and RI.csv file"""
         try:
-            excel_path = os.path.join(settings.BASE_DIR, 'RI.xlsx')
-            csv_path = os.path.join(settings.BASE_DIR, 'RI.csv')
+            excel_path = self.path('RI.xlsx')
+            csv_path = self.path('RI.csv')
             
             if not os.path.exists(excel_path):
                 logging.warning("⚠️ RI.xlsx not found")
@@ -276,13 +452,13 @@ class Command(BaseCommand):
         
     def compare_with_github_csv(self):
         """
-        Compare local RI.csv with GitHub RI.csv based on 'Article URL'.
+        Compare local RI.csv with GitHub RI.csv based on the canonical 'Article URL'.
         Write unmatched articles to News.xlsx.
         """
         try:
-            local_csv_path = os.path.join(os.getcwd(), 'RI.csv')
-            github_csv_url = "https://raw.githubusercontent.com/MariaKlap/Master-Script/refs/heads/main/RI.csv"
-            output_excel_path = os.path.join(os.getcwd(), 'News.xlsx')
+            local_csv_path = self.path('RI.csv')
+            github_csv_url = self.GITHUB_CSV_URL
+            output_excel_path = self.path('News.xlsx')
             
             if not os.path.exists(local_csv_path):
                 logging.warning("⚠️ Local RI.csv not found. Skipping comparison.")
@@ -307,19 +483,18 @@ class Command(BaseCommand):
                 return False
 
             # Find new articles
-            unmatched_df = df_local[~df_local['Article URL'].isin(df_github['Article URL'])]
+            unmatched_df = df_local[~url_keys(df_local['Article URL']).isin(url_keys(df_github['Article URL']))]
 
             if unmatched_df.empty:
+                # A News.xlsx left from an earlier run in this workspace is stale now
+                if os.path.exists(output_excel_path):
+                    os.remove(output_excel_path)
                 logging.info("✅ No new articles found")
                 self.stdout.write(self.style.SUCCESS("No new articles found"))
                 return True
 
-            # Prepare output
+            # Every schema column is present after validation in read_excel_files
             required_columns = ['Title', 'Summary', 'Date', 'Article URL', 'Source_File']
-            for col in required_columns:
-                if col not in unmatched_df.columns:
-                    unmatched_df[col] = None
-
             result_df = unmatched_df[required_columns]
             result_df.to_excel(output_excel_path, index=False)
             logging.info(f"📝 Saved new articles to {output_excel_path}")
@@ -334,13 +509,16 @@ class Command(BaseCommand):
     def export_news_to_docx(self):
         """Convert News.xlsx into a formatted RI_News.docx"""
         try:
-            excel_path = os.path.join(settings.BASE_DIR, 'News.xlsx')
-            docx_path = os.path.join(settings.BASE_DIR, 'RI_News.docx')
+            excel_path = self.path('News.xlsx')
+            docx_path = self.path('RI_News.docx')
 
             if not os.path.exists(excel_path):
-                logging.warning("⚠️ News.xlsx not found")
+                # compare_with_github_csv writes no News.xlsx when nothing is new
+                logging.info("⚠️ News.xlsx not found, no report to export")
                 self.stdout.write(self.style.WARNING("News.xlsx not found"))
-                return False
+                if os.path.exists(docx_path):
+                    os.remove(docx_path)
+                return True
 
             df = pd.read_excel(excel_path)
 
@@ -426,11 +604,13 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"DOCX export error: {str(e)}"))
             return False
 
-    def import_to_django(self, keep_old_data=False):
-        """Import data from RI.csv to Django models"""
+    def import_to_django(self, keep_old_data=False, chunk_size=None, max_memory=None):
+        """
+        Import RI.xlsx and RI_archive.xlsx into the database a chunk at a time,
+        so memory is bounded by the chunk size rather than by the file.
+        """
         try:
-            
-            excel_path = os.path.join(settings.BASE_DIR, 'RI.xlsx')
+            excel_path = self.path('RI.xlsx')
             
             if not os.path.exists(excel_path):
                 logging.warning("⚠️ RI.xlsx not found")
@@ -439,78 +619,241 @@ class Command(BaseCommand):
             
             logging.info("Importing data to Django models...")
             self.stdout.write("Importing data to database...")
-            
-            df = pd.read_excel(excel_path, keep_default_na=True)
 
-            if df.empty:
+            archive_path = self.path('RI_archive.xlsx')
+            if os.path.exists(archive_path):
+                for archive_df in iter_excel_chunks(archive_path, ChunkBudget(chunk_size, max_memory)):
+                    self.import_dataframe(archive_df, model=ArchivedRegulatoryData)
+
+            # Rows up to this id were there before the import; unless old data is kept,
+            # the ones the crawlers return again are replaced and the rest are archived
+            last_old_id = RegulatoryData.objects.aggregate(last=Max('id'))['last'] or 0
+            reloaded = set()
+            import_run = None
+            rows = 0
+            started = time.perf_counter()
+            for chunk_number, df in enumerate(iter_excel_chunks(excel_path, ChunkBudget(chunk_size, max_memory)), 1):
+                if import_run is None:
+                    import_run = ImportRun.objects.create(source='run_crawlers')
+                rows += len(df)
+                self.import_dataframe(
+                    df, import_run=import_run, replace_up_to=None if keep_old_data else last_old_id,
+                    reloaded=reloaded,
+                )
+                logging.info(f"📦 Chunk {chunk_number}: {rows} rows read in {time.perf_counter() - started:.1f}s")
+                self.stdout.write(f"  chunk {chunk_number}: {rows} rows read")
+
+            if import_run is None:
                 logging.warning("⚠️ No data to import")
                 self.stdout.write(self.style.WARNING("No data to import"))
                 return False
-            
-            # Clear existing data unless keep_old_data is True
+
             if not keep_old_data:
-                RegulatoryData.objects.all().delete()
-                logging.info("Cleared existing data from database")
-            
-            # Prepare data for bulk create
-            records = []
-            existing_urls = set(RegulatoryData.objects.values_list('article_url', flat=True))
-            
-            for _, row in df.iterrows():
-                url = str(row.get('Article URL', '')).strip()
-                if not url or url in existing_urls:
-                    continue
-                
-                try:
-                    cleaned_drug_name = self.clean_names(str(row.get('Drug_names', '')))
-                    logging.debug(f"Drug name cleaned: {cleaned_drug_name}")
-        
-                    records.append(RegulatoryData(
-                        title=str(row.get('Title', '')),
-                        summary=str(row.get('Summary', '')),
-                        date=self.parse_date(row.get('Date', '')),
-                        article_url=url,
-                        Product_Type=self.clean_names(str(row.get('Product_Type', ''))),
-                        Document_Type=self.clean_names(str(row.get('Document_Type', ''))),
-                        Drug_names=cleaned_drug_name,
-                        source_file=row.get('Source_File', ''),
-                        agency=self.determine_agency(row.get('Source_File', '')),
-                        category=self.determine_category(row.get('Source_File', ''))
-                    ))
-                except Exception as e:
-                    logging.error(f"❌ Error processing row: {e}")
-                    continue
-            
-            # Bulk create
-            if records:
-                RegulatoryData.objects.bulk_create(records)
-                logging.info(f"✅ Imported {len(records)} records")
-                self.stdout.write(self.style.SUCCESS(f"Imported {len(records)} new records"))
-                return True
-            else:
-                logging.info("No new records to import")
-                self.stdout.write(self.style.SUCCESS("No new records to import"))
-                return True
+                # Rows that were not reloaded move to the archive instead of being lost
+                old_ids = RegulatoryData.objects.filter(id__lte=last_old_id).values_list('id', flat=True)
+                archived = archive_ids(pk for pk in old_ids.iterator() if pk not in reloaded)
+                logging.info(f"🗄️ Archived {archived} records no longer returned by the crawlers")
+
+            self.finish_import_run(import_run, reloaded)
+            return True
 
         except Exception as e:
             logging.error(f"❌ Error importing to Django: {e}")
             self.stdout.write(self.style.ERROR(f"Import error: {str(e)}"))
             return False
 
+    def publish_outputs(self):
+        """Copy the run's results from the workspace to BASE_DIR"""
+        target = str(settings.BASE_DIR)
+        if os.path.abspath(self.path('')) == os.path.abspath(os.path.join(target, '')):
+            return True
+        try:
+            for name in self.PUBLISHED_FILES:
+                destination = os.path.join(target, name)
+                if os.path.exists(self.path(name)):
+                    shutil.copy2(self.path(name), destination)
+                elif os.path.exists(destination):
+                    # Not produced by this run, so an older copy would be misleading
+                    os.remove(destination)
+            logging.info(f"📤 Published results from {self.workspace}")
+            return True
+        except OSError as e:
+            logging.error(f"❌ Error publishing results: {e}")
+            self.stdout.write(self.style.ERROR(f"Publish error: {str(e)}"))
+            return False
+
+    def ingest_source_files(self, excel_files):
+        """Import the output of a single crawler straight into the database"""
+        df = self.read_excel_files(excel_files)
+        if df.empty:
+            return 0
+        df, archive_df = self.prepare_dataframe(df)
+        if not archive_df.empty:
+            self.import_dataframe(archive_df, model=ArchivedRegulatoryData)
+        import_run = ImportRun.objects.create(source=', '.join(os.path.basename(f) for f in excel_files)[:255])
+        imported = self.import_dataframe(df, import_run=import_run)
+        self.finish_import_run(import_run)
+        return imported
+
+    def finish_import_run(self, import_run, reloaded=()):
+        """
+        Record how many rows the run added, match them against saved searches,
+        update related articles (re-vectorising the `reloaded` ids whose text
+        changed) and announce the new generation
+        """
+        import_run.finished_at = timezone.now()
+        import_run.records_inserted = import_run.records.count()
+        import_run.save(update_fields=['finished_at', 'records_inserted'])
+        if import_run.records_inserted:
+            matched = percolate_import_run(import_run)
+            if matched:
+                self.stdout.write(f"🔔 {matched} saved search matches queued for digests")
+        try:
+            update_related(updated=reloaded)
+        except Exception as e:
+            logging.error(f"❌ Failed to update related articles: {e}")
+        publish_import_generation(import_run.pk)
+        try:
+            index = build_typeahead_index(import_run.pk)
+            logging.info(f"🔤 Typeahead index rebuilt with {len(index)} terms")
+        except Exception as e:
+            logging.error(f"❌ Failed to rebuild the typeahead index: {e}")
+
+    def existing_rows(self, model, keys, batch_size=500):
+        """{url_key: (id, import_run_id)} for the given URL keys, looked up through their unique index"""
+        fields = ['url_key', 'id', 'import_run_id'] if model is RegulatoryData else ['url_key', 'id']
+        keys = list(keys)
+        existing = {}
+        for start in range(0, len(keys), batch_size):
+            for row in model.objects.filter(url_key__in=keys[start:start + batch_size]).values_list(*fields):
+                existing[row[0]] = row[1:]
+        return existing
+
+    def import_dataframe(self, df, model=RegulatoryData, import_run=None, replace_up_to=None, reloaded=None,
+                         batch_size=500):
+        """
+        Insert rows whose canonical 'Article URL' is not in `model`'s table yet. Returns the number inserted.
+        Hot rows are tagged with `import_run`. With `replace_up_to`, hot rows with an id up to
+        that are updated in place from the incoming row, so they keep their id, the import run that
+        first saw them and their saved search matches; their ids are added to `reloaded`.
+        """
+        label = 'archived records' if model is ArchivedRegulatoryData else 'records'
+        urls = [self.cell_text(url).strip() for url in df.get('Article URL', [''] * len(df))]
+        keys = [url_key(url) for url in urls]
+        existing = self.existing_rows(model, {key for url, key in zip(urls, keys) if url})
+        replaced = {}
+        if replace_up_to is not None:
+            replaced = {key: row for key, row in existing.items() if row[0] <= replace_up_to}
+            existing = {key: row for key, row in existing.items() if key not in replaced}
+
+        drug_names = self.extract_drug_names(df)
+        # Sources repeat across a file, so agency and category are worked out once per source
+        sources = {}
+
+        # Prepare data for bulk create
+        records, updated = [], []
+        for position, (url, key, row) in enumerate(zip(urls, keys, df.to_dict('records'))):
+            if not url or key in existing:
+                continue
+            existing[key] = None
+
+            # Rows were checked against the schema when the crawler files were read
+            source_file = row.get('Source_File', '')
+            if source_file not in sources:
+                sources[source_file] = (self.determine_agency(source_file), self.determine_category(source_file))
+            summary = self.cell_text(row.get('Summary'))
+            record = model(
+                title=self.cell_text(row.get('Title')),
+                summary=summary,
+                excerpt=make_excerpt(summary),
+                date=self.parse_date(row.get('Date', '')),
+                article_url=url,
+                Product_Type=self.clean_names(str(row.get('Product_Type', ''))),
+                Document_Type=self.clean_names(str(row.get('Document_Type', ''))),
+                Drug_names=drug_names[position],
+                source_file=source_file,
+                agency=sources[source_file][0],
+                category=sources[source_file][1],
+            )
+            if key in replaced:
+                record.pk, record.import_run_id = replaced[key]
+                updated.append(record)
+                continue
+            if import_run is not None:
+                record.import_run_id = import_run.pk
+            records.append(record)
+
+        if updated:
+            with transaction.atomic():
+                ids = [record.pk for record in updated]
+                deltas = count_records(updated)
+                deltas.subtract(count_queryset(RegulatoryData.objects.filter(id__in=ids)))
+                RegulatoryData.objects.bulk_update(updated, self.RELOADED_FIELDS, batch_size=batch_size)
+                apply_deltas(deltas)
+            if reloaded is not None:
+                reloaded.update(ids)
+            bump_data_version()
+            logging.info(f"🔁 Reloaded {len(updated)} {label}")
+
+        # Bulk create
+        if records:
+            model.objects.bulk_create(records, batch_size=batch_size)
+            record_inserted(records)
+            bump_data_version()
+            logging.info(f"✅ Imported {len(records)} {label}")
+            self.stdout.write(self.style.SUCCESS(f"Imported {len(records)} new {label}"))
+        else:
+            logging.info(f"No new {label} to import")
+            self.stdout.write(self.style.SUCCESS(f"No new {label} to import"))
+        return len(records)
+
+    def cell_text(self, value):
+        """Text of a spreadsheet cell, with missing values as ''"""
+        return '' if value is None or pd.isna(value) else str(value)
+
+    def extract_drug_names(self, df):
+        """
+        Drug_names for every row of `df`: the crawler's names normalized against
+        the drug dictionary, followed by dictionary terms found in the title and
+        summary. All rows are scanned in one pass of the automaton.
+        """
+        def column(name):
+            if name not in df.columns:
+                return pd.Series('', index=df.index)
+            return df[name].fillna('').astype(str)
+
+        crawler_names = [self.clean_names(value) for value in column('Drug_names')]
+        matcher = get_drug_matcher()
+        if matcher is None:
+            return crawler_names
+
+        found = matcher.extract_many(list(column('Title') + '\n' + column('Summary')))
+        drug_names = []
+        filled = 0
+        for given, extracted in zip(crawler_names, found):
+            names = [matcher.normalize(name) for name in (given or '').split(',') if name.strip()]
+            if not names and extracted:
+                filled += 1
+            unique = {}
+            for name in names + extracted:
+                unique.setdefault(name.lower(), name)
+            drug_names.append(join_drug_names(unique.values()))
+        logging.info(f"💊 Dictionary of {len(matcher)} terms filled drug names for {filled} rows")
+        return drug_names
+
     def cleanup_temp_files(self):
         """Clean up temporary files"""
         try:
             patterns = [
-                os.path.join(settings.BASE_DIR, '*.xlsx'),
-                os.path.join(settings.BASE_DIR, '*.csv'),
-                os.path.join(settings.BASE_DIR, '*.db'),
-                os.path.join(settings.BASE_DIR, '*.py'),
+                self.path('*.xlsx'),
+                self.path('*.csv'),
+                self.path('*.db'),
             ]
             
             for pattern in patterns:
                 for file in glob.glob(pattern):
                     try:
-                        if not any(f in file for f in ['RI.xlsx', 'RI.csv', 'RI.db', 'RI_News.docx']):
+                        if not any(f in file for f in ['RI.xlsx', 'RI_archive.xlsx', 'RI.csv', 'RI.db', 'RI_News.docx']):
                             os.remove(file)
                             logging.info(f"Removed temporary file: {file}")
                     except Exception as e:
@@ -663,6 +1006,7 @@ class Command(BaseCommand):
         except ValueError:
             try:
                 # Fallback to flexible parsing
-                return pd.to_datetime(date_str, errors='coerce').date()
+                parsed = pd.to_datetime(date_str, errors='coerce')
+                return None if pd.isna(parsed) else parsed.date()
             except:
                 return None
@@ -0,0 +1,115 @@
+import os
+import time
+import signal
+import logging
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+from ...models import CrawlJob
+from ...scheduling import (
+    RunLock, sync_jobs, compute_next_run, snapshot_excel_files, changed_excel_files
+)
+from .run_crawlers import Command as CrawlersCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run crawlers continuously on staggered per-agency schedules'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every job that is currently due, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=int,
+            default=60,
+            help='Maximum seconds to sleep between checks for due jobs'
+        )
+
+    def handle(self, *args, **options):
+        log_file = os.path.join(settings.BASE_DIR, "scheduler_log.txt")
+        logging.basicConfig(
+            filename=log_file,
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+
+        self.stopping = False
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+        crawler = CrawlersCommand(stdout=self.stdout, stderr=self.stderr)
+        created = sync_jobs(crawler.GITHUB_SCRIPTS, crawler.determine_agency)
+        logging.info(f"=== Scheduler started, {created} new jobs scheduled ===")
+        self.stdout.write(self.style.SUCCESS("=== Crawl scheduler started ==="))
+
+        while not self.stopping:
+            job = CrawlJob.objects.filter(next_run__lte=timezone.now()).order_by('next_run').first()
+            if job is not None:
+                if not self.run_job(crawler, job) and options['once']:
+                    break
+                continue
+
+            if options['once']:
+                break
+            self.sleep_until_next_job(options['poll_interval'])
+
+        logging.info("=== Scheduler stopped ===")
+        self.stdout.write(self.style.SUCCESS("=== Crawl scheduler stopped ==="))
+
+    def request_stop(self, signum, frame):
+        self.stopping = True
+
+    def sleep_until_next_job(self, poll_interval):
+        next_job = CrawlJob.objects.exclude(next_run__isnull=True).order_by('next_run').first()
+        delay = poll_interval
+        if next_job is not None:
+            delay = min(delay, max((next_job.next_run - timezone.now()).total_seconds(), 1))
+        # Sleep in short steps so a stop signal is honoured promptly
+        end = time.monotonic() + delay
+        while not self.stopping and time.monotonic() < end:
+            time.sleep(min(1, end - time.monotonic()))
+
+    def run_job(self, crawler, job):
+        """Run one crawler and import its output as soon as it finishes"""
+        lock = RunLock()
+        if not lock.acquire():
+            # A manual run_crawlers is in progress; try again shortly
+            logging.info(f"🔒 Crawl lock held, postponing {job}")
+            self.stdout.write(self.style.WARNING("Another crawl run is in progress"))
+            time.sleep(5)
+            return False
+
+        started = time.monotonic()
+        imported = 0
+        try:
+            job.status = CrawlJob.STATUS_RUNNING
+            job.save(update_fields=['status'])
+            self.stdout.write(f"Running {job} ({job.agency})...")
+
+            before = snapshot_excel_files()
+            try:
+                succeeded = crawler.download_and_run_script(job.script_url)
+                new_files = changed_excel_files(before)
+                if new_files:
+                    imported = crawler.ingest_source_files(new_files)
+                job.status = CrawlJob.STATUS_SUCCESS if succeeded else CrawlJob.STATUS_FAILED
+                job.last_error = None if succeeded else "Download or execution failed, see batch_run_log.txt and crawler_logs/"
+            except Exception as e:
+                logging.error(f"❌ Scheduled run of {job} failed: {e}")
+                job.status = CrawlJob.STATUS_FAILED
+                job.last_error = str(e)
+        finally:
+            lock.release()
+
+        job.last_duration = time.monotonic() - started
+        job.last_run = timezone.now()
+        job.next_run = compute_next_run(job, job.last_run)
+        job.records_imported = imported
+        job.save()
+        logging.info(f"⏱️ {job} finished with status {job.status} in {job.last_duration:.1f}s, next run {job.next_run}")
+        return True
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from ...models import SavedSearchMatch
+from ...percolator import pending_digests
+
+
+class Command(BaseCommand):
+    help = 'Email each user the new records matching their saved searches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url',
+            default='',
+            help='Prefix for record links, e.g. https://ri.example.org'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the digests without sending them or marking matches as notified'
+        )
+
+    def handle(self, *args, **options):
+        digests = pending_digests()
+        if not digests:
+            self.stdout.write("No saved search matches pending")
+            return
+
+        sent = 0
+        for user, (searches, match_ids) in digests.items():
+            body = self.format_digest(searches, options['base_url'])
+            count = sum(len(records) for _, records in searches)
+            if options['dry_run']:
+                self.stdout.write(f"--- {user.username} ({count} new) ---\n{body}")
+                continue
+            if not user.email:
+                # Left pending until the user has an address to send them to
+                self.stdout.write(self.style.WARNING(f"{user.username} has no email address; {count} matches kept pending"))
+                continue
+            send_mail(
+                f"Regulatory Intelligence: {count} new items for your saved searches",
+                body,
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+            )
+            # Only the matches in this digest; newer ones wait for the next
+            for start in range(0, len(match_ids), 500):
+                SavedSearchMatch.objects.filter(id__in=match_ids[start:start + 500]).update(notified_at=timezone.now())
+            sent += 1
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Sent digests to {sent} of {len(digests)} users"))
+
+    def format_digest(self, searches, base_url=''):
+        lines = []
+        for search, records in searches:
+            lines.append(f"{search.name} ({len(records)})")
+            for record in records:
+                date = record.date.strftime('%d/%m/%Y') if record.date else ''
+                lines.append(f"  {date} {record.title}")
+                lines.append(f"    {base_url}{reverse('detail', args=[record.pk])}")
+            lines.append('')
+        return '\n'.join(lines)
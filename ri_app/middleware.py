@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
+slow_request_logger = logging.getLogger('ri_app.slow_requests')
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+# The same statement shape run this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper hook that counts and times every query.
+    Views that query from other threads install it on those threads'
+    connections too (see ri_app.api), so it is thread-safe; the DB time is
+    then the sum over the threads and can exceed the wall time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            try:
+                statement = (sql, repr(params))
+            except Exception:
+                statement = None
+            with self._lock:
+                self.duration += elapsed
+                self.count += 1
+                self.shapes[sql] += 1
+                if statement is not None:
+                    self.statements[statement] += 1
+
+    def n_plus_one(self):
+        return [sql for sql, count in self.shapes.items() if count >= N_PLUS_ONE_THRESHOLD]
+
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+
+class MetricsRegistry:
+    """Per-process aggregate of request timings, keyed by view name"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def _empty(self):
+        return {
+            'requests': 0,
+            'wall_ms_total': 0.0,
+            'db_ms_total': 0.0,
+            'template_ms_total': 0.0,
+            'queries_total': 0,
+            'slow': 0,
+            'n_plus_one': 0,
+            'latency_ms': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            'queries': [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+        }
+
+    def record(self, view, wall_ms, db_ms, template_ms, queries, slow, n_plus_one):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = self._empty()
+            stats['requests'] += 1
+            stats['wall_ms_total'] += wall_ms
+            stats['db_ms_total'] += db_ms
+            stats['template_ms_total'] += template_ms
+            stats['queries_total'] += queries
+            stats['slow'] += slow
+            stats['n_plus_one'] += n_plus_one
+            stats['latency_ms'][bisect_left(LATENCY_BUCKETS_MS, wall_ms)] += 1
+            stats['queries'][bisect_left(QUERY_COUNT_BUCKETS, queries)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            views = {view: dict(stats, latency_ms=list(stats['latency_ms']), queries=list(stats['queries']))
+                     for view, stats in self._views.items()}
+        return {
+            'latency_buckets_ms': LATENCY_BUCKETS_MS + ['+Inf'],
+            'query_count_buckets': QUERY_COUNT_BUCKETS + ['+Inf'],
+            'views': views,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, template render time and wall time for every
+    request, flag N+1 and repeated SQL, and log slow requests with their
+    filter parameters. Adds a Server-Timing header to each response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        # Only wraps this thread's connection; views using other threads pick it up from the request
+        request._query_recorder = recorder
+        request._template_ms = 0.0
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        db_ms = recorder.duration * 1000
+        template_ms = request._template_ms
+        n_plus_one = recorder.n_plus_one()
+        slow = wall_ms >= getattr(settings, 'RI_SLOW_REQUEST_MS', 500)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+
+        metrics.record(view, wall_ms, db_ms, template_ms, recorder.count, slow, bool(n_plus_one))
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f}, tpl;dur={template_ms:.1f}, total;dur={wall_ms:.1f}'
+        )
+
+        if slow or n_plus_one:
+            slow_request_logger.warning(json.dumps({
+                'time': datetime.now().isoformat(timespec='milliseconds'),
+                'event': 'slow_request' if slow else 'n_plus_one',
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'filters': {key: request.GET.getlist(key) for key in request.GET},
+                'wall_ms': round(wall_ms, 1),
+                'db_ms': round(db_ms, 1),
+                'template_ms': round(template_ms, 1),
+                'queries': recorder.count,
+                'duplicate_queries': recorder.duplicates(),
+                'n_plus_one': n_plus_one,
+            }))
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._template_ms += (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
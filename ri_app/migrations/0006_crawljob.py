@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0005_regulatorydata_viewed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('script_url', models.URLField(max_length=500, unique=True)),
+                ('agency', models.CharField(blank=True, max_length=100, null=True)),
+                ('interval_minutes', models.PositiveIntegerField(default=720)),
+                ('jitter_minutes', models.PositiveIntegerField(default=15)),
+                ('last_run', models.DateTimeField(blank=True, null=True)),
+                ('next_run', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('status', models.CharField(choices=[('idle', 'Idle'), ('running', 'Running'), ('success', 'Success'), ('failed', 'Failed')], default='idle', max_length=20)),
+                ('last_duration', models.FloatField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('records_imported', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Crawl Job',
+                'verbose_name_plural': 'Crawl Jobs',
+                'ordering': ['next_run'],
+            },
+        ),
+    ]
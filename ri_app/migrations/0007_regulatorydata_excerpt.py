@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:46
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    RegulatoryData = apps.get_model('ri_app', 'RegulatoryData')
+    batch = []
+    for item in RegulatoryData.objects.only('id', 'summary').iterator(chunk_size=1000):
+        item.excerpt = Truncator(item.summary).words(30) if item.summary else item.summary
+        batch.append(item)
+        if len(batch) >= 1000:
+            RegulatoryData.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        RegulatoryData.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0006_crawljob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='regulatorydata',
+            name='excerpt',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0007_regulatorydata_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRegulatoryData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=500)),
+                ('summary', models.TextField(blank=True, null=True)),
+                ('excerpt', models.TextField(blank=True, null=True)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('Product_Type', models.CharField(blank=True, max_length=200, null=True)),
+                ('Document_Type', models.CharField(blank=True, max_length=200, null=True)),
+                ('Drug_names', models.CharField(blank=True, max_length=200, null=True)),
+                ('source_file', models.CharField(blank=True, max_length=255, null=True)),
+                ('agency', models.CharField(blank=True, default='Unknown', max_length=100, null=True)),
+                ('category', models.CharField(blank=True, default='General', max_length=100, null=True)),
+                ('viewed', models.BooleanField(default=False)),
+                ('article_url', models.URLField(max_length=1000, unique=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Regulatory Intelligence Data',
+                'verbose_name_plural': 'Archived Regulatory Intelligence Data',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='regulatorydata',
+            index=models.Index(fields=['date'], name='ri_app_regu_date_fc9c97_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedregulatorydata',
+            index=models.Index(fields=['date'], name='ri_app_arch_date_7e4a82_idx'),
+        ),
+    ]
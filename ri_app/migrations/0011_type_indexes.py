@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0010_savedsearch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedregulatorydata',
+            name='Document_Type',
+            field=models.CharField(blank=True, db_index=True, max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedregulatorydata',
+            name='Product_Type',
+            field=models.CharField(blank=True, db_index=True, max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='regulatorydata',
+            name='Document_Type',
+            field=models.CharField(blank=True, db_index=True, max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='regulatorydata',
+            name='Product_Type',
+            field=models.CharField(blank=True, db_index=True, max_length=200, null=True),
+        ),
+    ]
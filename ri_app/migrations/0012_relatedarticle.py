@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-18 22:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0011_type_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_articles', to='ri_app.regulatorydata')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ri_app.regulatorydata')),
+            ],
+            options={
+                'ordering': ['record', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedarticle',
+            constraint=models.UniqueConstraint(fields=('record', 'rank'), name='unique_related_article_rank'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:00
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+
+def fill_rollups(apps, schema_editor):
+    ActivityRollup = apps.get_model('ri_app', 'ActivityRollup')
+    counts = Counter()
+    for name in ('RegulatoryData', 'ArchivedRegulatoryData'):
+        rows = (
+            apps.get_model('ri_app', name).objects.order_by()
+            .annotate(week=TruncWeek('date'))
+            .values('agency', 'category', 'Document_Type', 'week')
+            .annotate(n=Count('id'))
+        )
+        for row in rows:
+            counts[(row['agency'] or '', row['category'] or '', row['Document_Type'] or '', row['week'])] += row['n']
+    ActivityRollup.objects.bulk_create([
+        ActivityRollup(agency=key[0], category=key[1], Document_Type=key[2], week=key[3], count=n)
+        for key, n in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0012_relatedarticle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agency', models.CharField(blank=True, default='', max_length=100)),
+                ('category', models.CharField(blank=True, default='', max_length=100)),
+                ('Document_Type', models.CharField(blank=True, default='', max_length=200)),
+                ('week', models.DateField(blank=True, null=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['week', 'agency'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activityrollup',
+            index=models.Index(fields=['week', 'agency'], name='ri_app_acti_week_84efba_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activityrollup',
+            constraint=models.UniqueConstraint(fields=('agency', 'category', 'Document_Type', 'week'), name='unique_activity_rollup'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
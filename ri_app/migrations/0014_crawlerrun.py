@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0013_activityrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlerRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('script_name', models.CharField(db_index=True, max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('exit_code', models.IntegerField(blank=True, null=True)),
+                ('timed_out', models.BooleanField(default=False)),
+                ('user_cpu', models.FloatField(blank=True, null=True)),
+                ('system_cpu', models.FloatField(blank=True, null=True)),
+                ('max_rss_kb', models.PositiveIntegerField(blank=True, null=True)),
+                ('output_files', models.PositiveIntegerField(default=0)),
+                ('log_file', models.CharField(blank=True, default='', max_length=500)),
+            ],
+            options={
+                'verbose_name': 'Crawler Run',
+                'verbose_name_plural': 'Crawler Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
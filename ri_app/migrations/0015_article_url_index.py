@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0014_crawlerrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='regulatorydata',
+            index=models.Index(fields=['article_url'], name='ri_app_regu_article_791e33_idx'),
+        ),
+    ]
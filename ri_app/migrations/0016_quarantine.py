@@ -0,0 +1,49 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0015_article_url_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_file', models.CharField(db_index=True, max_length=255)),
+                ('reasons', models.TextField()),
+                ('data', models.JSONField()),
+                ('row_hash', models.CharField(max_length=40, unique=True)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Quarantined Record',
+                'verbose_name_plural': 'Quarantined Records',
+                'ordering': ['-first_seen'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SourceQualityReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_file', models.CharField(db_index=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('readable', models.BooleanField(default=True)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('valid_rows', models.PositiveIntegerField(default=0)),
+                ('quarantined', models.PositiveIntegerField(default=0)),
+                ('truncated', models.PositiveIntegerField(default=0)),
+                ('missing_columns', models.CharField(blank=True, default='', max_length=500)),
+                ('issues', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Source Quality Report',
+                'verbose_name_plural': 'Source Quality Reports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
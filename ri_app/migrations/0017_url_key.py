@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0016_quarantine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='regulatorydata',
+            name='url_key',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedregulatorydata',
+            name='url_key',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:40
+
+import hashlib
+import logging
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncWeek
+
+logger = logging.getLogger(__name__)
+
+# Keys the rows between adding url_key (0017) and making it unique (0019), in
+# a migration of its own: PostgreSQL will not ALTER a table in the transaction
+# that deleted its duplicates while their cascaded deletes are pending.
+
+# A frozen copy of ri_app.canonical as of this migration, so later changes
+# there cannot change what it does; UrlKeyTests checks the two still agree.
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src',
+])
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_url(url):
+    url = str(url or '').strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.rstrip('.')
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    path = parts.path.rstrip('/') or '/'
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+
+def url_key(url):
+    digest = hashlib.sha1(canonical_url(url).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def fill_url_keys(apps, schema_editor):
+    """
+    Key every row. Of rows whose URLs only differ in their canonical form the
+    first is kept; the others are copied to QuarantinedRecord, with the id of
+    the row they duplicate, before they leave their table.
+    """
+    QuarantinedRecord = apps.get_model('ri_app', 'QuarantinedRecord')
+    removed = 0
+    for name in ('RegulatoryData', 'ArchivedRegulatoryData'):
+        model = apps.get_model('ri_app', name)
+        seen, batch, duplicates = {}, [], {}
+        for item in model.objects.only('id', 'article_url').order_by('id').iterator(chunk_size=1000):
+            item.url_key = url_key(item.article_url)
+            if item.url_key in seen:
+                duplicates[item.id] = seen[item.url_key]
+                continue
+            seen[item.url_key] = item.id
+            batch.append(item)
+            if len(batch) >= 1000:
+                model.objects.bulk_update(batch, ['url_key'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['url_key'])
+
+        ids = list(duplicates)
+        for start in range(0, len(ids), 500):
+            rows = model.objects.filter(id__in=ids[start:start + 500]).values()
+            QuarantinedRecord.objects.bulk_create([
+                QuarantinedRecord(
+                    source_file=row['source_file'] or '',
+                    reasons=f"Duplicate of {name} {duplicates[row['id']]}: same canonical URL",
+                    data={field: value if value is None or isinstance(value, (str, int, bool)) else str(value)
+                          for field, value in row.items()},
+                    row_hash=hashlib.sha1(f"url_key:{name}:{row['id']}".encode('utf-8')).hexdigest(),
+                )
+                for row in rows
+            ], ignore_conflicts=True)
+            removed += model.objects.filter(id__in=ids[start:start + 500]).delete()[0]
+        if duplicates:
+            logger.warning(f"{len(duplicates)} {name} rows duplicated a canonical URL; moved to QuarantinedRecord")
+    if removed:
+        rebuild_rollups(apps)
+
+
+def rebuild_rollups(apps):
+    ActivityRollup = apps.get_model('ri_app', 'ActivityRollup')
+    counts = Counter()
+    for name in ('RegulatoryData', 'ArchivedRegulatoryData'):
+        rows = (
+            apps.get_model('ri_app', name).objects.order_by()
+            .annotate(week=TruncWeek('date'))
+            .values('agency', 'category', 'Document_Type', 'week')
+            .annotate(n=Count('id'))
+        )
+        for row in rows:
+            counts[(row['agency'] or '', row['category'] or '', row['Document_Type'] or '', row['week'])] += row['n']
+    ActivityRollup.objects.all().delete()
+    ActivityRollup.objects.bulk_create([
+        ActivityRollup(agency=key[0], category=key[1], Document_Type=key[2], week=key[3], count=n)
+        for key, n in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0017_url_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_url_keys, migrations.RunPython.noop),
+    ]
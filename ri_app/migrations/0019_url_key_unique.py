@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0018_fill_url_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='regulatorydata',
+            name='url_key',
+            field=models.BigIntegerField(editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedregulatorydata',
+            name='url_key',
+            field=models.BigIntegerField(editable=False, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='regulatorydata',
+            name='ri_app_regu_article_791e33_idx',
+        ),
+        migrations.AlterField(
+            model_name='archivedregulatorydata',
+            name='article_url',
+            field=models.URLField(max_length=1000),
+        ),
+    ]
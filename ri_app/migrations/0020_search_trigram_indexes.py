@@ -0,0 +1,40 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:05
+
+from django.db import migrations
+
+# Admin search runs UPPER(column::text) LIKE UPPER('%term%'); a trigram index
+# on the same expression serves it. Other databases keep scanning.
+INDEXED_COLUMNS = ('title', 'Drug_names')
+
+
+def index_name(column):
+    return f'ri_app_regu_{column.lower()}_trgm_idx'
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in INDEXED_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name(column)} ON ri_app_regulatorydata '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in INDEXED_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name(column)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ri_app', '0019_url_key_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
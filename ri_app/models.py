@@ -1,23 +1,288 @@
 # ri_app/models.py
+from django.conf import settings
 from django.db import models
+from django.http import QueryDict
+from django.utils.text import Truncator
 
-class RegulatoryData(models.Model):
+from .canonical import url_key
+
+# Word count of the stored dashboard excerpt
+EXCERPT_WORDS = 30
+
+
+def make_excerpt(summary):
+    """Shortened summary shown in the dashboard list"""
+    if not summary:
+        return summary
+    return Truncator(summary).words(EXCERPT_WORDS)
+
+
+class RecordManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), so the dedup key is filled in here
+        objs = list(objs)
+        for obj in objs:
+            obj.url_key = url_key(obj.article_url)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class RegulatoryRecord(models.Model):
+    """Fields shared by the hot RegulatoryData table and the archive tier"""
     title = models.CharField(max_length=500)
     summary = models.TextField(blank=True, null=True)
+    excerpt = models.TextField(blank=True, null=True)  # Filled from summary, see make_excerpt
     date = models.DateField(blank=True, null=True)
     article_url = models.URLField(max_length=1000)
-    Product_Type = models.CharField(max_length=200, blank=True, null=True)  # Uppercase
-    Document_Type = models.CharField(max_length=200, blank=True, null=True)  # Uppercase
+    # Hash of the canonical article_url (ri_app.canonical); duplicates are checked on this
+    url_key = models.BigIntegerField(unique=True, editable=False)
+    # Labels from ri_app.classification.PRODUCT_TYPES / DOCUMENT_TYPES
+    Product_Type = models.CharField(max_length=200, blank=True, null=True, db_index=True)  # Uppercase
+    Document_Type = models.CharField(max_length=200, blank=True, null=True, db_index=True)  # Uppercase
     Drug_names = models.CharField(max_length=200, blank=True, null=True)  # Uppercase
     source_file = models.CharField(max_length=255, blank=True, null=True)
     agency = models.CharField(max_length=100, blank=True, null=True, default='Unknown')  # Added null/blank
     category = models.CharField(max_length=100, blank=True, null=True, default='General')  # Added null/blank
     viewed = models.BooleanField(default=False)
-    
+
+    objects = RecordManager()
+
+    class Meta:
+        abstract = True
+
+    # Columns the dashboard list needs; keeps the full summary out of list queries
+    LISTING_FIELDS = (
+        'id', 'title', 'excerpt', 'date', 'Drug_names', 'Product_Type', 'Document_Type', 'viewed',
+    )
+
+    def save(self, *args, **kwargs):
+        if 'article_url' not in self.get_deferred_fields():
+            self.url_key = url_key(self.article_url)
+        if 'summary' not in self.get_deferred_fields():
+            self.excerpt = make_excerpt(self.summary)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'summary' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'excerpt'}
+        if update_fields is not None and 'article_url' in update_fields:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'url_key'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.title
+
+
+class ImportRun(models.Model):
+    """
+    One import into RegulatoryData. Its id is the import generation: rows first
+    seen by a run point at it, so 'new since generation N' is an indexed lookup.
+    """
+    source = models.CharField(max_length=255, blank=True, null=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    records_inserted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.source})"
+
+
+class RegulatoryData(RegulatoryRecord):
+    """Recent records (see RI_HOT_WINDOW_MONTHS) that the dashboard queries by default"""
+    import_run = models.ForeignKey(
+        ImportRun, blank=True, null=True, on_delete=models.SET_NULL, related_name='records'
+    )
+
     class Meta:
         verbose_name = "Regulatory Intelligence Data"
         verbose_name_plural = "Regulatory Intelligence Data"
         ordering = ['-date']
-    
+        indexes = [models.Index(fields=['date'])]
+
+
+class RelatedArticle(models.Model):
+    """Precomputed nearest neighbours of a record by text similarity, see ri_app.related"""
+    record = models.ForeignKey(RegulatoryData, on_delete=models.CASCADE, related_name='related_articles')
+    related = models.ForeignKey(RegulatoryData, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['record', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['record', 'rank'], name='unique_related_article_rank'),
+        ]
+
+
+class ArchivedRegulatoryData(RegulatoryRecord):
+    """Records older than the hot window, moved here by archive_data or at import"""
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archived Regulatory Intelligence Data"
+        verbose_name_plural = "Archived Regulatory Intelligence Data"
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date'])]
+
+
+class ActivityRollup(models.Model):
+    """
+    Record counts per agency, category, document type and week across both
+    tiers, maintained from inserted and removed rows by ri_app.rollups.
+    Empty dimensions are stored as '' and undated records under a NULL week.
+    """
+    agency = models.CharField(max_length=100, blank=True, default='')
+    category = models.CharField(max_length=100, blank=True, default='')
+    Document_Type = models.CharField(max_length=200, blank=True, default='')
+    week = models.DateField(blank=True, null=True)  # Monday of the week
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['week', 'agency']
+        indexes = [models.Index(fields=['week', 'agency'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['agency', 'category', 'Document_Type', 'week'], name='unique_activity_rollup'
+            ),
+        ]
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"{self.agency} / {self.category} / {self.Document_Type} / {self.week}: {self.count}"
+
+
+class CrawlJob(models.Model):
+    STATUS_IDLE = 'idle'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_IDLE, 'Idle'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCESS, 'Success'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    script_url = models.URLField(max_length=500, unique=True)
+    agency = models.CharField(max_length=100, blank=True, null=True)
+    interval_minutes = models.PositiveIntegerField(default=720)
+    jitter_minutes = models.PositiveIntegerField(default=15)
+    last_run = models.DateTimeField(blank=True, null=True)
+    next_run = models.DateTimeField(blank=True, null=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_IDLE)
+    last_duration = models.FloatField(blank=True, null=True)  # seconds
+    last_error = models.TextField(blank=True, null=True)
+    records_imported = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Crawl Job"
+        verbose_name_plural = "Crawl Jobs"
+        ordering = ['next_run']
+
+    @property
+    def script_name(self):
+        return self.script_url.split('/')[-1]
+
+    def __str__(self):
+        return self.script_name
+
+
+class CrawlerRun(models.Model):
+    """Outcome and resource usage of one sandboxed crawler run (see ri_app.sandbox)"""
+    script_name = models.CharField(max_length=255, db_index=True)
+    started_at = models.DateTimeField()
+    duration = models.FloatField()  # seconds, wall clock
+    exit_code = models.IntegerField(blank=True, null=True)
+    timed_out = models.BooleanField(default=False)
+    user_cpu = models.FloatField(blank=True, null=True)  # seconds
+    system_cpu = models.FloatField(blank=True, null=True)  # seconds
+    max_rss_kb = models.PositiveIntegerField(blank=True, null=True)
+    output_files = models.PositiveIntegerField(default=0)
+    log_file = models.CharField(max_length=500, blank=True, default='')
+
+    class Meta:
+        verbose_name = "Crawler Run"
+        verbose_name_plural = "Crawler Runs"
+        ordering = ['-started_at']
+
+    @property
+    def succeeded(self):
+        return self.exit_code == 0 and not self.timed_out
+
+    def __str__(self):
+        return f"{self.script_name} at {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class QuarantinedRecord(models.Model):
+    """A crawler row that failed schema validation (see ri_app.validation), kept for inspection"""
+    source_file = models.CharField(max_length=255, db_index=True)
+    reasons = models.TextField()
+    data = models.JSONField()  # The row as read from the spreadsheet
+    row_hash = models.CharField(max_length=40, unique=True)  # Same row from the same file is stored once
+    first_seen = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Quarantined Record"
+        verbose_name_plural = "Quarantined Records"
+        ordering = ['-first_seen']
+
+    def __str__(self):
+        return f"{self.source_file}: {self.reasons}"
+
+
+class SourceQualityReport(models.Model):
+    """Validation outcome for one crawler file each time it is combined"""
+    source_file = models.CharField(max_length=255, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    readable = models.BooleanField(default=True)
+    rows = models.PositiveIntegerField(default=0)
+    valid_rows = models.PositiveIntegerField(default=0)
+    quarantined = models.PositiveIntegerField(default=0)
+    truncated = models.PositiveIntegerField(default=0)  # Values cut to the column's max_length
+    missing_columns = models.CharField(max_length=500, blank=True, default='')
+    issues = models.JSONField(default=dict)  # {reason: row count}
+
+    class Meta:
+        verbose_name = "Source Quality Report"
+        verbose_name_plural = "Source Quality Reports"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.source_file} at {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class SavedSearch(models.Model):
+    """
+    Dashboard filters a user wants to be alerted about. `query` is the dashboard
+    query string; the search text matches whole words in the title or summary.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=255)
+    query = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Saved Search"
+        verbose_name_plural = "Saved Searches"
+        ordering = ['name']
+
+    @property
+    def params(self):
+        return QueryDict(self.query)
+
+    def __str__(self):
+        return self.name
+
+
+class SavedSearchMatch(models.Model):
+    """A newly imported record that matched a saved search, pending its digest until notified"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches')
+    record = models.ForeignKey(RegulatoryData, on_delete=models.CASCADE, related_name='saved_search_matches')
+    import_run = models.ForeignKey(ImportRun, blank=True, null=True, on_delete=models.SET_NULL)
+    matched_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ['-matched_at']
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'record'], name='unique_saved_search_match'),
+        ]
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Percolator for saved searches: the searches are indexed, not the records.
+
+Each saved search is filed under one anchor key that every record it matches
+must carry (a search word, or a drug name / document type / product type).
+A batch of new records is matched by looking up each record's keys in that
+index and checking only the searches found there, so the cost follows the
+size of the batch rather than history x saved searches.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+
+from .filters import split_drug_names
+from .models import RegulatoryData, SavedSearch, SavedSearchMatch
+
+WORD_RE = re.compile(r'\w+')
+
+# (record field, dashboard parameter), most selective first
+FACETS = [
+    ('Drug_names', 'drug_name'),
+    ('Document_Type', 'document_type'),
+    ('Product_Type', 'product_type'),
+]
+
+def facet_values(record, field):
+    """The lower-cased values a record carries for a facet; Drug_names holds a list"""
+    if field == 'Drug_names':
+        return {name.lower() for name in split_drug_names(record[field])}
+    value = (record[field] or '').strip().lower()
+    return {value} if value else set()
+
+
+RECORD_FIELDS = ['id', 'title', 'summary', 'date', 'viewed', 'Drug_names', 'Document_Type', 'Product_Type']
+
+
+def tokenize(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+def _contains_phrase(tokens, phrase):
+    size = len(phrase)
+    return any(tokens[i:i + size] == phrase for i in range(len(tokens) - size + 1))
+
+
+class CompiledSearch:
+    """A saved search's filters in the form the percolator checks records against"""
+
+    def __init__(self, pk, user_id, params):
+        self.pk = pk
+        self.user_id = user_id
+        self.facets = {
+            field: params.get(param).strip().lower()
+            for field, param in FACETS if (params.get(param) or '').strip()
+        }
+        self.phrase = tokenize(params.get('search'))
+        self.viewed = params.get('viewed')
+        self.date_from = self.date_to = None
+        date_range = params.get('date_range') or ''
+        if ' to ' in date_range:
+            try:
+                date_from, date_to = date_range.split(' to ')
+                self.date_from = datetime.strptime(date_from.strip(), '%Y-%m-%d').date()
+                self.date_to = datetime.strptime(date_to.strip(), '%Y-%m-%d').date()
+            except ValueError:
+                pass
+
+    def anchor(self):
+        """The index key for this search, or None if it has to see every record"""
+        if self.phrase:
+            return ('term', max(self.phrase, key=len))
+        for field, _ in FACETS:
+            if field in self.facets:
+                return (field, self.facets[field])
+        return None
+
+    def matches(self, record, title_tokens, summary_tokens):
+        for field, value in self.facets.items():
+            if value not in facet_values(record, field):
+                return False
+        if self.viewed == 'read' and not record['viewed']:
+            return False
+        if self.viewed == 'unread' and record['viewed']:
+            return False
+        if self.date_from and not (record['date'] and self.date_from <= record['date'] <= self.date_to):
+            return False
+        if self.phrase:
+            return _contains_phrase(title_tokens, self.phrase) or _contains_phrase(summary_tokens, self.phrase)
+        return True
+
+
+class Percolator:
+    """Inverted index from record keys to the saved searches anchored on them"""
+
+    def __init__(self, searches):
+        self.index = defaultdict(list)
+        self.match_all = []
+        for search in searches:
+            compiled = CompiledSearch(search.pk, search.user_id, search.params)
+            key = compiled.anchor()
+            if key is None:
+                self.match_all.append(compiled)
+            else:
+                self.index[key].append(compiled)
+
+    def record_keys(self, record, title_tokens, summary_tokens):
+        keys = {('term', token) for token in title_tokens}
+        keys.update(('term', token) for token in summary_tokens)
+        for field, _ in FACETS:
+            keys.update((field, value) for value in facet_values(record, field))
+        return keys
+
+    def percolate(self, records):
+        """Yield (saved search, record id) for every match in `records` (dicts of RECORD_FIELDS)"""
+        for record in records:
+            title_tokens = tokenize(record['title'])
+            summary_tokens = tokenize(record['summary'])
+            candidates = list(self.match_all)
+            for key in self.record_keys(record, title_tokens, summary_tokens):
+                candidates.extend(self.index.get(key, ()))
+            for search in candidates:
+                if search.matches(record, title_tokens, summary_tokens):
+                    yield search, record['id']
+
+
+def percolate_import_run(import_run, batch_size=1000):
+    """
+    Match the rows first inserted by `import_run` against every saved search
+    and store the hits as SavedSearchMatch rows. Returns the number of matches.
+    """
+    searches = SavedSearch.objects.only('id', 'user_id', 'query')
+    if not searches.exists():
+        return 0
+    percolator = Percolator(searches)
+    records = RegulatoryData.objects.filter(import_run=import_run).values(*RECORD_FIELDS)
+
+    matched = 0
+    batch = []
+    for search, record_id in percolator.percolate(records.iterator(chunk_size=batch_size)):
+        batch.append(SavedSearchMatch(saved_search_id=search.pk, record_id=record_id, import_run=import_run))
+        if len(batch) >= batch_size:
+            SavedSearchMatch.objects.bulk_create(batch, ignore_conflicts=True)
+            matched += len(batch)
+            batch = []
+    if batch:
+        SavedSearchMatch.objects.bulk_create(batch, ignore_conflicts=True)
+        matched += len(batch)
+    return matched
+
+
+def pending_digests():
+    """
+    Un-notified matches grouped per user: {user: ([(saved search, [records])], [match ids])}.
+    Records are RegulatoryData rows, newest first; the ids are those of the
+    matches read, which are the ones to mark once the digest is sent.
+    """
+    matches = (
+        SavedSearchMatch.objects.filter(notified_at__isnull=True)
+        .select_related('saved_search__user', 'record')
+        .defer('record__summary')
+        .order_by('saved_search__user_id', 'saved_search_id', '-record__date', '-record_id')
+    )
+    digests = defaultdict(dict)
+    match_ids = defaultdict(list)
+    for match in matches:
+        search = match.saved_search
+        digests[search.user].setdefault(search, []).append(match.record)
+        match_ids[search.user].append(match.pk)
+    return {user: (list(searches.items()), match_ids[user]) for user, searches in digests.items()}
@@ -0,0 +1,193 @@
+"""
+The run_crawlers pipeline as a declared graph of stages with checkpoints.
+
+Each stage names the files it reads and writes (glob patterns relative to the
+run's workspace directory) and the stages it runs after. When a stage
+succeeds, a checkpoint recording the SHA-256 of its inputs and outputs and its
+parameters is written to <workspace>/.checkpoints/<stage>.json. A later run
+over the same workspace skips every stage whose checkpoint still matches, so
+resuming after a late failure only re-runs what changed.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+from django.conf import settings
+
+CHECKPOINT_DIR = '.checkpoints'
+
+DONE = 'done'
+UP_TO_DATE = 'up to date'
+FAILED = 'failed'
+BLOCKED = 'blocked'
+SKIPPED = 'skipped'
+
+
+class Stage:
+    def __init__(self, name, method, inputs=(), outputs=(), after=(), exclude=(), params=None, kwargs=None):
+        self.name = name
+        self.method = method
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        # File names never matched by this stage's patterns (pipeline outputs in a crawler glob)
+        self.exclude = frozenset(exclude)
+        self.params = params or {}
+        self.kwargs = kwargs or {}
+
+    def __repr__(self):
+        return f'Stage({self.name})'
+
+
+def file_digest(path):
+    """SHA-256 of the file at `path`, or None if there is no such file"""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(workspace, patterns, exclude=frozenset()):
+    """{relative path: sha256} of the files matching `patterns` in `workspace`"""
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(workspace, pattern)))
+    return {
+        os.path.relpath(path, workspace): file_digest(path)
+        for path in sorted(paths)
+        if os.path.isfile(path) and os.path.basename(path) not in exclude
+    }
+
+
+def topological_order(stages):
+    """Stages ordered so each comes after the stages it depends on"""
+    by_name = {stage.name: stage for stage in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Pipeline cycle through stage '{stage.name}'")
+        visiting.add(stage.name)
+        for name in stage.after:
+            if name not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{name}'")
+            visit(by_name[name])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def downstream(stages, name):
+    """`name` and every stage that depends on it, directly or not"""
+    names = {name}
+    for stage in topological_order(stages):
+        if names.intersection(stage.after):
+            names.add(stage.name)
+    return names
+
+
+class Pipeline:
+    def __init__(self, stages, workspace, runner):
+        self.stages = topological_order(stages)
+        self.workspace = str(workspace)
+        # Called with a Stage, returns True on success
+        self.runner = runner
+
+    def checkpoint_path(self, stage):
+        return os.path.join(self.workspace, CHECKPOINT_DIR, f'{stage.name}.json')
+
+    def load_checkpoint(self, stage):
+        try:
+            with open(self.checkpoint_path(stage), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_checkpoint(self, stage, inputs):
+        path = self.checkpoint_path(stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            'stage': stage.name,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'params': stage.params,
+            'inputs': inputs,
+            'outputs': fingerprint(self.workspace, stage.outputs, stage.exclude),
+        }
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, sort_keys=True, default=str)
+        os.replace(f'{path}.tmp', path)
+
+    def clear_checkpoint(self, stage):
+        if os.path.exists(self.checkpoint_path(stage)):
+            os.remove(self.checkpoint_path(stage))
+
+    def is_up_to_date(self, stage, inputs):
+        record = self.load_checkpoint(stage)
+        return (
+            record is not None
+            and record['inputs'] == inputs
+            and record['params'] == json.loads(json.dumps(stage.params, default=str))
+            and record['outputs'] == fingerprint(self.workspace, stage.outputs, stage.exclude)
+        )
+
+    def run(self, from_stage=None, force=False, skip=()):
+        """
+        Run the stages in dependency order. Stages from `from_stage` on (or all
+        with `force`) run even if up to date. Returns {stage name: status}.
+        """
+        forced = downstream(self.stages, from_stage) if from_stage else set()
+        results = {}
+        for stage in self.stages:
+            if stage.name in skip:
+                results[stage.name] = SKIPPED
+                continue
+            if any(results.get(name) in (FAILED, BLOCKED) for name in stage.after):
+                results[stage.name] = BLOCKED
+                continue
+            inputs = fingerprint(self.workspace, stage.inputs, stage.exclude)
+            if not force and stage.name not in forced and self.is_up_to_date(stage, inputs):
+                results[stage.name] = UP_TO_DATE
+                continue
+            self.clear_checkpoint(stage)
+            if self.runner(stage):
+                self.save_checkpoint(stage, inputs)
+                results[stage.name] = DONE
+            else:
+                results[stage.name] = FAILED
+        return results
+
+
+def pipeline_root():
+    return str(getattr(settings, 'RI_PIPELINE_DIR', os.path.join(settings.BASE_DIR, 'pipeline_runs')))
+
+
+def new_workspace(root=None):
+    root = root or pipeline_root()
+    path = os.path.join(root, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def latest_workspace(root=None):
+    root = root or pipeline_root()
+    runs = sorted(glob.glob(os.path.join(root, '[0-9]*')))
+    return runs[-1] if runs else None
+
+
+def prune_workspaces(keep, root=None):
+    """Delete all but the newest `keep` run workspaces"""
+    runs = sorted(glob.glob(os.path.join(root or pipeline_root(), '[0-9]*')))
+    for path in runs[:-keep] if keep else []:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,268 @@
+"""
+Related articles: the nearest neighbours of every hot record by text similarity.
+
+Title and summary are turned into hashed term-frequency vectors (so there is
+no vocabulary to keep in sync) and weighted by IDF at query time. Similarities
+come from sparse matrix products computed in row blocks. The vectors and top-k
+lists are kept in RI_RELATED_INDEX keyed by article URL: after an import only
+rows with new URLs, and updated rows whose text changed, are vectorised and
+multiplied against the corpus, and a reload that renumbers the hot table is
+re-materialised without recomputing.
+Scores of older lists keep the IDF of the run that computed them until a
+rebuild.
+"""
+import logging
+import os
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from scipy import sparse
+
+from .caching import bump_data_version
+from .models import RegulatoryData, RelatedArticle
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+TOP_K = 5
+# Neighbours less similar than this are not worth showing
+MIN_SCORE = 0.1
+# Upper bound on the cells of one dense similarity block
+BLOCK_CELLS = 20_000_000
+# Keeps `id__in` lookups under SQLite's variable limit
+ID_CHUNK = 500
+
+WORD_RE = re.compile(r'[a-z][a-z0-9]{2,}')
+STOP_WORDS = frozenset(
+    'and are but can for from had has have her his its may new not now our out she that the their '
+    'them there these they this was were what when which who will with would you your'.split()
+)
+
+
+def _features(text):
+    counts = {}
+    for word in WORD_RE.findall((text or '').lower()):
+        if word not in STOP_WORDS:
+            column = zlib.crc32(word.encode('utf-8')) % N_FEATURES
+            counts[column] = counts.get(column, 0) + 1
+    return counts
+
+
+def vectorize(texts):
+    """Sublinear hashed term frequencies, one CSR row per text"""
+    indptr, indices, data = [0], [], []
+    for text in texts:
+        counts = _features(text)
+        indices.extend(counts)
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    data = 1 + np.log(np.asarray(data, dtype=np.float32))
+    return sparse.csr_matrix(
+        (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), N_FEATURES),
+    )
+
+
+def tfidf(tf):
+    """L2-normalised TF-IDF rows, with IDF from the corpus in `tf`"""
+    doc_freq = np.bincount(tf.indices, minlength=N_FEATURES)
+    idf = (np.log((1 + tf.shape[0]) / (1 + doc_freq)) + 1).astype(np.float32)
+    weighted = tf @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    return (sparse.diags(1 / np.where(norms == 0, 1, norms)) @ weighted).tocsr()
+
+
+def _blocks(rows, width):
+    size = max(1, BLOCK_CELLS // max(width, 1))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _top_k(scores, candidates, k):
+    """
+    Best `k` columns of each row of `scores` as (positions from `candidates`,
+    scores), padded with -1 / 0 and cut at MIN_SCORE.
+    """
+    rows = scores.shape[0]
+    positions = np.full((rows, k), -1, dtype=np.int32)
+    best = np.zeros((rows, k), dtype=np.float32)
+    width = min(k, scores.shape[1])
+    if width == 0:
+        return positions, best
+    part = np.argpartition(-scores, width - 1, axis=1)[:, :width]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    part = np.take_along_axis(part, order, axis=1)
+    part_scores = np.take_along_axis(part_scores, order, axis=1)
+    keep = part_scores >= MIN_SCORE
+    positions[:, :width] = np.where(keep, candidates[part], -1)
+    best[:, :width] = np.where(keep, part_scores, 0)
+    return positions, best
+
+
+def _merge(positions, scores, more_positions, more_scores, k):
+    """Combine two top-k lists per row into one"""
+    positions = np.hstack([positions, more_positions])
+    scores = np.where(positions >= 0, np.hstack([scores, more_scores]), -np.inf)
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    positions = np.take_along_axis(positions, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    return np.where(np.isfinite(scores), positions, -1), np.where(np.isfinite(scores), scores, 0).astype(np.float32)
+
+
+class RelatedIndex:
+    """Vectors and top-k neighbour positions for a list of article URLs"""
+
+    def __init__(self, urls, tf, neighbours, scores):
+        self.urls = list(urls)
+        self.tf = tf
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @classmethod
+    def empty(cls, k):
+        return cls(
+            [], sparse.csr_matrix((0, N_FEATURES), dtype=np.float32),
+            np.zeros((0, k), dtype=np.int32), np.zeros((0, k), dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path, k):
+        """The saved index, or an empty one if it is missing or was built with other parameters"""
+        if not path or not os.path.exists(path):
+            return cls.empty(k)
+        with np.load(path, allow_pickle=False) as saved:
+            if saved['neighbours'].shape[1] != k or int(saved['n_features']) != N_FEATURES:
+                return cls.empty(k)
+            tf = sparse.csr_matrix(
+                (saved['data'], saved['indices'], saved['indptr']), shape=(len(saved['urls']), N_FEATURES)
+            )
+            return cls(saved['urls'].tolist(), tf, saved['neighbours'], saved['scores'])
+
+    def save(self, path):
+        tmp_path = f'{path}.tmp.npz'
+        np.savez_compressed(
+            tmp_path, urls=np.array(self.urls, dtype=str), data=self.tf.data, indices=self.tf.indices,
+            indptr=self.tf.indptr, neighbours=self.neighbours, scores=self.scores, n_features=N_FEATURES,
+        )
+        os.replace(tmp_path, path)
+
+    def keep(self, mask):
+        """Drop rows where `mask` is False. Returns a mask of kept rows that lost a neighbour."""
+        new_position = np.cumsum(mask) - 1
+        valid = self.neighbours >= 0
+        still_there = valid & mask[np.where(valid, self.neighbours, 0)]
+        lost = (valid & ~still_there).any(axis=1)
+        neighbours = np.where(still_there, new_position[np.where(valid, self.neighbours, 0)], -1)
+        self.neighbours, self.scores = _merge(
+            neighbours[mask], self.scores[mask], neighbours[mask][:, :0], self.scores[mask][:, :0],
+            self.neighbours.shape[1],
+        )
+        self.urls = [url for url, kept in zip(self.urls, mask) if kept]
+        self.tf = self.tf[np.flatnonzero(mask)]
+        return lost[mask]
+
+    def append(self, urls, tf):
+        k = self.neighbours.shape[1]
+        self.urls.extend(urls)
+        self.tf = sparse.vstack([self.tf, tf]).tocsr()
+        self.neighbours = np.vstack([self.neighbours, np.full((len(urls), k), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.zeros((len(urls), k), dtype=np.float32)])
+
+
+def _texts(ids):
+    texts = {}
+    for start in range(0, len(ids), ID_CHUNK):
+        rows = RegulatoryData.objects.filter(id__in=ids[start:start + ID_CHUNK]).values_list('id', 'title', 'summary')
+        for pk, title, summary in rows:
+            texts[pk] = f'{title or ""}\n{summary or ""}'
+    return [texts.get(pk, '') for pk in ids]
+
+
+def _changed_text(index, current, updated):
+    """URLs of `updated` ids (rows edited in place) whose vectors no longer match the index"""
+    position = {url: i for i, url in enumerate(index.urls)}
+    urls = [url for url, pk in current.items() if pk in updated and url in position]
+    if not urls:
+        return set()
+    tf = vectorize(_texts([current[url] for url in urls]))
+    differs = np.asarray(abs(tf - index.tf[[position[url] for url in urls]]).sum(axis=1)).ravel() > 0
+    return {url for url, changed in zip(urls, differs) if changed}
+
+
+def update_related(k=TOP_K, rebuild=False, path=None, updated=()):
+    """
+    Bring the related-articles index and table up to date with the hot table.
+    `updated` are ids of rows edited in place (a reload): those whose title or
+    summary changed are vectorised again like new rows. Returns the number of
+    records whose neighbour lists were recomputed.
+    """
+    path = str(path or settings.RI_RELATED_INDEX)
+    index = RelatedIndex.empty(k) if rebuild else RelatedIndex.load(path, k)
+    current = dict(RegulatoryData.objects.values_list('article_url', 'id').iterator())
+
+    # Rows whose text changed leave the index and come back as new rows
+    stale = _changed_text(index, current, set(updated)) if updated else set()
+    dirty = index.keep(np.array([url in current and url not in stale for url in index.urls], dtype=bool))
+    known = set(index.urls)
+    new_urls = [url for url in current if url not in known]
+    n_old = len(index.urls)
+    index.append(new_urls, vectorize(_texts([current[url] for url in new_urls])))
+
+    weights = tfidf(index.tf)
+    changed = np.zeros(len(index.urls), dtype=bool)
+    everything = np.arange(len(index.urls))
+
+    # New rows, and rows that lost a neighbour, get full top-k lists
+    recompute = np.concatenate([np.flatnonzero(dirty), np.arange(n_old, len(index.urls))]).astype(np.int64)
+    for block in _blocks(recompute, len(index.urls)):
+        scores = (weights[block] @ weights.T).toarray()
+        scores[np.arange(len(block)), block] = -1
+        index.neighbours[block], index.scores[block] = _top_k(scores, everything, k)
+    changed[recompute] = True
+
+    # Every other row only needs the new rows as extra candidates
+    new = np.arange(n_old, len(index.urls))
+    clean = np.flatnonzero(~dirty)
+    if len(new) and len(clean):
+        new_weights = weights[new]
+        for block in _blocks(clean, len(new)):
+            scores = (weights[block] @ new_weights.T).toarray()
+            positions, best = _merge(index.neighbours[block], index.scores[block], *_top_k(scores, new, k), k)
+            changed[block] = (positions != index.neighbours[block]).any(axis=1)
+            index.neighbours[block], index.scores[block] = positions, best
+
+    _materialise(index, current, changed)
+    index.save(path)
+    logger.info("Related articles: %s new rows, %s lists updated", len(new), int(changed.sum()))
+    return int(len(recompute))
+
+
+def _materialise(index, current, changed):
+    """Rewrite the RelatedArticle rows of records whose lists changed or are out of sync"""
+    ids = np.array([current[url] for url in index.urls], dtype=np.int64)
+    expected = (index.neighbours >= 0).sum(axis=1)
+    stored = dict(RelatedArticle.objects.values('record_id').annotate(n=Count('id')).values_list('record_id', 'n'))
+    rewrite = [
+        position for position, pk in enumerate(ids)
+        if changed[position] or stored.get(pk, 0) != expected[position]
+    ]
+    if not rewrite:
+        return
+
+    with transaction.atomic():
+        rewrite_ids = ids[rewrite].tolist()
+        for start in range(0, len(rewrite_ids), ID_CHUNK):
+            RelatedArticle.objects.filter(record_id__in=rewrite_ids[start:start + ID_CHUNK]).delete()
+        rows = [
+            RelatedArticle(record_id=int(ids[position]), related_id=int(ids[neighbour]), rank=rank, score=float(score))
+            for position in rewrite
+            for rank, (neighbour, score) in enumerate(zip(index.neighbours[position], index.scores[position]))
+            if neighbour >= 0
+        ]
+        RelatedArticle.objects.bulk_create(rows, batch_size=1000)
+    bump_data_version()
@@ -0,0 +1,130 @@
+"""
+Materialised counts behind the analytics page.
+
+ActivityRollup holds one row per (agency, category, Document_Type, week) over
+RegulatoryData and ArchivedRegulatoryData together. Writers report the rows
+they insert or remove and only the affected buckets are touched; moving a row
+between tiers leaves the counts alone. rebuild_rollups() recomputes the table
+from scratch.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncWeek
+
+from .models import ActivityRollup, ArchivedRegulatoryData, RegulatoryData
+
+DIMENSIONS = ('agency', 'category', 'Document_Type')
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday()) if day else None
+
+
+def bucket(agency, category, document_type, day):
+    return (agency or '', category or '', document_type or '', week_start(day))
+
+
+def count_records(records):
+    """Bucket counts for model instances or dicts with the rollup dimensions and 'date'"""
+    counts = Counter()
+    for record in records:
+        get = record.get if isinstance(record, dict) else lambda name: getattr(record, name)
+        counts[bucket(get('agency'), get('category'), get('Document_Type'), get('date'))] += 1
+    return counts
+
+
+def count_queryset(queryset):
+    """Bucket counts for the rows of a queryset, grouped in the database"""
+    rows = queryset.order_by().annotate(week=TruncWeek('date')).values(*DIMENSIONS, 'week').annotate(n=Count('id'))
+    counts = Counter()
+    for row in rows:
+        counts[(row['agency'] or '', row['category'] or '', row['Document_Type'] or '', row['week'])] += row['n']
+    return counts
+
+
+def apply_deltas(deltas):
+    """Add `deltas` ({bucket: change}) to the rollup table; buckets that reach zero are removed"""
+    deltas = {key: change for key, change in deltas.items() if change}
+    if not deltas:
+        return
+    with transaction.atomic():
+        weeks = {key[3] for key in deltas}
+        lookup = Q(week__in=[week for week in weeks if week is not None])
+        if None in weeks:
+            lookup |= Q(week__isnull=True)
+        existing = {
+            (row.agency, row.category, row.Document_Type, row.week): row
+            for row in ActivityRollup.objects.select_for_update().filter(
+                lookup, agency__in={key[0] for key in deltas}
+            )
+        }
+        changed, created, emptied = [], [], []
+        for key, change in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                if change > 0:
+                    created.append(ActivityRollup(
+                        agency=key[0], category=key[1], Document_Type=key[2], week=key[3], count=change
+                    ))
+                continue
+            row.count += change
+            (changed if row.count > 0 else emptied).append(row)
+        ActivityRollup.objects.bulk_update(changed, ['count'], batch_size=500)
+        ActivityRollup.objects.bulk_create(created, batch_size=500)
+        ActivityRollup.objects.filter(id__in=[row.id for row in emptied]).delete()
+
+
+def record_inserted(records):
+    apply_deltas(count_records(records))
+
+
+def record_removed(queryset):
+    """Call before deleting the rows of `queryset`"""
+    apply_deltas({key: -n for key, n in count_queryset(queryset).items()})
+
+
+def rebuild_rollups():
+    """Recompute every bucket from both tiers. Returns the number of buckets."""
+    counts = count_queryset(RegulatoryData.objects.all()) + count_queryset(ArchivedRegulatoryData.objects.all())
+    with transaction.atomic():
+        ActivityRollup.objects.all().delete()
+        ActivityRollup.objects.bulk_create([
+            ActivityRollup(agency=key[0], category=key[1], Document_Type=key[2], week=key[3], count=n)
+            for key, n in counts.items()
+        ], batch_size=500)
+    return len(counts)
+
+
+def summarize(agency=None, category=None, document_type=None, since=None):
+    """
+    Weekly totals and per-dimension breakdowns for the analytics page, read
+    from the rollup table only. Filters match whole dimension values.
+    """
+    rollups = ActivityRollup.objects.all()
+    if agency:
+        rollups = rollups.filter(agency=agency)
+    if category:
+        rollups = rollups.filter(category=category)
+    if document_type:
+        rollups = rollups.filter(Document_Type=document_type)
+    if since:
+        rollups = rollups.filter(week__gte=week_start(since))
+
+    def breakdown(field):
+        rows = rollups.values(field).annotate(total=Sum('count')).order_by('-total', field)
+        return [{'name': row[field] or 'Unknown', 'count': row['total']} for row in rows]
+
+    weeks = [
+        {'week': row['week'].isoformat(), 'count': row['total']}
+        for row in rollups.exclude(week__isnull=True).values('week').annotate(total=Sum('count')).order_by('week')
+    ]
+    return {
+        'total': rollups.aggregate(total=Sum('count'))['total'] or 0,
+        'weeks': weeks,
+        'agency': breakdown('agency'),
+        'category': breakdown('category'),
+        'document_type': breakdown('Document_Type'),
+    }
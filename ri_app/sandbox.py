@@ -0,0 +1,235 @@
+"""
+Run downloaded crawler scripts in a separate, resource-limited process.
+
+Each run gets a fresh scratch directory as its working directory, its own log
+file for stdout and stderr, an environment reduced to an allow-list, rlimits
+on CPU time and open files, and a wall-clock timeout that kills its whole
+process group (browsers and drivers included). Memory is limited on the
+resident size of the whole group, polled while the crawler runs: headless
+browsers reserve far more address space than they use, so an RLIMIT_AS that
+holds them back is off unless configured. Spreadsheets the crawler writes are
+moved to the output directory for the pipeline; everything else is discarded
+with the scratch dir.
+"""
+import glob
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, process groups or wait4
+    resource = None
+
+# Only used when settings has no RI_CRAWLER_LIMITS, which is where limits are configured
+DEFAULT_LIMITS = {
+    'memory_mb': 4096,        # resident memory of the whole process group, polled (Linux /proc)
+    'address_space_mb': 0,    # RLIMIT_AS per process; 0 disables
+    'cpu_seconds': 900,       # RLIMIT_CPU
+    'open_files': 512,        # RLIMIT_NOFILE
+    'timeout_seconds': 1800,  # wall clock, whole process group
+}
+KILL_GRACE_SECONDS = 10
+POLL_SECONDS = 0.2
+
+# Environment variables a crawler inherits; the rest (database URLs, secret keys,
+# cloud credentials) stay with the pipeline. RI_CRAWLER_ENV adds names.
+ENV_ALLOWLIST = (
+    'PATH', 'HOME', 'USER', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ', 'DISPLAY',
+    'HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY', 'http_proxy', 'https_proxy', 'no_proxy',
+    'SSL_CERT_FILE', 'SSL_CERT_DIR', 'REQUESTS_CA_BUNDLE',
+    'CHROME_BIN', 'CHROMEDRIVER_PATH', 'PLAYWRIGHT_BROWSERS_PATH', 'SE_CACHE_PATH',
+)
+
+
+def crawler_limits():
+    """RI_CRAWLER_LIMITS, or DEFAULT_LIMITS without it; a limit the setting leaves out is off"""
+    limits = getattr(settings, 'RI_CRAWLER_LIMITS', DEFAULT_LIMITS)
+    return {name: limits.get(name, 0) for name in DEFAULT_LIMITS}
+
+
+def crawler_env(scratch):
+    """The allow-listed part of this process's environment, with temp dirs pointed at `scratch`"""
+    names = set(ENV_ALLOWLIST).union(getattr(settings, 'RI_CRAWLER_ENV', ()))
+    env = {name: value for name, value in os.environ.items() if name in names}
+    return dict(env, TMPDIR=scratch, TEMP=scratch, TMP=scratch, PYTHONUNBUFFERED='1')
+
+
+def group_rss_kb(pgid):
+    """Resident memory of every process in group `pgid` in KiB, or None without /proc"""
+    try:
+        pids = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return None
+    page_kb = os.sysconf('SC_PAGE_SIZE') // 1024
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                # Fields after the parenthesised command name: state, ppid, pgrp, ... rss is the 22nd
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[2]) == pgid:
+            total += int(fields[21]) * page_kb
+    return total
+
+
+def _apply_rlimits(limits):
+    """preexec_fn for the crawler process"""
+    def apply():
+        if limits['address_space_mb']:
+            size = limits['address_space_mb'] * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (size, size))
+        if limits['cpu_seconds']:
+            resource.setrlimit(resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds'] + 5))
+        if limits['open_files']:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (limits['open_files'], limits['open_files']))
+    return apply
+
+
+class CrawlerResult:
+    """Outcome and resource usage of one sandboxed crawler run"""
+
+    def __init__(self, name, log_path):
+        self.name = name
+        self.log_path = log_path
+        self.returncode = None
+        self.timed_out = False
+        self.memory_exceeded = False
+        self.duration = 0.0
+        self.user_cpu = None
+        self.system_cpu = None
+        self.max_rss_kb = None
+        self.output_files = []
+
+    @property
+    def succeeded(self):
+        return self.returncode == 0 and not self.timed_out and not self.memory_exceeded
+
+    def describe(self):
+        if self.timed_out:
+            return f"timed out after {self.duration:.0f}s"
+        if self.memory_exceeded:
+            return "killed for exceeding its memory limit"
+        if self.returncode is not None and self.returncode < 0:
+            return f"killed by signal {-self.returncode}"
+        return f"exit code {self.returncode}"
+
+
+class CrawlerSandbox:
+    def __init__(self, limits=None, log_dir=None, output_dir=None):
+        self.limits = {**crawler_limits(), **(limits or {})}
+        self.log_dir = str(log_dir or getattr(settings, 'RI_CRAWLER_LOG_DIR', os.path.join(settings.BASE_DIR, 'crawler_logs')))
+        self.output_dir = str(output_dir or settings.BASE_DIR)
+        self.keep_logs = getattr(settings, 'RI_CRAWLER_LOG_KEEP', 10)
+
+    def log_path(self, name):
+        directory = os.path.join(self.log_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, datetime.now().strftime('%Y%m%d-%H%M%S-%f') + '.log')
+
+    def prune_logs(self, name):
+        logs = sorted(glob.glob(os.path.join(self.log_dir, name, '*.log')))
+        for path in logs[:-self.keep_logs] if self.keep_logs else []:
+            os.remove(path)
+
+    def run(self, name, source):
+        """Run the script `source` (bytes) as crawler `name`. Returns a CrawlerResult."""
+        result = CrawlerResult(name, self.log_path(name))
+        scratch = tempfile.mkdtemp(prefix=f'crawler-{name}-')
+        try:
+            script_path = os.path.join(scratch, f'{name}.py')
+            with open(script_path, 'wb') as f:
+                f.write(source)
+            env = crawler_env(scratch)
+
+            with open(result.log_path, 'wb') as log:
+                started = time.monotonic()
+                process = subprocess.Popen(
+                    [sys.executable, script_path],
+                    cwd=scratch,
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=resource is not None,
+                    preexec_fn=_apply_rlimits(self.limits) if resource is not None else None,
+                )
+                self.wait(process, result, started)
+                result.duration = time.monotonic() - started
+                if result.timed_out:
+                    log.write(f"\n[sandbox] killed after {self.limits['timeout_seconds']}s wall-clock timeout\n".encode())
+                elif result.memory_exceeded:
+                    log.write(f"\n[sandbox] killed above {self.limits['memory_mb']} MB resident memory\n".encode())
+
+            result.output_files = self.collect_outputs(scratch)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+            self.prune_logs(name)
+        return result
+
+    def wait(self, process, result, started):
+        deadline = started + self.limits['timeout_seconds']
+        if resource is None:
+            try:
+                result.returncode = process.wait(timeout=self.limits['timeout_seconds'])
+            except subprocess.TimeoutExpired:
+                result.timed_out = True
+                process.kill()
+                result.returncode = process.wait()
+            return
+
+        # wait4 reaps the child and reports its own rusage, not the whole command's
+        stopping = False
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if not stopping and self.over_memory(process.pid):
+                result.memory_exceeded = stopping = True
+                # A group over its memory gets no grace period
+                deadline = time.monotonic()
+            elif time.monotonic() >= deadline and not stopping:
+                result.timed_out = stopping = True
+                self.kill_group(process.pid, signal.SIGTERM)
+                deadline = time.monotonic() + KILL_GRACE_SECONDS
+            if stopping and time.monotonic() >= deadline:
+                self.kill_group(process.pid, signal.SIGKILL)
+                pid, status, usage = os.wait4(process.pid, 0)
+                break
+            time.sleep(POLL_SECONDS)
+        # Grandchildren left behind by a crawler that exited normally
+        self.kill_group(process.pid, signal.SIGKILL)
+        result.returncode = process.returncode = os.waitstatus_to_exitcode(status)
+        result.user_cpu = usage.ru_utime
+        result.system_cpu = usage.ru_stime
+        result.max_rss_kb = usage.ru_maxrss
+
+    def over_memory(self, pgid):
+        if not self.limits['memory_mb']:
+            return False
+        rss_kb = group_rss_kb(pgid)
+        return rss_kb is not None and rss_kb > self.limits['memory_mb'] * 1024
+
+    def kill_group(self, pgid, sig):
+        try:
+            os.killpg(pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def collect_outputs(self, scratch):
+        """Move the spreadsheets a crawler wrote into the output directory"""
+        collected = []
+        for path in glob.glob(os.path.join(scratch, '**', '*.xlsx'), recursive=True):
+            target = os.path.join(self.output_dir, os.path.basename(path))
+            shutil.move(path, target)
+            collected.append(target)
+        return collected
@@ -0,0 +1,142 @@
+import glob
+import os
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Polling interval per agency, in minutes. Agencies that publish safety
+# communications are polled more often than the national sites.
+AGENCY_INTERVALS = {
+    'FDA': 120,
+    'EMA': 120,
+    'MHRA': 120,
+    'European Commission': 360,
+    'HMA': 360,
+    'ICH': 720,
+    'WHO': 720,
+}
+DEFAULT_INTERVAL = 24 * 60
+DEFAULT_JITTER = 15
+
+# Files written by the pipeline itself rather than by a crawler
+PIPELINE_OUTPUTS = {'RI.xlsx', 'RI_archive.xlsx', 'News.xlsx'}
+
+
+class RunLock:
+    """
+    Exclusive inter-process lock on a file, held for the duration of a crawl.
+    The OS releases it if the process dies, so a crash never leaves it stuck.
+    """
+
+    def __init__(self, path=None):
+        self.path = str(path or getattr(settings, 'RI_RUN_LOCK', os.path.join(settings.BASE_DIR, 'crawl.lock')))
+        self._fh = None
+
+    def acquire(self):
+        """Try to take the lock without blocking. Returns True on success."""
+        fh = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        else:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._fh.close()
+        self._fh = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def schedule_for_agency(agency):
+    """Return (interval_minutes, jitter_minutes) for an agency"""
+    interval = AGENCY_INTERVALS.get(agency, DEFAULT_INTERVAL)
+    # Never let the jitter exceed a tenth of the interval
+    return interval, min(DEFAULT_JITTER, interval // 10)
+
+
+def compute_next_run(job, now=None):
+    """Next run time for a job: one interval from now plus random jitter"""
+    now = now or timezone.now()
+    jitter = random.uniform(0, job.jitter_minutes)
+    return now + timedelta(minutes=job.interval_minutes + jitter)
+
+
+def sync_jobs(script_urls, determine_agency, now=None):
+    """
+    Make the CrawlJob table match the script list.
+    New jobs get their first runs spread evenly over the shortest interval so
+    the sources start one after another instead of all at once. Jobs left
+    'running' by a crashed scheduler are reset.
+    """
+    from .models import CrawlJob
+
+    now = now or timezone.now()
+    CrawlJob.objects.exclude(script_url__in=script_urls).delete()
+    CrawlJob.objects.filter(status=CrawlJob.STATUS_RUNNING).update(status=CrawlJob.STATUS_IDLE)
+
+    existing = set(CrawlJob.objects.values_list('script_url', flat=True))
+    jobs = []
+    for url in script_urls:
+        if url in existing:
+            continue
+        agency = determine_agency(url.split('/')[-1])
+        interval, jitter = schedule_for_agency(agency)
+        jobs.append(CrawlJob(
+            script_url=url,
+            agency=agency,
+            interval_minutes=interval,
+            jitter_minutes=jitter,
+        ))
+
+    if jobs:
+        spread = min(job.interval_minutes for job in jobs)
+        for index, job in enumerate(jobs):
+            job.next_run = now + timedelta(minutes=spread * index / len(jobs))
+        CrawlJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def snapshot_excel_files(directory=None):
+    """Map each crawler .xlsx in the directory to its modification time"""
+    directory = directory or settings.BASE_DIR
+    snapshot = {}
+    for path in glob.glob(os.path.join(directory, '*.xlsx')):
+        if os.path.basename(path) not in PIPELINE_OUTPUTS:
+            snapshot[path] = os.stat(path).st_mtime_ns
+    return snapshot
+
+
+def changed_excel_files(before, directory=None):
+    """Files created or rewritten since the `before` snapshot was taken"""
+    after = snapshot_excel_files(directory)
+    return sorted(path for path, mtime in after.items() if before.get(path) != mtime)
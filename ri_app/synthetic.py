@@ -0,0 +1,120 @@
+"""
+Synthetic regulatory corpus shaped like the crawler spreadsheets.
+
+Used by the run_benchmarks command and the tests. Output is determined by the
+seed (dates are relative to today, like the 12-month filter they exercise) so
+benchmark runs are comparable.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SOURCES = [
+    'EMAnews2', 'ECnews11', 'ICR', 'ICHnews', 'IS1', 'SWISS5', 'AT', 'GMP', 'EC-Updates',
+    'EC-Medical', 'FDAnews', 'RQAnews4', 'Topra', 'raps-2', 'WHOnews', 'CBGnewsfinal5win',
+    'HMA6news', 'BEnews1', 'CY', 'DE', 'DK3newswin', 'FInew', 'IE', 'Infarmed6news', 'Luxnews',
+    'MHRA', 'MHRANews', 'MHRAPolicy', 'Maltanews', 'Norwnews', 'SEn', 'SEns', 'SEnsa',
+]
+
+DRUGS = [
+    'semaglutide', 'tirzepatide', 'adalimumab', 'pembrolizumab', 'nivolumab', 'insulin glargine',
+    'metformin', 'atorvastatin', 'apixaban', 'rivaroxaban', 'dupilumab', 'ustekinumab',
+    'trastuzumab', 'rituximab', 'bevacizumab', 'lenalidomide', 'sitagliptin', 'empagliflozin',
+    'dapagliflozin', 'liraglutide', 'ibrutinib', 'osimertinib', 'palbociclib', 'denosumab',
+    'etanercept', 'infliximab', 'omalizumab', 'secukinumab', 'tofacitinib', 'upadacitinib',
+]
+
+PRODUCT_TYPES = ['Human Medicine', 'Medical Device', 'Veterinary Medicine', 'Biological', 'None', 'Other']
+DOCUMENT_TYPES = ['Guidance', 'News', 'Safety Alert', 'Press Release', 'Consultation', 'Other type', 'None']
+
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y', '%d-%m-%Y', '%B %d, %Y', '%d %b %Y']
+
+WORDS = (
+    'regulatory agency guidance medicinal product marketing authorisation safety signal '
+    'clinical trial pharmacovigilance variation labelling committee opinion assessment report '
+    'manufacturing inspection quality review procedure shortage supply update consultation '
+    'patients healthcare professionals risk benefit recommendation approval extension indication'
+).split()
+
+
+def _text(rng, lengths):
+    """Random sentences of the given word counts"""
+    words = np.array(WORDS)
+    return [' '.join(words[rng.integers(0, len(words), size=n)]) for n in lengths]
+
+
+def generate_records(n, seed=0, duplicate_rate=0.05, long_summary_rate=0.02):
+    """
+    Build n crawler rows with the column names the crawlers produce.
+
+    Includes mixed date formats and placeholder dates, comma-separated and
+    bracketed multi-drug names, a share of URLs repeated across sources and a
+    share of very long summaries.
+    """
+    rng = np.random.default_rng(seed)
+
+    titles = _text(rng, rng.integers(5, 15, size=n))
+    summary_lengths = np.where(
+        rng.random(n) < long_summary_rate,
+        rng.integers(2000, 6000, size=n),
+        rng.integers(20, 120, size=n),
+    )
+    summaries = _text(rng, summary_lengths)
+
+    # Dates spread over the last 18 months so the 12-month filter has work to do
+    days_ago = rng.integers(0, 548, size=n)
+    dates = pd.Timestamp.now().normalize() - pd.to_timedelta(days_ago, unit='D')
+    formats = rng.integers(0, len(DATE_FORMATS), size=n)
+    date_strings = [d.strftime(DATE_FORMATS[f]) for d, f in zip(dates, formats)]
+    for i in np.flatnonzero(rng.random(n) < 0.03):
+        date_strings[i] = rng.choice(['None', 'N/A', ''])
+
+    drug_counts = rng.choice([0, 1, 1, 2, 3], size=n)
+    drug_names = []
+    for count in drug_counts:
+        picked = list(rng.choice(DRUGS, size=count, replace=False))
+        if not picked:
+            drug_names.append('None')
+        elif rng.random() < 0.3:
+            drug_names.append(str(picked))
+        else:
+            drug_names.append(', '.join(picked))
+
+    sources = rng.integers(0, len(SOURCES), size=n)
+    urls = [f'https://{SOURCES[s].lower()}.example.org/news/{i}' for i, s in enumerate(sources)]
+    duplicates = np.flatnonzero(rng.random(n) < duplicate_rate)
+    for i in duplicates:
+        urls[i] = urls[rng.integers(0, n)]
+
+    return pd.DataFrame({
+        'Title': titles,
+        'Summary': summaries,
+        'Date': date_strings,
+        'Article URL': urls,
+        'Product_Type': rng.choice(PRODUCT_TYPES, size=n),
+        'Document_Type': rng.choice(DOCUMENT_TYPES, size=n),
+        'Drug_names': drug_names,
+        'Source': [SOURCES[s] for s in sources],
+    })
+
+
+def write_crawler_files(directory, df):
+    """Write generated rows as one <Source>.xlsx per crawler. Returns the paths."""
+    paths = []
+    for source, frame in df.groupby('Source', sort=True):
+        path = os.path.join(directory, f'{source}.xlsx')
+        frame.drop(columns='Source').to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def write_reference_csv(path, df, overlap=0.8, seed=0):
+    """
+    Write a semicolon-separated reference CSV like the one on GitHub, holding
+    a share of the given rows so compare_with_github_csv finds 'new' ones.
+    """
+    rng = np.random.default_rng(seed)
+    known = df[rng.random(len(df)) < overlap]
+    known.to_csv(path, sep=';', index=False, quoting=1)
+    return path
@@ -1,3 +1,1193 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
 
-# Create your tests here.
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import typeahead
+from .caching import (
+    bump_data_version, current_import_generation, get_data_version, page_cache_stats, publish_import_generation,
+    reset_page_cache_stats,
+)
+from .canonical import canonical_url, url_key
+from .chunks import DEFAULT_CHUNK_SIZE, MIN_CHUNK_SIZE, ChunkBudget, iter_excel_chunks
+from .management.commands.run_crawlers import Command as CrawlersCommand
+from .middleware import metrics as request_metrics
+from .management.commands.run_benchmarks import Command as BenchmarkCommand, compare_results
+from .management.commands.load_test import RequestMix, parse_mix, summarize_latencies
+from .models import ArchivedRegulatoryData, CrawlJob, ImportRun, RegulatoryData, SavedSearch, SavedSearchMatch
+from .percolator import RECORD_FIELDS as PERCOLATOR_FIELDS, Percolator, percolate_import_run
+from .filters import filter_queryset
+from .drugs import DrugMatcher
+from .classification import CentroidModel, DOCUMENT_TYPES, classify_frame
+from .models import QuarantinedRecord, RelatedArticle, SourceQualityReport
+from .related import update_related
+from .models import ActivityRollup
+from .rollups import rebuild_rollups, record_removed
+from .archive import archive_ids
+from .sandbox import DEFAULT_LIMITS, CrawlerSandbox, crawler_limits
+from .pipeline import BLOCKED, DONE, FAILED, UP_TO_DATE, Pipeline, Stage
+from .scheduling import RunLock, sync_jobs
+from .synthetic import generate_records, write_crawler_files, write_reference_csv
+from .typeahead import PrefixIndex, build_index, collect_entries
+from .validation import validate_frame
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Tests run with DEBUG=False, where the manifest storage needs collectstatic
+PLAIN_STATIC = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+def isolate_state(test):
+    """
+    Empty the cache and point everything the app writes outside the database
+    (BASE_DIR outputs and logs, the related index, pipeline runs, crawler
+    logs, the run lock) at a temporary directory for the duration of `test`.
+    Returns the directory.
+    """
+    cache.clear()
+    workdir = tempfile.TemporaryDirectory(prefix='ri-tests-')
+    test.addCleanup(workdir.cleanup)
+    override = test.settings(
+        BASE_DIR=workdir.name,
+        RI_RELATED_INDEX=os.path.join(workdir.name, 'related_index.npz'),
+        RI_PIPELINE_DIR=os.path.join(workdir.name, 'pipeline_runs'),
+        RI_CRAWLER_LOG_DIR=os.path.join(workdir.name, 'crawler_logs'),
+        RI_RUN_LOCK=os.path.join(workdir.name, 'crawl.lock'),
+    )
+    override.enable()
+    test.addCleanup(override.disable)
+    return workdir.name
+
+
+@override_settings(CACHES=LOCMEM_CACHE, STATICFILES_STORAGE=PLAIN_STATIC)
+class LocalCacheTestCase(TestCase):
+    """Runs against a per-process cache, with no access to a deployment's on-disk state"""
+
+    def setUp(self):
+        self.state_dir = isolate_state(self)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, STATICFILES_STORAGE=PLAIN_STATIC)
+class LocalCacheTransactionTestCase(TransactionTestCase):
+    """LocalCacheTestCase for tests whose queries run on other threads"""
+
+    def setUp(self):
+        self.state_dir = isolate_state(self)
+
+
+class ConditionalPageTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.item = RegulatoryData.objects.create(
+            title='FDA guidance', article_url='https://fda.gov/a', Product_Type='Drug'
+        )
+        self.client.force_login(self.user)
+        # Prime the CSRF cookie the way a browser would after the first page
+        self.client.get(reverse('dashboard'))
+        cache.clear()
+        reset_page_cache_stats()
+
+    def test_dashboard_returns_304_for_matching_etag(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_rendered_page_is_served_from_cache(self):
+        url = reverse('dashboard') + '?search=FDA'
+        first = self.client.get(url)
+        second = self.client.get(reverse('dashboard') + '?page=1&search=FDA&drug_name=')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(page_cache_stats()['misses'], 1)
+        self.assertEqual(page_cache_stats()['hits'], 1)
+
+    def test_update_viewed_invalidates_pages(self):
+        etag = self.client.get(reverse('detail', args=[self.item.pk]))['ETag']
+        self.client.post(
+            reverse('update_viewed', args=[self.item.pk]),
+            data='{"viewed": true}', content_type='application/json'
+        )
+        response = self.client.get(reverse('detail', args=[self.item.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['item'].viewed)
+
+    def test_pages_are_cached_per_user(self):
+        self.client.get(reverse('dashboard'))
+        other = User.objects.create_user('reviewer', password='secret-pass-123')
+        self.client.force_login(other)
+        self.client.get(reverse('dashboard'))
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Logged in as reviewer')
+
+    def test_bump_changes_version(self):
+        self.assertNotEqual(bump_data_version(), bump_data_version())
+
+
+class ListingProjectionTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('analyst', password='secret-pass-123'))
+
+    def test_dashboard_list_defers_full_summary(self):
+        RegulatoryData.objects.create(title='Short', article_url='https://fda.gov/a', summary='A few words')
+        RegulatoryData.objects.create(
+            title='Long', article_url='https://ema.europa.eu/b', summary='word ' * 500
+        )
+        response = self.client.get(reverse('dashboard'))
+        items = list(response.context['items'])
+        self.assertTrue(all('summary' in item.get_deferred_fields() for item in items))
+        long_item = next(item for item in items if item.title == 'Long')
+        self.assertEqual(len(long_item.excerpt.split()), 30)
+        self.assertContains(response, long_item.excerpt)
+
+
+class SchedulerTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.crawler = CrawlersCommand()
+
+    def test_sync_jobs_staggers_and_prioritises_urgent_agencies(self):
+        now = timezone.now()
+        sync_jobs(self.crawler.GITHUB_SCRIPTS, self.crawler.determine_agency, now=now)
+
+        jobs = {job.script_name: job for job in CrawlJob.objects.all()}
+        self.assertEqual(len(jobs), len(self.crawler.GITHUB_SCRIPTS))
+        self.assertLess(jobs['FDAnews.py'].interval_minutes, jobs['IE.py'].interval_minutes)
+        self.assertEqual(jobs['MHRA.py'].agency, 'MHRA')
+        # First runs are spread out rather than all due immediately
+        self.assertEqual(len({job.next_run for job in jobs.values()}), len(jobs))
+
+    def test_sync_jobs_removes_dropped_scripts_and_resets_running(self):
+        sync_jobs(self.crawler.GITHUB_SCRIPTS[:2], self.crawler.determine_agency)
+        CrawlJob.objects.update(status=CrawlJob.STATUS_RUNNING)
+        sync_jobs(self.crawler.GITHUB_SCRIPTS[1:3], self.crawler.determine_agency)
+        self.assertEqual(
+            set(CrawlJob.objects.values_list('script_url', flat=True)),
+            set(self.crawler.GITHUB_SCRIPTS[1:3]),
+        )
+        self.assertFalse(CrawlJob.objects.filter(status=CrawlJob.STATUS_RUNNING).exists())
+
+    def test_run_lock_is_exclusive(self):
+        path = os.path.join(self.state_dir, 'crawl.lock')
+        with RunLock(path) as first:
+            self.assertTrue(first)
+            self.assertFalse(RunLock(path).acquire())
+        second = RunLock(path)
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_due_job_is_run_and_rescheduled(self):
+        url = self.crawler.GITHUB_SCRIPTS[10]
+        job = CrawlJob.objects.create(script_url=url, agency='FDA', interval_minutes=120,
+                                      next_run=timezone.now() - timedelta(minutes=1))
+        with mock.patch.object(CrawlersCommand, 'download_and_run_script', return_value=True) as run:
+            call_command('run_scheduler', '--once', stdout=StringIO())
+        run.assert_any_call(url)
+        job.refresh_from_db()
+        self.assertEqual(job.status, CrawlJob.STATUS_SUCCESS)
+        self.assertGreater(job.next_run, timezone.now() + timedelta(minutes=119))
+        self.assertIsNotNone(job.last_duration)
+
+
+class BenchmarkTests(LocalCacheTestCase):
+    def test_generated_corpus_is_reproducible_and_messy(self):
+        df = generate_records(500, seed=3)
+        self.assertTrue(df.equals(generate_records(500, seed=3)))
+        self.assertGreater(df['Article URL'].duplicated().sum(), 0)
+        self.assertTrue(df['Drug_names'].str.contains(',').any())
+        self.assertTrue(df['Date'].str.contains('/').any())
+        self.assertTrue(df['Date'].str.contains('-').any())
+
+    def test_benchmark_size_times_every_stage(self):
+        result = BenchmarkCommand(stdout=StringIO()).benchmark_size(80, repeat=1)
+        self.assertEqual(
+            list(result['pipeline']),
+            ['combine_excel_files', 'convert_excel_to_db', 'compare_with_github_csv',
+             'export_news_to_docx', 'import_to_django'],
+        )
+        self.assertTrue(all(stage['ok'] for stage in result['pipeline'].values()))
+        self.assertEqual(result['rows_imported'], RegulatoryData.objects.count())
+        self.assertIn('search', result['dashboard'])
+
+    def test_compare_results_flags_slowdowns(self):
+        baseline = {'results': {'10': {'pipeline': {'combine_excel_files': {'seconds': 1.0}}}}}
+        current = {'results': {'10': {'pipeline': {'combine_excel_files': {'seconds': 1.5}},
+                                      'dashboard': {'search': {'seconds': 0.2}}}}}
+        regressions = compare_results(current, baseline, threshold=0.25)
+        self.assertEqual([r['stage'] for r in regressions], ['pipeline.combine_excel_files'])
+        self.assertEqual(compare_results(current, baseline, threshold=0.6), [])
+
+
+class LoadTestTests(TestCase):
+    def test_load_test_mix_is_seeded_and_summarised_per_endpoint(self):
+        mix = parse_mix('mark_read=0,detail=50')
+        first, second = RequestMix(mix, [7, 8], seed=1), RequestMix(mix, [7, 8], seed=1)
+        sample = [first.next() for _ in range(200)]
+        self.assertEqual(sample, [second.next() for _ in range(200)])
+        self.assertNotIn('mark_read', {name for name, *_ in sample})
+        self.assertIn(('detail', 'GET', '/item/7/', {}), sample)
+
+        summary = summarize_latencies([('detail', float(ms), ms != 100) for ms in range(1, 101)], seconds=10)
+        self.assertEqual(summary['detail']['requests'], 100)
+        self.assertEqual(summary['all']['errors'], 1)
+        self.assertEqual(summary['detail']['rps'], 10)
+        self.assertAlmostEqual(summary['detail']['p95_ms'], 95.05)
+
+
+class RequestMetricsTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        request_metrics.reset()
+        self.user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def test_dashboard_request_is_measured(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        stats = request_metrics.snapshot()['views']['dashboard']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries_total'], 0)
+        self.assertGreater(stats['template_ms_total'], 0)
+        self.assertEqual(sum(stats['latency_ms']), 1)
+
+    @override_settings(RI_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_filters(self):
+        with self.assertLogs('ri_app.slow_requests', level='WARNING') as logs:
+            self.client.get(reverse('dashboard'), {'product_type': 'Drug'})
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['event'], 'slow_request')
+        self.assertEqual(entry['filters'], {'product_type': ['Drug']})
+        self.assertIn('n_plus_one', entry)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('page_cache', response.json())
+
+
+class ArchiveTierTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.recent = RegulatoryData.objects.create(
+            title='Recent semaglutide note', article_url='https://ema.europa.eu/new', date=today
+        )
+        self.old = RegulatoryData.objects.create(
+            title='Old semaglutide note', article_url='https://ema.europa.eu/old',
+            date=today - timedelta(days=800), summary='history'
+        )
+        self.user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def test_archive_data_moves_old_rows_in_batches(self):
+        call_command('archive_data', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(RegulatoryData.objects.values_list('title', flat=True)), ['Recent semaglutide note'])
+        archived = ArchivedRegulatoryData.objects.get()
+        self.assertEqual((archived.article_url, archived.summary), (self.old.article_url, 'history'))
+
+    def test_dashboard_search_can_span_both_tiers(self):
+        call_command('archive_data', stdout=StringIO())
+        response = self.client.get(reverse('dashboard'), {'search': 'semaglutide'})
+        self.assertEqual(len(response.context['items']), 1)
+
+        response = self.client.get(reverse('dashboard'), {'search': 'semaglutide', 'include_archive': '1'})
+        tiers = [item['tier'] for item in response.context['items']]
+        self.assertEqual(tiers, ['hot', 'archive'])
+        archived = ArchivedRegulatoryData.objects.get()
+        self.assertContains(response, reverse('archived_detail', args=[archived.pk]))
+        self.assertEqual(self.client.get(reverse('archived_detail', args=[archived.pk])).status_code, 200)
+
+    def test_prepare_dataframe_routes_old_rows_to_archive(self):
+        df = pd.DataFrame({
+            'Article URL': ['a', 'b', 'c'],
+            'Date': ['01/01/2001', timezone.now().strftime('%d/%m/%Y'), 'None'],
+        })
+        recent, archive = CrawlersCommand().prepare_dataframe(df)
+        self.assertEqual(list(recent['Article URL']), ['b', 'c'])
+        self.assertEqual(list(archive['Date']), ['2001-01-01'])
+
+
+class ChunkedImportTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.recent = RegulatoryData.objects.create(
+            title='Recent semaglutide note', article_url='https://ema.europa.eu/new', date=today
+        )
+        RegulatoryData.objects.create(
+            title='Old semaglutide note', article_url='https://ema.europa.eu/old', date=today - timedelta(days=800)
+        )
+
+    def test_chunked_reload_replaces_known_rows_and_archives_the_rest(self):
+        old_run = ImportRun.objects.create(source='test')
+        RegulatoryData.objects.filter(pk=self.recent.pk).update(import_run=old_run)
+        today = timezone.now().date().isoformat()
+        df = pd.DataFrame({
+            'Title': ['Recent semaglutide note v2', 'b', 'c', 'b again', 'e'],
+            'Summary': ['updated', None, '', '', ''],
+            'Article URL': ['https://ema.europa.eu/new', 'https://x.example/b', 'https://x.example/c',
+                            'https://x.example/b', 'https://x.example/e'],
+            'Date': [today] * 5,
+            'Source_File': ['EMAnews2.xlsx', 'FDAnews.xlsx', 'FDAnews.xlsx', 'FDAnews.xlsx', 'FDAnews.xlsx'],
+        })
+        with tempfile.TemporaryDirectory() as workdir:
+            df.to_excel(os.path.join(workdir, 'RI.xlsx'), index=False)
+            command = CrawlersCommand(stdout=StringIO())
+            command.workspace = workdir
+            self.assertTrue(command.import_to_django(chunk_size=2))
+
+        self.assertIn('chunk 3: 5 rows read', command.stdout.getvalue())
+        self.assertEqual(RegulatoryData.objects.count(), 4)
+        reloaded = RegulatoryData.objects.get(article_url='https://ema.europa.eu/new')
+        self.assertEqual((reloaded.title, reloaded.summary), ('Recent semaglutide note v2', 'updated'))
+        self.assertEqual(reloaded.import_run, old_run)
+        self.assertEqual(RegulatoryData.objects.get(article_url='https://x.example/b').summary, '')
+        self.assertEqual(list(ArchivedRegulatoryData.objects.values_list('article_url', flat=True)),
+                         ['https://ema.europa.eu/old'])
+        self.assertEqual(ImportRun.objects.latest('pk').records_inserted, 3)
+
+    def test_memory_budget_sizes_chunks_from_a_sample(self):
+        df = pd.DataFrame({'Title': [f'Title {n}' for n in range(1000)], 'Summary': ['word ' * 200] * 1000})
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'RI.xlsx')
+            df.to_excel(path, index=False)
+            budget = ChunkBudget(max_memory_mb=1)
+            sizes = [len(chunk) for chunk in iter_excel_chunks(path, budget)]
+
+        self.assertEqual(sizes[0], MIN_CHUNK_SIZE)
+        self.assertEqual(sum(sizes), 1000)
+        # Later chunks are sized from the measured rows, well under the default
+        self.assertEqual(len(set(sizes[1:-1])), 1)
+        self.assertLess(sizes[1], DEFAULT_CHUNK_SIZE // 10)
+        self.assertEqual(ChunkBudget(chunk_size=50, max_memory_mb=1).chunk_size, 50)
+        self.assertEqual(ChunkBudget(chunk_size=50000).chunk_size, 50000)
+
+
+class LiveFeedTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(self.user)
+        self.first = ImportRun.objects.create(source='test', finished_at=timezone.now())
+        RegulatoryData.objects.create(title='Old news', article_url='https://a.example/1', import_run=self.first)
+        publish_import_generation(self.first.pk)
+
+    def import_batch(self, **fields):
+        run = ImportRun.objects.create(source='test', finished_at=timezone.now())
+        RegulatoryData.objects.create(import_run=run, **fields)
+        publish_import_generation(run.pk)
+        return run
+
+    def test_returns_only_items_from_newer_imports_matching_filters(self):
+        run = self.import_batch(title='Semaglutide shortage', article_url='https://a.example/2', Product_Type='Human Medicine')
+        self.import_batch(title='Device recall', article_url='https://a.example/3', Product_Type='Medical Device')
+
+        data = self.client.get(reverse('live_feed'), {'since': self.first.pk, 'product_type': 'Human Medicine'}).json()
+        self.assertEqual(data['generation'], run.pk + 1)
+        self.assertEqual([item['title'] for item in data['items']], ['Semaglutide shortage'])
+        self.assertEqual(data['items'][0]['url'], reverse('detail', args=[run.records.get().pk]))
+
+    def test_polls_are_not_modified_until_an_import_finishes(self):
+        params = {'since': self.first.pk, 'product_type': 'Human Medicine'}
+        response = self.client.get(reverse('live_feed'), params)
+        self.assertEqual(response.json(), {'generation': self.first.pk, 'items': []})
+
+        with self.assertNumQueries(0):
+            again = self.client.get(reverse('live_feed'), params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        run = self.import_batch(title='Device recall', article_url='https://a.example/3', Product_Type='Medical Device')
+        response = self.client.get(reverse('live_feed'), params, HTTP_IF_NONE_MATCH=response['ETag'])
+        # A non-matching import only advances the generation
+        self.assertEqual(response.json(), {'generation': run.pk, 'items': []})
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('live_feed'), params).status_code, 401)
+
+    def test_generation_falls_back_to_latest_finished_import(self):
+        cache.clear()
+        ImportRun.objects.create(source='test')
+        self.assertEqual(current_import_generation(), self.first.pk)
+
+    def test_dashboard_passes_generation_to_live_feed_script(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['import_generation'], self.first.pk)
+        self.assertContains(response, reverse('live_feed'))
+
+
+class SavedSearchTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('analyst', password='secret-pass-123', email='analyst@example.org')
+        self.semaglutide = SavedSearch.objects.create(
+            user=self.user, name='FDA semaglutide', query='search=semaglutide&document_type=Guidance'
+        )
+        self.devices = SavedSearch.objects.create(user=self.user, name='Devices', query='product_type=Medical+Device')
+
+    def test_percolator_indexes_each_search_under_one_anchor(self):
+        percolator = Percolator([self.semaglutide, self.devices])
+        self.assertEqual(list(percolator.index), [('term', 'semaglutide'), ('Product_Type', 'medical device')])
+        record = {
+            'id': 1, 'title': 'Semaglutide guidance', 'summary': '', 'date': None, 'viewed': False,
+            'Drug_names': None, 'Document_Type': 'Guidance', 'Product_Type': 'Human Medicine',
+        }
+        self.assertEqual([s.pk for s, _ in percolator.percolate([record])], [self.semaglutide.pk])
+        # Search text matches whole words only
+        record['title'] = 'Semaglutides guidance'
+        self.assertEqual(list(percolator.percolate([record])), [])
+
+    def test_only_rows_inserted_by_the_run_are_matched(self):
+        old_run = ImportRun.objects.create(source='test')
+        RegulatoryData.objects.create(
+            title='Semaglutide label', article_url='https://a.example/1', Document_Type='Guidance', import_run=old_run
+        )
+        run = ImportRun.objects.create(source='test')
+        new = RegulatoryData.objects.create(
+            title='Semaglutide shortage', article_url='https://a.example/2', Document_Type='Guidance', import_run=run
+        )
+        RegulatoryData.objects.create(title='Pump recall', article_url='https://a.example/3', import_run=run)
+
+        self.assertEqual(percolate_import_run(run), 1)
+        self.assertEqual(list(SavedSearchMatch.objects.values_list('saved_search', 'record')), [(self.semaglutide.pk, new.pk)])
+
+    def test_pending_matches_survive_a_reload_of_their_record(self):
+        command = CrawlersCommand(stdout=StringIO())
+        df = pd.DataFrame({
+            'Title': ['Semaglutide guidance', 'Pump recall'], 'Document_Type': ['Guidance', ''],
+            'Article URL': ['https://a.example/1', 'https://a.example/2'], 'Source_File': ['FDAnews.xlsx'] * 2,
+        })
+        first = ImportRun.objects.create(source='test')
+        command.import_dataframe(df, import_run=first)
+        command.finish_import_run(first)
+        match = SavedSearchMatch.objects.get()
+
+        second = ImportRun.objects.create(source='test')
+        last_old_id = RegulatoryData.objects.latest('pk').pk
+        df['Title'] = ['Semaglutide guidance (revised)', 'Pump recall']
+        reloaded = set()
+        command.import_dataframe(df.iloc[:1], import_run=second, replace_up_to=last_old_id, reloaded=reloaded)
+        command.finish_import_run(second)
+        self.assertEqual(reloaded, {match.record_id})
+        self.assertEqual(RegulatoryData.objects.get(pk=match.record_id).title, 'Semaglutide guidance (revised)')
+
+        # Rows left out of the reload are archived, but not while a digest still needs them
+        self.assertEqual(archive_ids(RegulatoryData.objects.values_list('id', flat=True)), 1)
+        self.assertEqual(list(SavedSearchMatch.objects.filter(notified_at__isnull=True)), [match])
+
+    def test_send_digests_marks_matches_notified(self):
+        run = ImportRun.objects.create(source='test')
+        RegulatoryData.objects.create(
+            title='Infusion pump recall', article_url='https://a.example/3', Product_Type='Medical Device', import_run=run
+        )
+        percolate_import_run(run)
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            call_command('send_digests', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Infusion pump recall', mail.outbox[0].body)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified_at__isnull=True).exists())
+
+    def test_send_digests_marks_only_the_matches_it_sent(self):
+        run = ImportRun.objects.create(source='test')
+        RegulatoryData.objects.create(
+            title='Infusion pump recall', article_url='https://a.example/3', Product_Type='Medical Device', import_run=run
+        )
+        other = User.objects.create_user('no-email', password='secret-pass-123')
+        SavedSearch.objects.create(user=other, name='Devices', query='product_type=Medical+Device')
+        percolate_import_run(run)
+        late = RegulatoryData.objects.create(title='Pump alert', article_url='https://a.example/4', Product_Type='Medical Device')
+
+        def arrives_while_sending(*args, **kwargs):
+            SavedSearchMatch.objects.create(saved_search=self.devices, record=late)
+
+        with mock.patch('ri_app.management.commands.send_digests.send_mail', side_effect=arrives_while_sending):
+            call_command('send_digests', stdout=StringIO())
+        pending = SavedSearchMatch.objects.filter(notified_at__isnull=True)
+        # The match made during sending and the user without an address wait for the next digest
+        self.assertEqual(
+            sorted(pending.values_list('saved_search__user__username', 'record__title')),
+            [('analyst', 'Pump alert'), ('no-email', 'Infusion pump recall')],
+        )
+
+    def test_save_search_keeps_only_dashboard_filters(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('save_search'), {'query': 'search=insulin&page=3&viewed=', 'name': ''})
+        self.assertRedirects(response, reverse('saved_searches'))
+        saved = SavedSearch.objects.get(name='insulin')
+        self.assertEqual(saved.query, 'search=insulin')
+        self.assertContains(self.client.get(reverse('saved_searches')), 'FDA semaglutide')
+
+
+class DrugExtractionTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.matcher = DrugMatcher({
+            'insulin': 'insulin', 'insulin glargine': 'insulin glargine', 'lantus': 'insulin glargine',
+            'semaglutide': 'semaglutide', 'ozempic': 'semaglutide', 'glut': 'glut',
+        })
+
+    def test_automaton_finds_overlapping_whole_word_terms(self):
+        self.assertEqual(
+            self.matcher.extract('Lantus (insulin glargine) and OZEMPIC/semaglutide shortages'),
+            ['insulin glargine', 'insulin', 'semaglutide'],
+        )
+        # 'glut' only occurs inside other words
+        self.assertEqual(self.matcher.extract('semaglutides gluten'), [])
+
+    def test_extract_many_maps_matches_back_to_documents(self):
+        self.assertEqual(
+            self.matcher.extract_many(['Ozempic update', '', 'no drugs', 'insulin']),
+            [['semaglutide'], [], [], ['insulin']],
+        )
+        # 'İ' lower-cases to two characters, which must not shift later documents
+        self.assertEqual(self.matcher.extract_many(['İ' * 10, 'insulin', 'x']), [[], ['insulin'], []])
+
+    def test_import_merges_crawler_names_with_extracted_ones(self):
+        df = pd.DataFrame({
+            'Title': ['Ozempic shortage update', 'Guidance on labelling'],
+            'Summary': ['Supply of semaglutide pens', None],
+            'Article URL': ['https://a.example/1', 'https://a.example/2'],
+            'Drug_names': [None, "['Lantus']"],
+        })
+        command = CrawlersCommand(stdout=StringIO())
+        with mock.patch('ri_app.management.commands.run_crawlers.get_drug_matcher', return_value=self.matcher):
+            self.assertEqual(command.extract_drug_names(df), ['semaglutide', 'insulin glargine'])
+
+    def test_drug_filter_matches_each_name_of_a_multi_drug_record(self):
+        for n, drugs in enumerate(['insulin glargine, Semaglutide', 'semaglutide', 'Insulin,liraglutide', None]):
+            RegulatoryData.objects.create(title=f'Note {n}', Drug_names=drugs, article_url=f'https://a.example/{n}')
+
+        def titles(drug_name):
+            return sorted(filter_queryset(RegulatoryData.objects.all(), {'drug_name': drug_name}).values_list('title', flat=True))
+
+        self.assertEqual(titles('Semaglutide'), ['Note 0', 'Note 1'])
+        # Whole names only: insulin is not insulin glargine
+        self.assertEqual(titles('insulin'), ['Note 2'])
+        self.assertEqual(titles('liraglutide'), ['Note 2'])
+
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        search = SavedSearch.objects.create(user=user, name='Insulin', query='drug_name=insulin')
+        records = RegulatoryData.objects.order_by('pk').values(*PERCOLATOR_FIELDS)
+        self.assertEqual([record_id for _, record_id in Percolator([search]).percolate(records)],
+                         list(RegulatoryData.objects.filter(title='Note 2').values_list('pk', flat=True)))
+
+
+class ClassificationTests(LocalCacheTestCase):
+    def test_crawler_label_then_rules_then_placeholders_dropped(self):
+        df = pd.DataFrame({
+            'Title': [
+                'Urgent Field Safety Notice for infusion pump', 'Field Safety Notice for infusion pump',
+                'Board update', 'Board update', 'European Medicines Agency board update',
+            ],
+            'Product_Type': ['Drug Product', 'Other', 'Human Medicine', 'Other', ''],
+            'Document_Type': ['Law', 'Other Type', 'NDA Approval', 'Other Type', None],
+        })
+        with self.settings(RI_TYPE_TRAINING=''):
+            labelled = classify_frame(df)
+        self.assertEqual(list(labelled['Product_Type']), ['Drug Product', 'Medical Device', 'Drug Product', None, None])
+        self.assertEqual(
+            list(labelled['Document_Type']), ['Legislation', 'Safety Communication', 'Approval', None, None]
+        )
+
+    def test_centroid_model_falls_back_to_none_when_unsure(self):
+        model = CentroidModel(
+            ['agenda of the board meeting', 'minutes of committee meeting', 'annual activity report', 'inspection report'],
+            ['Meeting', 'Meeting', 'Report', 'Report'],
+        )
+        self.assertEqual(model.predict(['meeting agenda published', 'yearly report', 'unrelated words']),
+                         ['Meeting', 'Report', None])
+
+    def test_classify_records_relabels_stored_rows(self):
+        item = RegulatoryData.objects.create(
+            title='Questions and answers on clinical trials', article_url='https://a.example/1',
+            Product_Type='none', Document_Type='Other Type',
+        )
+        call_command('classify_records', stdout=StringIO())
+        item.refresh_from_db()
+        self.assertEqual(item.Document_Type, 'Q&A')
+        self.assertIn(item.Document_Type, DOCUMENT_TYPES)
+
+    def test_dashboard_offers_fixed_vocabulary(self):
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        RegulatoryData.objects.create(title='x', article_url='https://a.example/1', Document_Type='Other Type')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(list(response.context['document_types']), list(DOCUMENT_TYPES))
+
+
+class RelatedArticlesTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create('Semaglutide shortage update', 'Supply of semaglutide pens remains limited', 'https://ema.example/1')
+        self.create('Semaglutide pens in short supply', 'Shortage of semaglutide expected to continue', 'https://mhra.example/2')
+        self.create('Field safety notice for infusion pumps', 'Infusion pump software recall', 'https://fda.example/3')
+
+    def create(self, title, summary, url):
+        return RegulatoryData.objects.create(title=title, summary=summary, article_url=url)
+
+    def neighbours(self, url):
+        record = RegulatoryData.objects.get(article_url=url)
+        return [n.related.article_url for n in record.related_articles.select_related('related')]
+
+    def test_neighbours_are_stored_and_shown_on_detail(self):
+        self.assertEqual(update_related(k=2), 3)
+        self.assertEqual(self.neighbours('https://ema.example/1'), ['https://mhra.example/2'])
+        self.assertEqual(self.neighbours('https://fda.example/3'), [])
+
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        record = RegulatoryData.objects.get(article_url='https://ema.example/1')
+        response = self.client.get(reverse('detail', args=[record.pk]))
+        self.assertContains(response, 'Semaglutide pens in short supply')
+
+    def test_updates_only_compute_new_rows_and_survive_reload(self):
+        update_related(k=2)
+        self.create('Recall of infusion pump software', 'Pump software recall extended', 'https://bfarm.example/4')
+        self.assertEqual(update_related(k=2), 1)
+        self.assertEqual(self.neighbours('https://fda.example/3'), ['https://bfarm.example/4'])
+
+        # A reload renumbers the hot table; lists are restored without recomputation
+        rows = list(RegulatoryData.objects.values('title', 'summary', 'article_url'))
+        RegulatoryData.objects.all().delete()
+        RegulatoryData.objects.bulk_create([RegulatoryData(**row) for row in rows])
+        self.assertEqual(RelatedArticle.objects.count(), 0)
+        self.assertEqual(update_related(k=2), 0)
+        self.assertEqual(self.neighbours('https://fda.example/3'), ['https://bfarm.example/4'])
+
+    def test_rows_edited_in_place_are_vectorised_again(self):
+        update_related(k=2)
+        pump = RegulatoryData.objects.get(article_url='https://fda.example/3')
+        unchanged = RegulatoryData.objects.get(article_url='https://ema.example/1')
+        self.assertEqual(update_related(k=2, updated=[pump.pk, unchanged.pk]), 0)
+
+        RegulatoryData.objects.filter(pk=pump.pk).update(
+            title='Semaglutide pen shortage', summary='Semaglutide supply remains limited',
+        )
+        self.assertEqual(update_related(k=2, updated=[pump.pk, unchanged.pk]), 1)
+        self.assertIn('https://fda.example/3', self.neighbours('https://ema.example/1'))
+
+
+class RollupTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        self.df = pd.DataFrame({
+            'Title': ['a', 'b', 'c'],
+            'Summary': ['', '', ''],
+            'Article URL': ['https://a.example/1', 'https://a.example/2', 'https://a.example/3'],
+            'Date': [today.isoformat(), today.isoformat(), (today - timedelta(days=30)).isoformat()],
+            'Document_Type': ['Guidance', 'Guidance', 'Report'],
+            'Source_File': ['FDAnews.xlsx', 'FDAnews.xlsx', 'EMAnews2.xlsx'],
+        })
+        CrawlersCommand(stdout=StringIO()).import_dataframe(self.df)
+
+    def snapshot(self):
+        return sorted(ActivityRollup.objects.values_list('agency', 'category', 'Document_Type', 'week', 'count'))
+
+    def test_incremental_counts_match_a_rebuild(self):
+        self.assertEqual(sum(row[-1] for row in self.snapshot()), 3)
+        incremental = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_moving_between_tiers_keeps_counts_and_removal_decrements(self):
+        before = self.snapshot()
+        archive_ids(RegulatoryData.objects.values_list('id', flat=True))
+        self.assertEqual(self.snapshot(), before)
+
+        record_removed(ArchivedRegulatoryData.objects.filter(Document_Type='Report'))
+        ArchivedRegulatoryData.objects.filter(Document_Type='Report').delete()
+        self.assertEqual([row[2] for row in self.snapshot()], ['Guidance'])
+
+    def test_analytics_reads_only_rollups(self):
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        RegulatoryData.objects.all().delete()  # The page must not depend on the detail table
+        data = self.client.get(reverse('analytics_data'), {'document_type': 'Guidance'}).json()
+        self.assertEqual(data['total'], 2)
+        self.assertEqual([entry['count'] for entry in data['weeks']], [2])
+        response = self.client.get(reverse('analytics'))
+        self.assertContains(response, 'Records per week')
+        self.assertEqual(response.context['total'], 3)
+
+
+class CrawlerSandboxTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output_dir = os.path.join(self.state_dir, 'out')
+        os.mkdir(self.output_dir)
+        self.sandbox = CrawlerSandbox(
+            limits={'timeout_seconds': 2, 'memory_mb': 128, 'address_space_mb': 0}, output_dir=self.output_dir,
+        )
+
+    def test_limits_come_from_the_setting(self):
+        with self.settings(RI_CRAWLER_LIMITS={'timeout_seconds': 60}):
+            self.assertEqual(crawler_limits(), {**dict.fromkeys(DEFAULT_LIMITS, 0), 'timeout_seconds': 60})
+        with self.settings():
+            del settings.RI_CRAWLER_LIMITS
+            self.assertEqual(crawler_limits(), DEFAULT_LIMITS)
+
+    def test_outputs_collected_logs_captured_and_usage_recorded(self):
+        result = self.sandbox.run('Writer', b"print('crawling'); open('Writer.xlsx', 'w').write('x')")
+        self.assertTrue(result.succeeded)
+        self.assertEqual(result.output_files, [os.path.join(self.output_dir, 'Writer.xlsx')])
+        with open(result.log_path) as log:
+            self.assertIn('crawling', log.read())
+        self.assertIsNotNone(result.max_rss_kb)
+
+    def test_runaway_crawlers_are_stopped(self):
+        result = self.sandbox.run('Sleeper', b"import time; time.sleep(60)")
+        self.assertTrue(result.timed_out)
+        self.assertLess(result.duration, 15)
+
+        result = self.sandbox.run('Hog', b"import time\nblocks = []\nwhile True:\n    blocks.append(b'x' * 2 ** 24)\n    time.sleep(0.05)")
+        self.assertTrue(result.memory_exceeded)
+        self.assertFalse(result.timed_out)
+        with open(result.log_path) as log:
+            self.assertIn('resident memory', log.read())
+
+        self.sandbox.limits['address_space_mb'] = 512
+        result = self.sandbox.run('Reserver', b"block = bytearray(1024 * 1024 * 1024)")
+        self.assertFalse(result.succeeded)
+        with open(result.log_path) as log:
+            self.assertIn('MemoryError', log.read())
+
+    def test_crawlers_only_see_allow_listed_environment(self):
+        script = b"import os; print(sorted(set(os.environ) & {'PATH', 'RI_TEST_SECRET', 'RI_TEST_EXTRA'}))"
+        with mock.patch.dict(os.environ, {'RI_TEST_SECRET': 'x', 'RI_TEST_EXTRA': 'y'}), \
+                self.settings(RI_CRAWLER_ENV=['RI_TEST_EXTRA']):
+            result = self.sandbox.run('Env', script)
+        with open(result.log_path) as log:
+            self.assertIn("['PATH', 'RI_TEST_EXTRA']", log.read())
+
+
+class TypeaheadTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [
+            ('Semaglutide shortage update', 'SEMAGLUTIDE', 'FDA'),
+            ('Semaglutide label change', 'SEMAGLUTIDE, INSULIN', 'FDA'),
+            ('Selumetinib approval', 'SELUMETINIB', 'EMA'),
+            ('Insulin pens recall', 'INSULIN', 'Swissmedic'),
+        ]
+        for n, (title, drugs, agency) in enumerate(rows):
+            RegulatoryData.objects.create(
+                title=title, Drug_names=drugs, agency=agency, article_url=f'https://a.example/{n}'
+            )
+
+    def test_completions_are_ranked_by_frequency(self):
+        index = PrefixIndex(collect_entries())
+        self.assertEqual(
+            [(r['value'], r['count']) for r in index.complete('se', kind='drug')],
+            [('SEMAGLUTIDE', 2), ('SELUMETINIB', 1)],
+        )
+        self.assertEqual([r['value'] for r in index.complete('sema')], ['SEMAGLUTIDE', 'semaglutide'])
+        self.assertEqual(index.complete('Swi', kind='agency'), [{'value': 'Swissmedic', 'kind': 'agency', 'count': 1}])
+        self.assertEqual(index.complete('s', limit=1), index.complete('se', limit=1))
+        # Stopwords and the drug list are not title suggestions
+        self.assertEqual(index.complete('upd', kind='title'), [])
+
+    def test_endpoint_serves_the_index_of_the_latest_import(self):
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        run = ImportRun.objects.create(source='test', finished_at=timezone.now())
+        publish_import_generation(run.pk)
+        build_index(run.pk)
+        RegulatoryData.objects.create(title='Semaglutide pens', Drug_names='SEMAGLUTIDE', article_url='https://a.example/9')
+
+        data = self.client.get(reverse('typeahead'), {'q': 'semag', 'kind': 'drug'}).json()
+        self.assertEqual(data['results'], [{'value': 'SEMAGLUTIDE', 'kind': 'drug', 'count': 2}])
+        self.assertEqual(self.client.get(reverse('typeahead'), {'q': 'x', 'kind': 'nope'}).status_code, 400)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('drug_names', response.context)
+        self.assertContains(response, 'id="drug-suggestions"')
+
+    def test_requests_never_build_the_index(self):
+        typeahead._loaded = (None, typeahead.EMPTY_INDEX)
+        run = ImportRun.objects.create(source='test', finished_at=timezone.now())
+        publish_import_generation(run.pk)
+        with mock.patch('ri_app.typeahead.collect_entries') as collect:
+            self.assertEqual(len(typeahead.get_index()), 0)
+        collect.assert_not_called()
+
+        typeahead.build_index(run.pk)
+        typeahead._loaded = (None, typeahead.EMPTY_INDEX)
+        # A newer import whose index is not built yet is served the previous one
+        publish_import_generation(run.pk + 1)
+        self.assertEqual(typeahead.get_index().complete('insulin', kind='drug')[0]['value'], 'INSULIN')
+
+    def test_suggested_drug_filters_every_record_listing_it(self):
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        run = ImportRun.objects.create(source='test', finished_at=timezone.now())
+        publish_import_generation(run.pk)
+        build_index(run.pk)
+
+        suggestion = self.client.get(reverse('typeahead'), {'q': 'insu', 'kind': 'drug'}).json()['results'][0]
+        self.assertEqual((suggestion['value'], suggestion['count']), ('INSULIN', 2))
+        response = self.client.get(reverse('dashboard'), {'drug_name': suggestion['value']})
+        self.assertEqual(
+            sorted(item.title for item in response.context['items']),
+            ['Insulin pens recall', 'Semaglutide label change'],
+        )
+
+
+class UrlKeyTests(LocalCacheTestCase):
+    def test_url_variants_share_one_key(self):
+        variants = [
+            'https://www.ema.europa.eu/en/news/item?b=2&a=1',
+            'http://WWW.EMA.europa.eu:80/en/news/item/?a=1&b=2&utm_source=feed#top',
+            ' https://www.ema.europa.eu/en/news/item?fbclid=x&a=1&b=2 ',
+        ]
+        self.assertEqual({canonical_url(url) for url in variants}, {'https://www.ema.europa.eu/en/news/item?a=1&b=2'})
+        self.assertEqual(len({url_key(url) for url in variants}), 1)
+        self.assertNotEqual(url_key('https://ema.europa.eu/en/news/item?id=1'), url_key('https://ema.europa.eu/en/news/item?id=2'))
+
+        # Migration 0018 keyed the existing rows with its own copy of the function
+        migration = importlib.import_module('ri_app.migrations.0018_fill_url_keys')
+        for url in variants + ['https://fda.gov/a/', 'not a url', '', 'https://x.example:8443/p?utm_medium=a&b=']:
+            self.assertEqual(migration.url_key(url), url_key(url))
+
+    def test_dedup_and_existence_checks_use_the_key(self):
+        RegulatoryData.objects.create(title='Known', article_url='http://fda.example/a/')
+        df = pd.DataFrame({
+            'Title': ['Known again', 'New', 'New with tracking'],
+            'Article URL': ['https://fda.example/a', 'https://fda.example/b', 'https://fda.example/b?utm_medium=email'],
+        })
+        recent, _ = CrawlersCommand(stdout=StringIO()).prepare_dataframe(df)
+        self.assertEqual(list(recent['Title']), ['Known again', 'New'])
+        self.assertEqual(CrawlersCommand(stdout=StringIO()).import_dataframe(recent), 1)
+        self.assertEqual(RegulatoryData.objects.count(), 2)
+
+
+class ValidationTests(LocalCacheTestCase):
+    def frame(self):
+        return pd.DataFrame({
+            'Title': ['Good', 'x' * 600, None, 'Bad link', 'Long link'],
+            'Link': [
+                'https://ema.example/1', 'https://ema.example/2', 'https://ema.example/3', 'ema.example/4',
+                'https://ema.example/' + 'a' * 1000,
+            ],
+            'Summary': ['s', 's', 's', 's', 's'],
+        })
+
+    def test_frame_is_checked_in_bulk_against_the_schema(self):
+        valid, rejected, report = validate_frame(self.frame(), 'EMAnews2.xlsx')
+        self.assertEqual(list(valid['Article URL']), ['https://ema.example/1', 'https://ema.example/2'])
+        self.assertEqual(len(valid['Title'].iloc[1]), 500)
+        self.assertIsNone(valid['Drug_names'].iloc[0])
+        self.assertEqual(list(rejected['Reasons']), [
+            'Title: empty', 'Article URL: not an http(s) URL', 'Article URL: longer than 1000',
+        ])
+        self.assertEqual((report['valid_rows'], report['quarantined'], report['truncated']), (2, 3, 1))
+        self.assertIn('Drug_names', report['missing_columns'])
+
+    def test_reading_files_quarantines_rows_and_reports_per_source(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            good = os.path.join(workdir, 'EMAnews2.xlsx')
+            self.frame().to_excel(good, index=False)
+            broken = os.path.join(workdir, 'FDAnews.xlsx')
+            with open(broken, 'w') as f:
+                f.write('not a spreadsheet')
+            command = CrawlersCommand(stdout=StringIO())
+            with self.assertLogs(level='WARNING'):
+                df = command.read_excel_files([good, broken])
+                command.read_excel_files([good])
+
+        self.assertEqual(list(df['Source_File']), ['EMAnews2.xlsx', 'EMAnews2.xlsx'])
+        self.assertEqual(QuarantinedRecord.objects.count(), 3)
+        self.assertEqual(QuarantinedRecord.objects.filter(reasons='Title: empty').get().data['Article URL'],
+                         'https://ema.example/3')
+        reports = SourceQualityReport.objects.order_by('id')
+        self.assertEqual([(r.source_file, r.readable, r.quarantined) for r in reports], [
+            ('EMAnews2.xlsx', True, 3), ('FDAnews.xlsx', False, 0), ('EMAnews2.xlsx', True, 3),
+        ])
+
+
+class PipelineTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.workdir = self.state_dir
+
+    def copy_stage(self, name, source, target, after=()):
+        def run():
+            with open(os.path.join(self.workdir, source)) as f:
+                text = f.read()
+            with open(os.path.join(self.workdir, target), 'w') as f:
+                f.write(text.upper())
+            return True
+        return Stage(name, run, inputs=[source], outputs=[target], after=after)
+
+    def test_unchanged_stages_are_skipped_and_failures_block_dependents(self):
+        with open(os.path.join(self.workdir, 'a.txt'), 'w') as f:
+            f.write('a')
+        calls = []
+        failing = {'c'}
+
+        def runner(stage):
+            calls.append(stage.name)
+            return stage.name not in failing and stage.method()
+
+        stages = [
+            self.copy_stage('b', 'a.txt', 'b.txt'),
+            self.copy_stage('c', 'b.txt', 'c.txt', after=['b']),
+            self.copy_stage('d', 'c.txt', 'd.txt', after=['c']),
+            self.copy_stage('e', 'b.txt', 'e.txt', after=['b']),
+        ]
+        pipeline = Pipeline(stages, self.workdir, runner)
+        self.assertEqual(pipeline.run(), {'b': DONE, 'c': FAILED, 'd': BLOCKED, 'e': DONE})
+
+        failing.clear()
+        calls.clear()
+        self.assertEqual(pipeline.run(), {'b': UP_TO_DATE, 'c': DONE, 'd': DONE, 'e': UP_TO_DATE})
+        self.assertEqual(calls, ['c', 'd'])
+
+        calls.clear()
+        pipeline.run(from_stage='c')
+        self.assertEqual(calls, ['c', 'd'])
+
+        calls.clear()
+        with open(os.path.join(self.workdir, 'a.txt'), 'w') as f:
+            f.write('changed')
+        pipeline.run()
+        self.assertEqual(calls, ['b', 'c', 'd', 'e'])
+
+    def test_stages_build_without_reference_files_and_publish_comes_last(self):
+        missing = os.path.join(self.workdir, 'missing.txt')
+        with self.settings(RI_TYPE_TRAINING=missing, RI_DRUG_DICTIONARY=missing):
+            stages = Pipeline(CrawlersCommand().pipeline_stages({'keep_old_data': False}), self.workdir, None).stages
+        by_name = {stage.name: stage for stage in stages}
+        self.assertIsNone(by_name['combine'].params['training'])
+        self.assertIsNone(by_name['import'].params['dictionary'])
+        self.assertEqual(stages[-1], by_name['publish'])
+        self.assertEqual(set(by_name['publish'].after), {'docx', 'import'})
+
+    def test_resume_from_stage_reuses_the_run_workspace(self):
+        corpus = generate_records(60, seed=5)
+        reference = write_reference_csv(os.path.join(self.workdir, 'reference.csv'), corpus)
+
+        def crawl(command):
+            write_crawler_files(command.workspace, corpus)
+            return True
+
+        with mock.patch.object(CrawlersCommand, 'GITHUB_CSV_URL', reference), \
+                mock.patch.object(CrawlersCommand, 'run_all_crawlers', autospec=True, side_effect=crawl) as crawler:
+            call_command('run_crawlers', '--skip-docx', stdout=StringIO())
+            self.assertTrue(os.path.exists(os.path.join(self.workdir, 'RI.xlsx')))
+            imported = RegulatoryData.objects.count()
+            self.assertGreater(imported, 0)
+
+            RegulatoryData.objects.all().delete()
+            out = StringIO()
+            call_command('run_crawlers', '--skip-docx', '--from-stage', 'import', stdout=out)
+
+        self.assertEqual(crawler.call_count, 1)
+        self.assertIn(f'combine  {UP_TO_DATE}', out.getvalue())
+        self.assertIn(f'import   {DONE}', out.getvalue())
+        self.assertEqual(RegulatoryData.objects.count(), imported)
+        self.assertEqual(len(os.listdir(os.path.join(self.workdir, 'pipeline_runs'))), 1)
+
+
+class RegulatoryDataAdminTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date().isoformat()
+        CrawlersCommand(stdout=StringIO()).import_dataframe(pd.DataFrame({
+            'Title': ['Pump recall', 'Insulin guidance', 'Tablet shortage'],
+            'Summary': ['', '', ''],
+            'Article URL': ['https://fda.example/1', 'https://fda.example/2', 'https://ema.example/3'],
+            'Date': [today, today, today],
+            'Source_File': ['FDAnews.xlsx', 'FDAnews.xlsx', 'EMAnews2.xlsx'],
+        }))
+        self.insulin, self.pump, self.tablet = RegulatoryData.objects.order_by('title')
+        RelatedArticle.objects.create(record=self.tablet, related=self.pump, rank=0, score=0.5)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123'))
+        self.url = reverse('admin:ri_app_regulatorydata_changelist')
+
+    def action(self, name, records, **extra):
+        return self.client.post(self.url, {
+            'action': name, '_selected_action': [record.pk for record in records], **extra
+        })
+
+    def test_changelist_filters_come_from_facets_and_search_uses_lookups(self):
+        self.client.get(self.url, {'agency': 'FDA'})
+        # Facet choices and the result count are cached: only the session user and the page are queried
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'agency': 'FDA'})
+        self.assertContains(response, 'Pump recall')
+        self.assertNotContains(response, 'Tablet shortage')
+
+        response = self.client.get(self.url, {'q': str(self.tablet.pk)})
+        self.assertEqual(list(response.context['cl'].queryset), [self.tablet])
+        response = self.client.get(self.url, {'q': 'https://fda.example/2'})
+        self.assertEqual(list(response.context['cl'].queryset), [self.insulin])
+
+        RegulatoryData.objects.filter(pk=self.pump.pk).update(summary='Software defect in infusion sets')
+        self.assertEqual(list(self.client.get(self.url, {'q': 'infusion'}).context['cl'].queryset), [])
+        response = self.client.get(self.url, {'q': 'Summary: infusion'})
+        self.assertEqual(list(response.context['cl'].queryset), [self.pump])
+        self.assertContains(response, 'summary:')
+
+    def test_bulk_actions_are_set_based_and_keep_rollups(self):
+        self.action('mark_viewed', [self.pump, self.insulin])
+        self.assertEqual(RegulatoryData.objects.filter(viewed=True).count(), 2)
+
+        self.assertContains(self.action('reassign_agency_category', [self.pump]), 'name="apply"')
+        self.action('reassign_agency_category', [self.pump], agency='MHRA', category='', apply='1')
+        self.assertEqual(RegulatoryData.objects.get(pk=self.pump.pk).agency, 'MHRA')
+        snapshot = sorted(ActivityRollup.objects.values_list('agency', 'category', 'week', 'count'))
+        rebuild_rollups()
+        self.assertEqual(sorted(ActivityRollup.objects.values_list('agency', 'category', 'week', 'count')), snapshot)
+
+        self.action('delete_by_source', [self.tablet])
+        self.assertEqual(RegulatoryData.objects.count(), 2)
+        self.assertEqual(RelatedArticle.objects.count(), 0)
+        self.assertEqual(sum(ActivityRollup.objects.values_list('count', flat=True)), 2)
+
+    def test_single_record_edits_invalidate_cached_pages(self):
+        version = get_data_version()
+        change_url = reverse('admin:ri_app_regulatorydata_change', args=[self.pump.pk])
+        form = self.client.get(change_url).context['adminform'].form
+        data = {name: value for name, value in form.initial.items() if value is not None}
+        self.client.post(change_url, {**data, 'title': 'Pump recall (updated)'})
+        self.assertEqual(RegulatoryData.objects.get(pk=self.pump.pk).title, 'Pump recall (updated)')
+        self.assertNotEqual(get_data_version(), version)
+
+        version = get_data_version()
+        self.client.post(reverse('admin:ri_app_regulatorydata_delete', args=[self.pump.pk]), {'post': 'yes'})
+        self.assertFalse(RegulatoryData.objects.filter(pk=self.pump.pk).exists())
+        self.assertNotEqual(get_data_version(), version)
+
+    def test_single_record_edits_keep_rollups_in_step(self):
+        def rollups():
+            return sorted(ActivityRollup.objects.values_list('agency', 'category', 'Document_Type', 'week', 'count'))
+
+        change_url = reverse('admin:ri_app_regulatorydata_change', args=[self.pump.pk])
+        form = self.client.get(change_url).context['adminform'].form
+        data = {name: value for name, value in form.initial.items() if value is not None}
+        self.client.post(change_url, {**data, 'agency': 'MHRA', 'date': '2020-01-06'})
+        self.client.post(reverse('admin:ri_app_regulatorydata_delete', args=[self.tablet.pk]), {'post': 'yes'})
+        self.client.post(reverse('admin:ri_app_regulatorydata_add'), {**data, 'title': 'Pump recall (copy)'})
+        self.assertEqual(RegulatoryData.objects.count(), 3)
+
+        snapshot = rollups()
+        self.assertIn(('MHRA', data['category'], '', date(2020, 1, 6), 1), snapshot)
+        rebuild_rollups()
+        self.assertEqual(rollups(), snapshot)
+
+
+class ExportTests(LocalCacheTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        RegulatoryData.objects.create(
+            title='Semaglutide <shortage> update', article_url='https://ema.europa.eu/a?x=1&y=2', date=today,
+            agency='EMA', category='EU Regulatory', summary='Full summary\x0b text', Document_Type='News',
+        )
+        RegulatoryData.objects.create(title='Device recall', article_url='https://fda.gov/b', date=today)
+        ArchivedRegulatoryData.objects.create(
+            title='Old semaglutide note', article_url='https://ema.europa.eu/old', date=today - timedelta(days=800)
+        )
+        self.client.force_login(User.objects.create_user('analyst', password='secret-pass-123'))
+
+    def test_xlsx_export_streams_filtered_rows_with_links(self):
+        response = self.client.get(reverse('export'), {'search': 'semaglutide'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:4], ('Title', 'Date', 'Agency', 'Category'))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], 'Semaglutide <shortage> update')
+        self.assertEqual(rows[1][2:4], ('EMA', 'EU Regulatory'))
+        self.assertEqual(rows[1][7], 'Full summary text')
+        self.assertEqual(sheet['A2'].hyperlink.target, 'https://ema.europa.eu/a?x=1&y=2')
+
+    def test_csv_export_can_include_the_archive(self):
+        response = self.client.get(reverse('export'), {'search': 'semaglutide', 'include_archive': '1', 'format': 'csv'})
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][:3], ['Title', 'Date', 'Agency'])
+        self.assertEqual(rows[2][-1], 'https://ema.europa.eu/old')
+
+
+class DashboardApiTests(LocalCacheTransactionTestCase):
+    # The API queries run on pool threads with their own connections, so the rows must be committed
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(user)
+        for n, (agency, document_type) in enumerate([('FDA', 'Guidance'), ('FDA', 'Guidance'), ('EMA', 'Report')]):
+            RegulatoryData.objects.create(
+                title=f'Semaglutide note {n}', article_url=f'https://a.example/{n}', agency=agency,
+                Document_Type=document_type, Drug_names='SEMAGLUTIDE' if n else None,
+            )
+
+    def test_payload_combines_listing_count_and_facets(self):
+        data = self.client.get(reverse('dashboard_api'), {'document_type': 'Guidance'}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(sorted(item['title'] for item in data['items']), ['Semaglutide note 0', 'Semaglutide note 1'])
+        self.assertEqual(data['facets']['agency'], [{'value': 'FDA', 'count': 2}])
+        self.assertEqual(data['facets']['drug_names'], ['SEMAGLUTIDE'])
+        self.assertEqual(data['items'][0]['url'], reverse('detail', args=[data['items'][0]['id']]))
+
+    def test_queries_on_the_pool_count_in_the_request_metrics(self):
+        request_metrics.reset()
+        self.client.get(reverse('dashboard_api'))
+        # Listing, count, three facets and the cached drug names all ran on pool threads
+        self.assertGreaterEqual(request_metrics.snapshot()['views']['dashboard_api']['queries_total'], 6)
+
+    def test_slow_query_times_out_and_anonymous_users_are_refused(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow(queryset):
+            release.wait(5)
+            return []
+
+        # A pool of its own, drained before the overrides end, so the timed-out query cannot outlive them
+        executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ri-api-test')
+        with mock.patch('ri_app.api._executor', executor), mock.patch('ri_app.api.drug_name_facets', slow), \
+                self.settings(RI_API_TIMEOUT=0.05):
+            with self.assertLogs('django.request', level='ERROR'):
+                self.assertEqual(self.client.get(reverse('dashboard_api')).status_code, 504)
+            release.set()
+            executor.shutdown(wait=True)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('dashboard_api')).status_code, 401)
+
+
+@override_settings(STATICFILES_STORAGE=PLAIN_STATIC)
+class StaticAssetTests(TestCase):
+    def test_pages_do_not_reference_third_party_cdns(self):
+        response = self.client.get(reverse('login'))
+        self.assertContains(response, '/static/ri_app/vendor/bootstrap/css/bootstrap.min.css')
+        for host in ('jsdelivr', 'npmcdn', 'unpkg'):
+            self.assertNotContains(response, host)
@@ -0,0 +1,133 @@
+"""
+Typeahead suggestions for the dashboard's drug filter and search box.
+
+Drug names, agencies and title words of the hot table are counted once per
+import and kept as a sorted array of lower-cased terms, so the terms starting
+with a prefix are one bisect away. Completions are ranked by how many records
+carry the term; the best ones for every one- and two-letter prefix are worked
+out while the index is built, as those ranges are the long ones.
+
+The index is only built when an import finishes; requests use the latest
+index built, even if it is a generation behind, and never build one.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .caching import current_import_generation
+from .filters import split_drug_names
+from .models import RegulatoryData
+
+KINDS = ('drug', 'agency', 'title')
+MAX_LIMIT = 20
+PRECOMPUTED_PREFIX_CHARS = 2
+INDEX_CACHE_KEY = 'ri:typeahead'
+INDEX_GENERATION_CACHE_KEY = 'ri:typeahead:generation'
+
+TITLE_TOKEN = re.compile(r'[^\W\d_][\w-]{2,}')
+# Title words too common to be worth suggesting
+STOPWORDS = frozenset('''
+    about after against also and are for from has have into its new not off
+    on one out over the their this under update updates was were will with
+'''.split())
+
+
+class PrefixIndex:
+    """Sorted (term, kind) entries with their display value and record count"""
+
+    def __init__(self, entries):
+        # entries: iterable of (value, kind, count)
+        rows = sorted((value.lower(), kind, value, count) for value, kind, count in entries)
+        self.terms = [row[0] for row in rows]
+        self.kinds = [row[1] for row in rows]
+        self.values = [row[2] for row in rows]
+        self.counts = [row[3] for row in rows]
+        self.top = {}
+        short = {}
+        for position, term in enumerate(self.terms):
+            for length in range(1, min(PRECOMPUTED_PREFIX_CHARS, len(term)) + 1):
+                for kind in (None, self.kinds[position]):
+                    short.setdefault((term[:length], kind), []).append(position)
+        for key, positions in short.items():
+            self.top[key] = self._best(positions, MAX_LIMIT)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _best(self, positions, limit):
+        return heapq.nsmallest(limit, positions, key=lambda position: (-self.counts[position], self.terms[position]))
+
+    def complete(self, prefix, kind=None, limit=10):
+        """Up to `limit` completions of `prefix`, most frequent first, as dicts"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        limit = max(1, min(limit, MAX_LIMIT))
+        if len(prefix) <= PRECOMPUTED_PREFIX_CHARS:
+            positions = self.top.get((prefix, kind), [])[:limit]
+        else:
+            start = bisect_left(self.terms, prefix)
+            end = bisect_left(self.terms, prefix + '\uffff', start)
+            candidates = range(start, end) if kind is None else (
+                position for position in range(start, end) if self.kinds[position] == kind
+            )
+            positions = self._best(candidates, limit)
+        return [
+            {'value': self.values[position], 'kind': self.kinds[position], 'count': self.counts[position]}
+            for position in positions
+        ]
+
+
+def collect_entries(queryset=None):
+    """(value, kind, record count) for every drug name, agency and title word in `queryset`"""
+    queryset = (RegulatoryData.objects.all() if queryset is None else queryset).order_by()
+
+    drugs = Counter()
+    for value, n in queryset.exclude(Drug_names__isnull=True).values_list('Drug_names').annotate(n=Count('id')):
+        for name in set(split_drug_names(value)):
+            drugs[name] += n
+
+    agencies = queryset.exclude(agency__isnull=True).exclude(agency='').values_list('agency').annotate(n=Count('id'))
+
+    words = Counter()
+    for title in queryset.values_list('title', flat=True).iterator(chunk_size=2000):
+        words.update({word for word in TITLE_TOKEN.findall((title or '').lower()) if word not in STOPWORDS})
+
+    return (
+        [(name, 'drug', n) for name, n in drugs.items()]
+        + [(agency, 'agency', n) for agency, n in agencies]
+        + [(word, 'title', n) for word, n in words.items()]
+    )
+
+
+EMPTY_INDEX = PrefixIndex([])
+
+_loaded = (None, EMPTY_INDEX)
+
+
+def build_index(generation):
+    """Build the index for an import generation and share it with the other workers through the cache"""
+    global _loaded
+    index = PrefixIndex(collect_entries())
+    cache.set(INDEX_CACHE_KEY, (generation, index), None)
+    cache.set(INDEX_GENERATION_CACHE_KEY, generation, None)
+    _loaded = (generation, index)
+    return index
+
+
+def get_index():
+    """
+    The latest index built: the one for the latest import once it is ready,
+    the previous one until then, and an empty index before the first import
+    """
+    global _loaded
+    if _loaded[0] != current_import_generation():
+        # The small key tells whether the shared index is newer than ours before fetching it
+        built = cache.get(INDEX_GENERATION_CACHE_KEY)
+        if built is not None and built != _loaded[0]:
+            _loaded = cache.get(INDEX_CACHE_KEY) or _loaded
+    return _loaded[1]
@@ -0,0 +1,178 @@
+"""
+Declarative schema for crawler spreadsheets, checked a whole frame at a time.
+
+Every crawler file is renamed onto the canonical columns, checked column by
+column with vectorized masks and split into rows that can be imported and
+rows that are quarantined with their reasons. Text limits come from the
+model's CharField max_length, so over-long values are dealt with here rather
+than failing at bulk_create.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from .models import QuarantinedRecord, RegulatoryData, SourceQualityReport
+
+# Values the crawlers write for "no value"
+PLACEHOLDERS = ('', 'none', 'nan', 'n/a', 'na', 'null')
+
+URL_PATTERN = r'^https?://[^\s/$.?#][^\s]*$'
+
+
+def field_limit(name):
+    return RegulatoryData._meta.get_field(name).max_length
+
+
+# Canonical columns. 'overflow' is what happens to text over max_length:
+# 'truncate' keeps the row, 'reject' quarantines it.
+SCHEMA = {
+    'Title': {'required': True, 'max_length': field_limit('title'), 'overflow': 'truncate'},
+    'Article URL': {
+        'required': True, 'url': True, 'max_length': field_limit('article_url'), 'overflow': 'reject',
+    },
+    'Summary': {},
+    'Date': {},
+    'Product_Type': {'max_length': field_limit('Product_Type'), 'overflow': 'truncate'},
+    'Document_Type': {'max_length': field_limit('Document_Type'), 'overflow': 'truncate'},
+    'Drug_names': {'max_length': field_limit('Drug_names'), 'overflow': 'truncate'},
+}
+
+# Header spellings seen in crawler output, by canonical column
+ALIASES = {
+    'Title': ['title', 'Headline', 'Article Title'],
+    'Article URL': ['URL', 'Url', 'Link', 'Article Url', 'Article_URL', 'article_url'],
+    'Summary': ['summary', 'Description', 'Content'],
+    'Date': ['date', 'Published', 'Publication Date'],
+    'Product_Type': ['Product Type', 'product_type'],
+    'Document_Type': ['Document Type', 'document_type'],
+    'Drug_names': ['Drug Names', 'Drug_Names', 'drug_names'],
+}
+
+# Per-source changes to SCHEMA, keyed by file name without extension
+SOURCE_SCHEMAS = {}
+
+
+def schema_for(source_file):
+    """SCHEMA with the overrides for this crawler file applied"""
+    overrides = SOURCE_SCHEMAS.get(os.path.splitext(os.path.basename(str(source_file)))[0], {})
+    return {column: {**rules, **overrides.get(column, {})} for column, rules in SCHEMA.items()}
+
+
+def canonical_columns(df):
+    """Rename known alias headers; a canonical column already present wins"""
+    renames = {}
+    for column, aliases in ALIASES.items():
+        if column in df.columns:
+            continue
+        for alias in aliases:
+            if alias in df.columns:
+                renames[alias] = column
+                break
+    return df.rename(columns=renames)
+
+
+def blank(series):
+    return series.isna() | series.astype(str).str.strip().str.lower().isin(PLACEHOLDERS)
+
+
+def validate_frame(df, source_file):
+    """
+    Check one crawler frame against its schema.
+    Returns (valid rows with every schema column present, rejected rows with a
+    'Reasons' column, quality report dict).
+    """
+    schema = schema_for(source_file)
+    df = canonical_columns(df.copy())
+    reasons = pd.Series('', index=df.index)
+    issues = {}
+    truncated = 0
+
+    def flag(mask, reason):
+        count = int(mask.sum())
+        if count:
+            reasons.loc[mask] += reason + '; '
+            issues[reason] = issues.get(reason, 0) + count
+
+    missing = [column for column in schema if column not in df.columns]
+    for column in missing:
+        df[column] = None
+        if schema[column].get('required'):
+            flag(pd.Series(True, index=df.index), f'{column}: column missing')
+
+    for column, rules in schema.items():
+        if column in missing or not rules:
+            continue
+        values = df[column]
+        empty = blank(values)
+        if rules.get('required'):
+            flag(empty, f'{column}: empty')
+        text = values.where(empty, values.astype(str).str.strip())
+        if rules.get('url'):
+            flag(~empty & ~text.astype(str).str.match(URL_PATTERN), f'{column}: not an http(s) URL')
+        limit = rules.get('max_length')
+        if limit:
+            too_long = ~empty & (text.astype(str).str.len() > limit)
+            if rules.get('overflow') == 'reject':
+                flag(too_long, f'{column}: longer than {limit}')
+            else:
+                truncated += int(too_long.sum())
+                text = text.where(~too_long, text.astype(str).str.slice(0, limit))
+        df[column] = text.where(~empty, None)
+
+    bad = reasons != ''
+    rejected = df[bad].copy()
+    rejected['Reasons'] = reasons[bad].str.rstrip('; ')
+    report = {
+        'source_file': str(source_file),
+        'rows': len(df),
+        'valid_rows': int((~bad).sum()),
+        'quarantined': int(bad.sum()),
+        'truncated': truncated,
+        'missing_columns': missing,
+        'issues': issues,
+    }
+    return df[~bad], rejected, report
+
+
+def quarantine(rejected, source_file):
+    """Store rejected rows; a row already quarantined earlier is not stored twice"""
+    rows = rejected.drop(columns='Reasons')
+    rows = rows.astype(object).where(rows.notna(), None)
+    records = []
+    for row, reasons in zip(rows.to_dict('records'), rejected['Reasons']):
+        data = json.dumps(row, sort_keys=True, default=str)
+        records.append(QuarantinedRecord(
+            source_file=str(source_file),
+            reasons=reasons,
+            data=json.loads(data),
+            row_hash=hashlib.sha1(f'{source_file}|{data}'.encode('utf-8')).hexdigest(),
+        ))
+    QuarantinedRecord.objects.bulk_create(records, batch_size=500, ignore_conflicts=True)
+    return len(records)
+
+
+def save_report(report, readable=True):
+    return SourceQualityReport.objects.create(
+        source_file=report['source_file'],
+        readable=readable,
+        rows=report.get('rows', 0),
+        valid_rows=report.get('valid_rows', 0),
+        quarantined=report.get('quarantined', 0),
+        truncated=report.get('truncated', 0),
+        missing_columns=', '.join(report.get('missing_columns', []))[:500],
+        issues=report.get('issues', {}),
+    )
+
+
+def describe(report):
+    """One-line summary of a quality report for the command output"""
+    text = f"{report['source_file']}: {report['valid_rows']}/{report['rows']} rows valid"
+    if report['quarantined']:
+        text += f", {report['quarantined']} quarantined"
+    if report['truncated']:
+        text += f", {report['truncated']} values truncated"
+    if report['issues']:
+        text += ' (' + ', '.join(f'{reason} x{n}' for reason, n in sorted(report['issues'].items())) + ')'
+    return text
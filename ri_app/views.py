@@ -1,125 +1,132 @@
-import json 
-from django.shortcuts import render
-from django.views.generic import ListView, DetailView
-from .models import RegulatoryData
-from datetime import datetime
-from django.db.models import Q
-from django.utils.timezone import make_aware
-from django.http import JsonResponse
-from django.shortcuts import render, redirect
-from django.contrib.auth import login
-from .forms import CustomUserCreationForm
-from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import csrf_exempt
+import hashlib
+import json
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import SESSION_KEY, login
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import CharField, Count, Q, Value
+from django.http import JsonResponse, QueryDict, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.views.generic import DetailView, ListView, TemplateView
 
+from . import typeahead as typeahead_index
+from .caching import (
+    ConditionalPageMixin, bump_data_version, current_import_generation, normalize_filter_params, page_cache_stats,
+)
+from .classification import DOCUMENT_TYPES, PRODUCT_TYPES
+from .export import EXPORT_FIELDS, stream_csv, stream_xlsx
+from .filters import FILTER_PARAMS, filter_queryset
+from .forms import CustomUserCreationForm
+from .middleware import metrics as request_metrics
+from .models import ActivityRollup, ArchivedRegulatoryData, RegulatoryData, SavedSearch, SavedSearchMatch
+from .rollups import summarize
 
 
-class DashboardView(LoginRequiredMixin, ListView):
+class DashboardView(ConditionalPageMixin, LoginRequiredMixin, ListView):
     model = RegulatoryData
     template_name = 'ri_app/dashboard.html'
     context_object_name = 'items'
     paginate_by = 20
+    cache_rendered_pages = True
+    # Narrow projection: the full summary is only loaded by DetailView
+    listing_fields = RegulatoryData.LISTING_FIELDS
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-
-        # Viewed status filter
-        viewed_status = self.request.GET.get('viewed')
-        if viewed_status == 'read':
-            queryset = queryset.filter(viewed=True)
-        elif viewed_status == 'unread':
-            queryset = queryset.filter(viewed=False)
-
-        # Date Filtering
-        date_range = self.request.GET.get('date_range')
-        if date_range and 'to' in date_range:
-            try:
-                date_from_str, date_to_str = date_range.split(' to ')
-                # Parse as YYYY-MM-DD (matches database storage)
-                date_from = datetime.strptime(date_from_str.strip(), '%Y-%m-%d').date()
-                date_to = datetime.strptime(date_to_str.strip(), '%Y-%m-%d').date()
-                queryset = queryset.filter(date__gte=date_from, date__lte=date_to)
-            except (ValueError, AttributeError) as e:
-                print(f"Date filter error: {e}")
-        
-        # Filtering
-        product_type = self.request.GET.get('product_type')
-        if product_type:
-            queryset = queryset.filter(Product_Type=product_type)
-            
-        document_type = self.request.GET.get('document_type')
-        if document_type:
-            queryset = queryset.filter(Document_Type=document_type)
-            
-        drug_name = self.request.GET.get('drug_name')
-        if drug_name:
-            queryset = queryset.filter(Drug_names__iexact=drug_name)
-    
-    
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(summary__icontains=search)
-            )
-            
+        queryset = filter_queryset(
+            super().get_queryset().only(*self.listing_fields), self.request.GET
+        )
+
+        if self.request.GET.get('include_archive'):
+            # Span both tiers: the union yields dicts with a 'tier' marker
+            archived = filter_queryset(ArchivedRegulatoryData.objects.all(), self.request.GET)
+            queryset = queryset.order_by().values(
+                *self.listing_fields, tier=Value('hot', output_field=CharField())
+            ).union(
+                archived.order_by().values(
+                    *self.listing_fields, tier=Value('archive', output_field=CharField())
+                ),
+                all=True,
+            ).order_by('-date', '-id')
+
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        for item in context['items']:
-            if isinstance(item.date, str):
-                try:
-                    item.date = datetime.strptime(item.date, '%Y-%m-%d')
-                except ValueError:
-                    item.date = None  # or handle invalid format
-        product_types = RegulatoryData.objects.values_list('Product_Type', flat=True).distinct()
-        document_types = RegulatoryData.objects.values_list('Document_Type', flat=True).distinct()
-        drug_names = RegulatoryData.objects.values_list('Drug_names', flat=True).distinct()
-        
-
-        def get_filter_values(field_name):
-            # Get all distinct values including empty/None
-            values = RegulatoryData.objects.exclude(
-                **{f"{field_name}__isnull": True}
-            ).order_by(field_name).values_list(field_name, flat=True).distinct()
-            
-            # Clean and prepare values
-            cleaned = set()
-            for value in values:
-                if value:  # Only process non-empty values
-                    if isinstance(value, str):
-                        value = value.strip()
-                        # Skip obviously placeholder values
-                        if value.lower() not in ['none', 'other', 'other type', '']:
-                            # Handle comma-separated values (for drug names)
-                            if field_name == 'Drug_names' and ',' in value:
-                                for drug in value.split(','):
-                                    cleaned.add(drug.strip())
-                            else:
-                                cleaned.add(value)
-            return sorted(cleaned) if cleaned else []
-        
+
+        # Types are classified at import, so their facets are the fixed vocabularies;
+        # drug names are suggested by the typeahead endpoint instead of listed here
         context.update({
-            'product_types': get_filter_values('Product_Type'),
-            'document_types': get_filter_values('Document_Type'),
-            'drug_names': get_filter_values('Drug_names'),
+            'product_types': PRODUCT_TYPES,
+            'document_types': DOCUMENT_TYPES,
             'selected_product_type': self.request.GET.get('product_type', ''),
             'selected_document_type': self.request.GET.get('document_type', ''),
             'selected_drug_name': self.request.GET.get('drug_name', ''),
             'current_search': self.request.GET.get('search', ''),
             'current_date_range': self.request.GET.get('date_range', ''),
-            'selected_viewed': self.request.GET.get('viewed', '')
+            'selected_viewed': self.request.GET.get('viewed', ''),
+            'include_archive': bool(self.request.GET.get('include_archive')),
+            'import_generation': current_import_generation(),
+            'live_feed_poll_seconds': LIVE_FEED_POLL_SECONDS,
         })
         return context
 
 
-class DetailView(LoginRequiredMixin, DetailView):
+class ExportView(DashboardView):
+    """
+    Download every row matching the dashboard filters as .xlsx or, with
+    ?format=csv, as CSV. Rows are streamed, never loaded all at once.
+    """
+    listing_fields = EXPORT_FIELDS
+    cache_rendered_pages = False
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if not request.GET.get('include_archive'):
+            queryset = queryset.values(*self.listing_fields)
+        rows = queryset.iterator(chunk_size=2000)
+        stamp = date.today().isoformat()
+
+        if request.GET.get('format') == 'csv':
+            response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+            filename = f'RI_export_{stamp}.csv'
+        else:
+            response = StreamingHttpResponse(
+                stream_xlsx(rows),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+            filename = f'RI_export_{stamp}.xlsx'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class DetailView(ConditionalPageMixin, LoginRequiredMixin, DetailView):
     model = RegulatoryData
     template_name = 'ri_app/detail.html'
     context_object_name = 'item'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if isinstance(self.object, RegulatoryData):
+            # Precomputed by ri_app.related; one indexed lookup
+            context['related_articles'] = (
+                self.object.related_articles.select_related('related')
+                .only('rank', 'score', 'related__id', 'related__title', 'related__date', 'related__agency')
+            )
+        return context
+
+
+class ArchivedDetailView(DetailView):
+    model = ArchivedRegulatoryData
+    extra_context = {'archived': True}
+
 # Add the new function-based view here
 @csrf_exempt
 @require_POST
@@ -132,12 +139,178 @@ def update_viewed(request, item_id):
         item = RegulatoryData.objects.get(id=item_id)
         data = json.loads(request.body)
         item.viewed = data.get('viewed', False)
-        item.save()
+        item.save(update_fields=['viewed'])
+        bump_data_version()
         return JsonResponse({'success': True})
     except RegulatoryData.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Item not found'}, status=404)
     
 
+# Dashboards poll this often. A poll is answered from the cache (session and
+# import generation) and is a 304 until an import finishes, so it needs no
+# long-lived connection and works with gunicorn's plain sync workers.
+LIVE_FEED_POLL_SECONDS = 30
+LIVE_FEED_MAX_ITEMS = 50
+
+
+def live_feed(request):
+    """
+    Items imported after generation ?since= that match the dashboard filters
+    in the query string, as JSON. The ETag is the import generation, so the
+    table is only queried once a newer import has finished.
+    """
+    if request.session.get(SESSION_KEY) is None:
+        return JsonResponse({'error': 'authentication required'}, status=401)
+    try:
+        since = int(request.GET.get('since'))
+    except (TypeError, ValueError):
+        since = current_import_generation()
+    params = request.GET.copy()
+
+    generation = current_import_generation()
+    etag = quote_etag(hashlib.sha1(
+        f'{generation}|{since}|{normalize_filter_params(params)!r}'.encode('utf-8')
+    ).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    items = []
+    if generation > since:
+        new_items = filter_queryset(
+            RegulatoryData.objects.filter(import_run_id__gt=since, import_run_id__lte=generation),
+            params,
+        ).order_by('-date', '-id').values('id', 'title', 'date', 'excerpt')[:LIVE_FEED_MAX_ITEMS]
+        items = [dict(item, url=reverse('detail', args=[item['id']])) for item in new_items]
+
+    response = JsonResponse({'generation': generation, 'items': items})
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class SavedSearchListView(LoginRequiredMixin, ListView):
+    """The user's saved searches and the matches waiting for their next digest"""
+    template_name = 'ri_app/saved_searches.html'
+    context_object_name = 'saved_searches'
+
+    def get_queryset(self):
+        return self.request.user.saved_searches.annotate(
+            pending=Count('matches', filter=Q(matches__notified_at__isnull=True))
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['pending_matches'] = (
+            SavedSearchMatch.objects.filter(saved_search__user=self.request.user, notified_at__isnull=True)
+            .select_related('saved_search', 'record')
+            .defer('record__summary')[:100]
+        )
+        return context
+
+
+@login_required
+@require_POST
+def save_search(request):
+    """Save the dashboard filters posted from the dashboard form"""
+    params = QueryDict(request.POST.get('query', ''))
+    query = QueryDict(mutable=True)
+    for key, value in normalize_filter_params(params):
+        if key in FILTER_PARAMS:
+            query.appendlist(key, value)
+    name = request.POST.get('name', '').strip() or query.get('search') or 'Saved search'
+    SavedSearch.objects.create(user=request.user, name=name[:255], query=query.urlencode())
+    return redirect('saved_searches')
+
+
+@login_required
+@require_POST
+def delete_saved_search(request, pk):
+    get_object_or_404(SavedSearch, pk=pk, user=request.user).delete()
+    return redirect('saved_searches')
+
+
+# Analytics default to this many months of weeks; '?months=0' shows everything
+ANALYTICS_DEFAULT_MONTHS = 12
+
+
+def analytics_filters(params):
+    """Keyword arguments for rollups.summarize from the analytics query string"""
+    try:
+        months = int(params.get('months', ANALYTICS_DEFAULT_MONTHS))
+    except ValueError:
+        months = ANALYTICS_DEFAULT_MONTHS
+    return {
+        'agency': params.get('agency') or None,
+        'category': params.get('category') or None,
+        'document_type': params.get('document_type') or None,
+        'since': date.today() - relativedelta(months=months) if months > 0 else None,
+    }
+
+
+class AnalyticsView(LoginRequiredMixin, TemplateView):
+    """Record counts per agency, category, document type and week, from the rollup table"""
+    template_name = 'ri_app/analytics.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        summary = summarize(**analytics_filters(self.request.GET))
+        # Bar heights and widths relative to the largest value of each chart
+        peak = max((week['count'] for week in summary['weeks']), default=0) or 1
+        for week in summary['weeks']:
+            week['percent'] = round(100 * week['count'] / peak)
+        for field in ('agency', 'category', 'document_type'):
+            top = summary[field][0]['count'] if summary[field] else 1
+            for entry in summary[field]:
+                entry['percent'] = round(100 * entry['count'] / top)
+        dimensions = ActivityRollup.objects.order_by()
+        context.update(summary)
+        context.update({
+            'agencies': dimensions.exclude(agency='').values_list('agency', flat=True).distinct().order_by('agency'),
+            'categories': dimensions.exclude(category='').values_list('category', flat=True).distinct().order_by('category'),
+            'document_types': DOCUMENT_TYPES,
+            'selected': self.request.GET,
+        })
+        return context
+
+
+@login_required
+def typeahead(request):
+    """
+    Completions of ?q= from the drug names, agencies and title words of the
+    latest import, most frequent first. ?kind= narrows them to one of those.
+    """
+    kind = request.GET.get('kind') or None
+    if kind is not None and kind not in typeahead_index.KINDS:
+        return JsonResponse({'error': f"kind must be one of {', '.join(typeahead_index.KINDS)}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    query = request.GET.get('q', '')
+    response = JsonResponse({
+        'query': query,
+        'results': typeahead_index.get_index().complete(query, kind=kind, limit=limit),
+    })
+    # Suggestions only change with an import
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@login_required
+def analytics_data(request):
+    """JSON form of the analytics page"""
+    return JsonResponse(summarize(**analytics_filters(request.GET)))
+
+
+@staff_member_required
+def metrics(request):
+    """Request timing histograms for this worker process, plus page cache counters"""
+    data = request_metrics.snapshot()
+    data['page_cache'] = page_cache_stats()
+    return JsonResponse(data)
+
+
 def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)